@@ -0,0 +1,240 @@
+"""
+Retrieval benchmark: recall@k versus latency across RAG index backends.
+
+Usage:
+    python -m benchmarks.bench_retrieval [--sizes 10000,100000,1000000] [--dim 384]
+        [--queries 200] [--top-k 10] [--backends memory,quantized-int8,faiss-hnsw]
+        [--corpus synthetic | path/to/docs.json|.ndjson] [--out results.json]
+
+Ground truth is exact float32 cosine search over the same vectors. For each
+(backend, corpus size) it reports build time, resident index memory,
+recall@k, single-query p50/p99 latency and batched QPS. Output is one JSON
+document whose "meta" block pins the git commit, library versions and
+parameters, so runs from different commits can be diffed directly.
+
+Backends:
+    memory                      exact NumPy index
+    quantized-<float16|int8|binary>
+    faiss-<flat|ivf|hnsw>[-<float16|int8>]
+    pgvector                    rag_data via the pgvector RAGManager (needs a
+                                database and --dim matching the column; rows
+                                are written with a "bench_" id prefix and
+                                deleted afterwards)
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from src.rag_pipeline.rag_manager import make_index
+from src.rag_pipeline.vector_index import normalize_rows, top_k_rows
+
+DEFAULT_BACKENDS = "memory,quantized-float16,quantized-int8,quantized-binary,faiss-flat,faiss-ivf,faiss-hnsw,faiss-hnsw-int8"
+BUILD_BATCH = 10_000
+TRUTH_BLOCK = 50_000
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _meta(args) -> dict:
+    try:
+        import faiss
+        faiss_version = faiss.__version__
+    except ImportError:
+        faiss_version = None
+    return {
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "faiss": faiss_version,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "params": {k: v for k, v in vars(args).items() if k != "out"},
+    }
+
+
+def synthetic_corpus(n: int, dim: int, n_queries: int, seed: int = 7):
+    """Clustered Gaussian vectors (closer to real embeddings than uniform noise)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(16, n // 1000), dim)).astype(np.float32)
+
+    def sample(count):
+        out = np.empty((count, dim), dtype=np.float32)
+        for start in range(0, count, BUILD_BATCH):
+            m = min(BUILD_BATCH, count - start)
+            out[start:start + m] = centers[rng.integers(0, len(centers), m)] + 0.5 * rng.normal(size=(m, dim))
+        return out
+
+    return sample(n), sample(n_queries)
+
+
+def file_corpus(path: str, n: int, dim: int, n_queries: int, seed: int = 7):
+    """Embed up to `n` documents from a JSON/NDJSON file; queries are document openings."""
+    from src.rag_pipeline.embeddings import HashingEmbedder
+    from src.rag_pipeline.ingestion import iter_records
+    from src.rag_pipeline.rag_manager import document_text
+
+    embedder = HashingEmbedder(dim)
+    texts = []
+    for doc in iter_records(path):
+        texts.append(document_text(doc))
+        if len(texts) == n:
+            break
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(texts), size=min(n_queries, len(texts)), replace=False)
+    queries = [" ".join(texts[i].split()[:12]) for i in picks]
+    vectors = np.vstack([embedder.embed(texts[s:s + BUILD_BATCH]) for s in range(0, len(texts), BUILD_BATCH)])
+    return vectors, embedder.embed(queries)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Brute-force ground truth, scanning the corpus in blocks."""
+    q = normalize_rows(queries)
+    best_idx = np.empty((len(q), 0), dtype=np.int64)
+    best_val = np.empty((len(q), 0), dtype=np.float32)
+    for start in range(0, len(vectors), TRUTH_BLOCK):
+        block = normalize_rows(vectors[start:start + TRUTH_BLOCK])
+        idx, val = top_k_rows(q @ block.T, k)
+        cand_idx = np.concatenate([best_idx, idx + start], axis=1)
+        cand_val = np.concatenate([best_val, val], axis=1)
+        keep, best_val = top_k_rows(cand_val, k)
+        best_idx = np.take_along_axis(cand_idx, keep, axis=1)
+    return best_idx
+
+
+def _make(backend: str, dim: int):
+    parts = backend.split("-")
+    if parts[0] == "memory":
+        return make_index("memory", dim)
+    if parts[0] == "quantized":
+        return make_index("quantized", dim, mode=parts[1])
+    if parts[0] == "faiss":
+        params = {"index_type": parts[1]}
+        if len(parts) > 2:
+            params["quantization"] = parts[2]
+        return make_index("faiss", dim, **params)
+    raise ValueError(f"unknown backend: {backend}")
+
+
+class PgvectorAdapter:
+    """Index-like wrapper over the pgvector RAGManager for the benchmark loop."""
+
+    def __init__(self, dim: int):
+        from src.db.migrations.rag_manager import RAGManager as PgRAGManager
+        from src.rag_pipeline.embeddings import HashingEmbedder
+        # vectors are always supplied; the embedder only satisfies the constructor
+        self.rag = PgRAGManager(embedder=HashingEmbedder(dim))
+        self.dim = dim
+        self.ids = []
+
+    def add(self, ids, vectors):
+        rows = ({"document_id": f"bench_{i}", "content": "", "embedding": v, "metadata": {"bench": True}} for i, v in zip(ids, vectors))
+        self.rag.bulk_upsert(rows)
+        self.ids.extend(f"bench_{i}" for i in ids)
+
+    def search_batch(self, queries, top_k):
+        hits = self.rag.search_similar_batch(list(queries), top_k=top_k, use_cache=False)
+        return [[(h["document_id"][len("bench_"):], -float(h["distance"])) for h in row] for row in hits]
+
+    def memory_bytes(self):
+        return None  # server-side
+
+    def close(self):
+        self.rag.delete_documents(self.ids)
+        self.rag.close()
+
+
+def bench_backend(backend: str, vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray, top_k: int) -> dict:
+    dim = vectors.shape[1]
+    index = PgvectorAdapter(dim) if backend == "pgvector" else _make(backend, dim)
+    ids = [str(i) for i in range(len(vectors))]
+    try:
+        start = time.perf_counter()
+        for s in range(0, len(vectors), BUILD_BATCH):
+            index.add(ids[s:s + BUILD_BATCH], vectors[s:s + BUILD_BATCH])
+        build_s = time.perf_counter() - start
+
+        # warm-up, then single-query latency
+        index.search_batch(queries[:1], top_k)
+        latencies = []
+        results = []
+        for q in queries:
+            t0 = time.perf_counter()
+            results.append(index.search_batch(q[None, :], top_k)[0])
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+        t0 = time.perf_counter()
+        index.search_batch(queries, top_k)
+        batch_s = time.perf_counter() - t0
+
+        found = sum(len({int(doc_id) for doc_id, _ in hits} & set(row.tolist())) for hits, row in zip(results, truth))
+        return {
+            "backend": backend,
+            "n": len(vectors),
+            "dim": dim,
+            "build_s": round(build_s, 3),
+            "memory_bytes": index.memory_bytes(),
+            f"recall@{top_k}": round(found / truth.size, 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+            "qps_single": round(len(queries) / (sum(latencies) / 1000), 1),
+            "qps_batch": round(len(queries) / batch_s, 1) if batch_s else None,
+        }
+    finally:
+        close = getattr(index, "close", None)
+        if close:
+            close()
+
+
+def run(args) -> dict:
+    report = {"meta": _meta(args), "results": []}
+    for n in args.sizes:
+        if args.corpus == "synthetic":
+            vectors, queries = synthetic_corpus(n, args.dim, args.queries)
+        else:
+            vectors, queries = file_corpus(args.corpus, n, args.dim, args.queries)
+        truth = exact_top_k(vectors, queries, args.top_k)
+        for backend in args.backends:
+            try:
+                result = bench_backend(backend, vectors, queries, truth, args.top_k)
+            except Exception as e:  # one unavailable backend should not sink the run
+                result = {"backend": backend, "n": len(vectors), "error": f"{type(e).__name__}: {e}"}
+            report["results"].append(result)
+            if args.progress:
+                print(json.dumps(result), flush=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[10_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--backends", type=lambda s: s.split(","), default=DEFAULT_BACKENDS.split(","))
+    parser.add_argument("--corpus", default="synthetic")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    parser.add_argument("--progress", action="store_true", help="print each result line as it finishes")
+    args = parser.parse_args()
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Microbenchmark for the tokenizer service.
+
+Usage:
+    python -m benchmarks.bench_tokenization [--model gpt5] [--docs 2000] [--repeat 3]
+
+Prints one JSON object with throughput (tokens/s, MB/s) for cold counts,
+memoized counts, head truncation and chat-history fitting.
+"""
+import argparse
+import json
+import random
+import time
+
+from src.agents.tokenization import TokenizerService, get_tokenizer
+
+WORDS = (
+    "retrieval augmented generation pipeline orchestrator latency vector index "
+    "customer support lead enrichment postgres pgvector tenant 2025 error E1042 "
+    "Acme Globex TavilyCorp AgentQLInc consensus voting streaming token budget"
+).split()
+
+
+def _corpus(n_docs: int, words_per_doc: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words_per_doc)) + f" #{i}" for i in range(n_docs)]
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(model: str, n_docs: int, words_per_doc: int, repeat: int) -> dict:
+    docs = _corpus(n_docs, words_per_doc)
+    total_bytes = sum(len(d) for d in docs)
+    tokenizer = get_tokenizer(model)
+    total_tokens = sum(tokenizer.count(d) for d in docs)
+
+    def cold():
+        svc = TokenizerService(cache_size=0)
+        for d in docs:
+            svc.count(d, model)
+
+    warm_svc = TokenizerService(cache_size=n_docs)
+    for d in docs:
+        warm_svc.count(d, model)
+
+    def warm():
+        for d in docs:
+            warm_svc.count(d, model)
+
+    def truncate():
+        for d in docs:
+            tokenizer.truncate(d, 64)
+
+    history = [{"role": "system", "content": docs[0]}] + [
+        {"role": "user" if i % 2 else "assistant", "content": d} for i, d in enumerate(docs[1:])
+    ]
+    window = {model: total_tokens // 2 + 512}
+
+    def fit():
+        TokenizerService(context_windows=window).fit_messages(history, model, max_output_tokens=512)
+
+    results = {"model": model, "tokenizer": tokenizer.name, "docs": n_docs, "tokens": total_tokens, "bytes": total_bytes}
+    for name, fn in (("count_cold", cold), ("count_cached", warm), ("truncate_head", truncate), ("fit_messages", fit)):
+        secs = _timed(fn, repeat)
+        results[name] = {
+            "seconds": round(secs, 6),
+            "tokens_per_s": round(total_tokens / secs) if secs else None,
+            "mb_per_s": round(total_bytes / secs / 1e6, 2) if secs else None,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="gpt5")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(run(args.model, args.docs, args.words, args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,107 @@
-import os
-import requests
-from typing import Literal
-
-VerbosityLevel = Literal["minimal", "balanced", "verbose"]
-
-class GPT5Client:
-    """
-    GPT-5 wrapper with verbosity control for reasoning + latency tradeoffs.
-    """
-
-    def __init__(self, api_key=None, base_url="https://api.openai.com/v1"):
-        self.api_key = api_key or os.getenv("GPT5_API_KEY")
-        self.base_url = base_url
-
-    def generate(
-        self,
-        prompt: str,
-        task_type: str = "general",
-        verbosity: VerbosityLevel = "minimal",
-    ) -> str:
-        """
-        Call GPT-5 with configurable verbosity parameter.
-        """
-        headers = {"Authorization": f"Bearer {self.api_key}"}
-
-        payload = {
-            "model": "gpt-5",
-            "input": prompt,
-            # 🔑 Control reasoning depth
-            "verbosity": verbosity,                 # "minimal", "balanced", "verbose"
-            "reasoning": {"effort": "low" if verbosity == "minimal" else "medium"},
-            "decoding": {"strategy": "fast"},
-            "response_format": "text",
-            "max_output_tokens": 512 if verbosity == "minimal" else 2048,
-            "temperature": 0.2 if verbosity == "minimal" else 0.6,
-        }
-
-        # Stubbed response for demo
-        return f"[GPT-5 {verbosity}] {prompt[:50]}..."
-        # If calling API:
-        # r = requests.post(f"{self.base_url}/responses", headers=headers, json=payload)
-        # return r.json()["output_text"]
-
-        from src.agents.advanced_model_switcher import GPT5Client
-
-def run_demo():
-    gpt5 = GPT5Client()
-
-    # Minimal verbosity (fast, low-latency)
-    print("\n--- Minimal ---")
-    print(gpt5.generate("Summarize this doc", verbosity="minimal"))
-
-    # Balanced verbosity (default reasoning depth)
-    print("\n--- Balanced ---")
-    print(gpt5.generate("Explain this technical concept", verbosity="balanced"))
-
-    # Verbose mode (step-by-step reasoning, more tokens)
-    print("\n--- Verbose ---")
-    print(gpt5.generate("Walk me through the solution step by step", verbosity="verbose"))
-
-if __name__ == "__main__":
+import os
+import requests
+from typing import Literal, Optional
+
+from src.agents.prompt_layout import FrozenPrefix, get_prompt_assembler, get_prompt_cache_stats
+from src.agents.tokenization import TokenizerService, get_tokenizer_service, max_output_tokens_for
+from src.state.deadline import Deadline
+
+VerbosityLevel = Literal["minimal", "balanced", "verbose"]
+
+# Upper bound for a single provider call when no request deadline is passed.
+REQUEST_TIMEOUT_S = float(os.getenv("MODEL_REQUEST_TIMEOUT_S", "60"))
+
+# Responses API text.verbosity for each of our levels
+TEXT_VERBOSITY = {"minimal": "low", "balanced": "medium", "verbose": "high"}
+
+
+def response_text(data: dict) -> str:
+    """Concatenated output_text parts of a Responses API reply ("" when it has none)."""
+    if isinstance(data.get("output_text"), str):
+        return data["output_text"]
+    parts = []
+    for item in data.get("output") or []:
+        if item.get("type") != "message":
+            continue
+        for content in item.get("content") or []:
+            if content.get("type") == "output_text":
+                parts.append(content.get("text") or "")
+    return "".join(parts)
+
+
+class GPT5Client:
+    """
+    GPT-5 wrapper with verbosity control for reasoning + latency tradeoffs.
+    """
+
+    def __init__(self, api_key=None, base_url="https://api.openai.com/v1", tokenizer_service: Optional[TokenizerService] = None):
+        self.api_key = api_key or os.getenv("GPT5_API_KEY")
+        self.base_url = base_url
+        self.tokens = tokenizer_service or get_tokenizer_service()
+        self.cache_stats = get_prompt_cache_stats()
+        self.default_prefix = get_prompt_assembler().agent_prefix("gpt5")
+
+    def generate(
+        self,
+        prompt: str,
+        task_type: str = "general",
+        verbosity: VerbosityLevel = "minimal",
+        deadline: Optional[Deadline] = None,
+        prefix: Optional[FrozenPrefix] = None,
+    ) -> str:
+        """
+        Call GPT-5 with configurable verbosity parameter.
+        The HTTP timeout is taken from the request deadline when one is given.
+        `prefix` is sent as byte-stable `instructions` ahead of the prompt so the
+        provider can reuse its cached prefill.
+        """
+        if deadline is not None:
+            deadline.check("gpt-5 call")
+        timeout = deadline.budget(cap=REQUEST_TIMEOUT_S) if deadline is not None else REQUEST_TIMEOUT_S
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+
+        # Reserve the output budget and trim the prompt to what is left of the context window
+        max_output_tokens = max_output_tokens_for(verbosity)
+        prefix = prefix or self.default_prefix
+        prompt = self.tokens.fit_prompt(prompt, "gpt-5", max_output_tokens + self.tokens.count(prefix.text, "gpt-5"))
+
+        payload = {
+            "model": "gpt-5",
+            "instructions": prefix.text,
+            "input": prompt,
+            "prompt_cache_key": prefix.cache_key,
+            # 🔑 Control reasoning depth and answer length
+            "reasoning": {"effort": "low" if verbosity == "minimal" else "medium"},
+            "text": {"verbosity": TEXT_VERBOSITY[verbosity]},
+            "max_output_tokens": max_output_tokens,
+        }
+
+        if not self.api_key:
+            # Stubbed response for demo (no GPT5_API_KEY configured)
+            return f"[GPT-5 {verbosity}] {prompt[:50]}..."
+        r = requests.post(f"{self.base_url}/responses", headers=headers, json=payload, timeout=timeout)
+        r.raise_for_status()
+        data = r.json()
+        # prefix-cache hits reported by the provider, see /metrics/prompt-cache
+        self.cache_stats.record("gpt-5", data.get("usage"))
+        return response_text(data)
+
+        from src.agents.advanced_model_switcher import GPT5Client
+
+def run_demo():
+    gpt5 = GPT5Client()
+
+    # Minimal verbosity (fast, low-latency)
+    print("\n--- Minimal ---")
+    print(gpt5.generate("Summarize this doc", verbosity="minimal"))
+
+    # Balanced verbosity (default reasoning depth)
+    print("\n--- Balanced ---")
+    print(gpt5.generate("Explain this technical concept", verbosity="balanced"))
+
+    # Verbose mode (step-by-step reasoning, more tokens)
+    print("\n--- Verbose ---")
+    print(gpt5.generate("Walk me through the solution step by step", verbosity="verbose"))
+
+if __name__ == "__main__":
     run_demo()
\ No newline at end of file
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+# Shared instructions every agent starts with. Keep this byte-for-byte stable:
+# provider prompt caches match on exact prefixes, so any edit here invalidates
+# cached prefill for all agents.
+BASE_SYSTEM_PROMPT = (
+    "You are part of the Infinity Constellation customer support and data intelligence team.\n"
+    "Answer from the provided context and tools; say so when the context is insufficient.\n"
+    "Be concise, cite document ids when you use retrieved documents, and never invent contact data."
+)
+
+AGENT_ROLES: Dict[str, str] = {
+    "gpt5": "Role: structured data extraction and lead generation.",
+    "claude": "Role: summarization and customer-facing answers.",
+    "mistral": "Role: research queries and knowledge discovery.",
+    "gemini": "Role: cross-checking other agents' answers.",
+}
+
+SECTION_SEPARATOR = "\n\n"
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form for prefix text: LF newlines, no trailing whitespace."""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def render_tools(tools: Iterable[Dict[str, Any]]) -> str:
+    """Tool specs sorted by name and serialized with fixed key order and separators."""
+    specs = sorted(tools, key=lambda t: str(t.get("name", "")))
+    return "\n".join(json.dumps(t, sort_keys=True, separators=(",", ":"), ensure_ascii=False) for t in specs)
+
+
+def render_documents(documents: Iterable[Dict[str, Any]]) -> str:
+    """Retrieved documents ordered by id, so the same set renders identically whatever the ranking."""
+    docs = sorted(documents, key=lambda d: str(d.get("id") or d.get("document_id") or ""))
+    parts = []
+    for d in docs:
+        doc_id = d.get("id") or d.get("document_id") or ""
+        title = d.get("title") or ""
+        parts.append(f"[doc:{doc_id}] {normalize_text(title)}\n{normalize_text(d.get('content', ''))}".strip())
+    return "\n\n".join(parts)
+
+
+class FrozenPrefix:
+    """Immutable, pre-rendered stable prefix (system prompt + tools + documents)."""
+
+    __slots__ = ("name", "text", "cache_key")
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+        self.cache_key = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+    def __repr__(self) -> str:
+        return f"FrozenPrefix(name={self.name!r}, cache_key={self.cache_key!r}, chars={len(self.text)})"
+
+
+class PromptAssembler:
+    """
+    Renders the stable part of a prompt (system -> tools -> documents) once
+    and hands out the same frozen string for as long as its content does not
+    change, so the provider sees an identical prefix on every call and only
+    the volatile tail (the request itself) differs.
+    """
+
+    def __init__(self):
+        self._prefixes: Dict[str, FrozenPrefix] = {}
+        self._lock = threading.Lock()
+
+    def freeze_prefix(
+        self,
+        name: str,
+        system: str,
+        tools: Optional[Iterable[Dict[str, Any]]] = None,
+        documents: Optional[Iterable[Dict[str, Any]]] = None,
+    ) -> FrozenPrefix:
+        """
+        Render the stable prefix for `name`. The registered prefix is reused
+        while the rendered content is the same; new content replaces it.
+        """
+        sections = [normalize_text(system)]
+        if tools:
+            sections.append("# Tools\n" + render_tools(tools))
+        if documents:
+            sections.append("# Reference documents\n" + render_documents(documents))
+        prefix = FrozenPrefix(name, SECTION_SEPARATOR.join(s for s in sections if s))
+        with self._lock:
+            existing = self._prefixes.get(name)
+            if existing is not None and existing.cache_key == prefix.cache_key:
+                return existing
+            self._prefixes[name] = prefix
+            return prefix
+
+    def agent_prefix(self, agent_name: str, tools: Optional[Iterable[Dict[str, Any]]] = None) -> FrozenPrefix:
+        """Shared base instructions followed by the agent's role line."""
+        role = AGENT_ROLES.get(agent_name, f"Role: {agent_name} agent.")
+        return self.freeze_prefix(f"agent:{agent_name}", BASE_SYSTEM_PROMPT + "\n" + role, tools=tools)
+
+
+def _get(obj: Any, key: str, default: Any = None) -> Any:
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+def parse_cache_usage(usage: Any) -> Dict[str, int]:
+    """
+    Extract prompt/cached token counts from a provider usage object.
+    Understands OpenAI (prompt_tokens_details.cached_tokens / input_tokens_details),
+    Anthropic (cache_read_input_tokens, cache_creation_input_tokens) and
+    Gemini (cached_content_token_count) field names.
+    """
+    prompt = _get(usage, "prompt_tokens") or _get(usage, "input_tokens") or _get(usage, "prompt_token_count") or 0
+    details = _get(usage, "prompt_tokens_details") or _get(usage, "input_tokens_details")
+    cached = _get(details, "cached_tokens") or 0
+    cache_write = 0
+
+    anthropic_read = _get(usage, "cache_read_input_tokens")
+    if anthropic_read is not None:
+        cache_write = _get(usage, "cache_creation_input_tokens") or 0
+        cached = anthropic_read
+        # Anthropic reports input_tokens excluding cached/written tokens
+        prompt = prompt + anthropic_read + cache_write
+
+    gemini_cached = _get(usage, "cached_content_token_count")
+    if gemini_cached is not None:
+        cached = gemini_cached
+
+    return {"prompt_tokens": int(prompt), "cached_tokens": int(cached), "cache_write_tokens": int(cache_write)}
+
+
+class PromptCacheStats:
+    """Per-caller prefix-cache hit rates computed from provider usage fields."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def record(self, caller: str, usage: Any) -> Dict[str, int]:
+        parsed = parse_cache_usage(usage)
+        with self._lock:
+            s = self._stats.setdefault(caller, {"requests": 0, "requests_with_hit": 0, "prompt_tokens": 0, "cached_tokens": 0, "cache_write_tokens": 0})
+            s["requests"] += 1
+            s["requests_with_hit"] += 1 if parsed["cached_tokens"] > 0 else 0
+            s["prompt_tokens"] += parsed["prompt_tokens"]
+            s["cached_tokens"] += parsed["cached_tokens"]
+            s["cache_write_tokens"] += parsed["cache_write_tokens"]
+        return parsed
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            out = {}
+            for caller, s in self._stats.items():
+                out[caller] = dict(
+                    s,
+                    token_hit_rate=round(s["cached_tokens"] / s["prompt_tokens"], 4) if s["prompt_tokens"] else 0.0,
+                    request_hit_rate=round(s["requests_with_hit"] / s["requests"], 4) if s["requests"] else 0.0,
+                )
+            return out
+
+
+_assembler = PromptAssembler()
+_cache_stats = PromptCacheStats()
+
+
+def get_prompt_assembler() -> PromptAssembler:
+    return _assembler
+
+
+def get_prompt_cache_stats() -> PromptCacheStats:
+    return _cache_stats
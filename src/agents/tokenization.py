@@ -0,0 +1,232 @@
+import logging
+import os
+import re
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Optional: exact BPE tokenizers if tiktoken is installed
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None
+    TIKTOKEN_AVAILABLE = False
+
+# Context windows (input + output tokens) per backend name used by the model switcher.
+CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt5": 400_000,
+    "gpt-5": 400_000,
+    "claude": 200_000,
+    "mistral": 128_000,
+    "gemini": 1_000_000,
+}
+DEFAULT_CONTEXT_WINDOW = 128_000
+
+# tiktoken encoding per backend; other providers are approximated with the heuristic tokenizer.
+TIKTOKEN_ENCODINGS: Dict[str, str] = {
+    "gpt5": "o200k_base",
+    "gpt-5": "o200k_base",
+}
+
+# Output budget per verbosity level (mirrors the GPT-5 payload settings).
+MAX_OUTPUT_TOKENS: Dict[str, int] = {
+    "minimal": 512,
+    "balanced": 2048,
+    "verbose": 2048,
+}
+
+# Optional hard cap on prompt size, below the context window, to stop paying for filler tokens.
+MAX_PROMPT_TOKENS = int(os.getenv("MAX_PROMPT_TOKENS", "0")) or None
+
+# Chat-format overhead per message (role markers, separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+
+TRUNCATION_MARKER = "\n[...truncated...]\n"
+
+
+def max_output_tokens_for(verbosity: str) -> int:
+    return MAX_OUTPUT_TOKENS.get(verbosity, MAX_OUTPUT_TOKENS["balanced"])
+
+
+class HeuristicTokenizer:
+    """
+    Dependency-free tokenizer approximating BPE token boundaries.
+    Word pieces are capped at 8 letters and 3 digits; every symbol and
+    non-Latin character counts on its own, so counts err on the high side.
+    """
+
+    name = "heuristic"
+    _TOKEN_RE = re.compile(r"\s?[A-Za-z]{1,8}|\s?\d{1,3}|\s?[^\sA-Za-z\d]|\s+")
+
+    def count(self, text: str) -> int:
+        return len(self._TOKEN_RE.findall(text))
+
+    def truncate(self, text: str, max_tokens: int, keep: str = "head") -> str:
+        """Cut `text` to at most `max_tokens`, keeping the start ("head") or the end ("tail")."""
+        if max_tokens <= 0:
+            return ""
+        if keep == "head":
+            last = None
+            for last in islice(self._TOKEN_RE.finditer(text), max_tokens):
+                pass
+            return text[: last.end()] if last else ""
+        spans = [m.start() for m in self._TOKEN_RE.finditer(text)]
+        if len(spans) <= max_tokens:
+            return text
+        return text[spans[-max_tokens]:]
+
+    def offsets(self, text: str) -> List[int]:
+        """Character offset at which each token starts."""
+        return [m.start() for m in self._TOKEN_RE.finditer(text)]
+
+
+class TiktokenTokenizer:
+    """Exact BPE tokenizer backed by tiktoken."""
+
+    def __init__(self, encoding_name: str):
+        self.name = encoding_name
+        self._enc = tiktoken.get_encoding(encoding_name)
+
+    def count(self, text: str) -> int:
+        return len(self._enc.encode_ordinary(text))
+
+    def truncate(self, text: str, max_tokens: int, keep: str = "head") -> str:
+        if max_tokens <= 0:
+            return ""
+        tokens = self._enc.encode_ordinary(text)
+        if len(tokens) <= max_tokens:
+            return text
+        kept = tokens[:max_tokens] if keep == "head" else tokens[-max_tokens:]
+        return self._enc.decode(kept)
+
+    def offsets(self, text: str) -> List[int]:
+        _, offsets = self._enc.decode_with_offsets(self._enc.encode_ordinary(text))
+        return offsets
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model: str):
+    """
+    Return the (process-wide cached) tokenizer for a backend name.
+    Falls back to the heuristic tokenizer when tiktoken or its BPE files are unavailable.
+    """
+    encoding = TIKTOKEN_ENCODINGS.get((model or "").lower())
+    if encoding and TIKTOKEN_AVAILABLE:
+        try:
+            return TiktokenTokenizer(encoding)
+        except Exception as e:
+            logger.warning(f"tiktoken encoding {encoding} unavailable ({e}); using heuristic tokenizer")
+    return HeuristicTokenizer()
+
+
+class TokenizerService:
+    """
+    Prompt budgeting on top of the cached per-model tokenizers.
+
+    `count` is memoized for repeated strings (system prompts, tool specs) and
+    `fits` short-circuits on length: a byte-level BPE token covers at least one
+    byte, so text with no more UTF-8 bytes than the budget is known to fit
+    without tokenizing it.
+    """
+
+    def __init__(self, context_windows: Optional[Dict[str, int]] = None, max_prompt_tokens: Optional[int] = MAX_PROMPT_TOKENS, cache_size: int = 4096):
+        self.context_windows = dict(CONTEXT_WINDOWS, **(context_windows or {}))
+        self.max_prompt_tokens = max_prompt_tokens
+        self._count_cached = lru_cache(maxsize=cache_size)(self._count)
+
+    def tokenizer(self, model: str):
+        return get_tokenizer(model)
+
+    def _count(self, text: str, model: str) -> int:
+        return get_tokenizer(model).count(text)
+
+    def count(self, text: str, model: str = "gpt5") -> int:
+        return self._count_cached(text, model)
+
+    def fits(self, text: str, budget: int, model: str = "gpt5") -> bool:
+        size = len(text) if text.isascii() else len(text.encode("utf-8"))
+        if size <= budget:
+            return True
+        return self.count(text, model) <= budget
+
+    def prompt_budget(self, model: str, max_output_tokens: int) -> int:
+        """Tokens available for the prompt once the output budget is reserved."""
+        window = self.context_windows.get((model or "").lower(), DEFAULT_CONTEXT_WINDOW)
+        budget = window - max_output_tokens
+        if self.max_prompt_tokens:
+            budget = min(budget, self.max_prompt_tokens)
+        return max(0, budget)
+
+    def truncate(self, text: str, max_tokens: int, model: str = "gpt5", keep: str = "head") -> str:
+        if self.fits(text, max_tokens, model):
+            return text
+        return get_tokenizer(model).truncate(text, max_tokens, keep=keep)
+
+    def split(self, text: str, max_tokens: int, overlap: int = 0, model: str = "gpt5") -> List[str]:
+        """
+        Cut `text` into windows of at most `max_tokens`, each sharing `overlap`
+        tokens with the previous one. Windows are cut on token boundaries.
+        """
+        if overlap >= max_tokens:
+            raise ValueError("overlap must be smaller than max_tokens")
+        if self.fits(text, max_tokens, model):
+            return [text] if text else []
+        offsets = get_tokenizer(model).offsets(text)
+        step = max_tokens - overlap
+        chunks = []
+        for start in range(0, len(offsets), step):
+            end = start + max_tokens
+            chunks.append(text[offsets[start]: offsets[end] if end < len(offsets) else len(text)])
+            if end >= len(offsets):
+                break
+        return chunks
+
+    def fit_prompt(self, prompt: str, model: str, max_output_tokens: int) -> str:
+        """Trim a single-string prompt to the model's prompt budget."""
+        budget = self.prompt_budget(model, max_output_tokens)
+        if self.fits(prompt, budget, model):
+            return prompt
+        marker_tokens = self.count(TRUNCATION_MARKER, model)
+        logger.info(f"Prompt for {model} exceeds {budget} tokens; truncating")
+        return self.truncate(prompt, budget - marker_tokens, model) + TRUNCATION_MARKER
+
+    def fit_messages(self, messages: List[Dict[str, Any]], model: str, max_output_tokens: int) -> List[Dict[str, Any]]:
+        """
+        Trim a chat history to the prompt budget.
+        System messages are always kept; the remaining budget is filled with the
+        most recent turns, newest first. If the newest turn alone does not fit,
+        its content is truncated rather than dropped.
+        """
+        budget = self.prompt_budget(model, max_output_tokens)
+        system = [m for m in messages if m.get("role") == "system"]
+        turns = [m for m in messages if m.get("role") != "system"]
+
+        used = sum(self.count(m.get("content", ""), model) + MESSAGE_OVERHEAD_TOKENS for m in system)
+        kept: List[Dict[str, Any]] = []
+        for msg in reversed(turns):
+            cost = self.count(msg.get("content", ""), model) + MESSAGE_OVERHEAD_TOKENS
+            if used + cost <= budget:
+                kept.append(msg)
+                used += cost
+                continue
+            if not kept:
+                room = budget - used - MESSAGE_OVERHEAD_TOKENS
+                if room > 0:
+                    kept.append(dict(msg, content=self.truncate(msg.get("content", ""), room, model, keep="tail")))
+            break
+        kept.reverse()
+        return system + kept
+
+
+_default_service: Optional[TokenizerService] = None
+
+
+def get_tokenizer_service() -> TokenizerService:
+    """Shared service instance so counts cached by one caller benefit the others."""
+    global _default_service
+    if _default_service is None:
+        _default_service = TokenizerService()
+    return _default_service
@@ -1,20 +1,66 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-
-from .endpoints import router as api_router
-
-app = FastAPI(title="Infinity CSA Data Intelligence API (MassGen)")
-
-# CORS - allow all origins for demo (restrict in production)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(api_router, prefix="/api")
-
-@app.get("/")
-def health():
+import asyncio
+import logging
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+from src.db.async_postgres import close_async_db, get_async_db
+from src.db.log_maintenance import AGENT_LOGS_MAINTENANCE_INTERVAL_S, run_maintenance
+from src.db.log_writer import close_log_writer
+from src.rag_pipeline.embeddings import EmbeddingDimensionError
+
+from .endpoints import router as api_router
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Infinity CSA Data Intelligence API (MassGen)")
+
+# CORS - allow all origins for demo (restrict in production)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+app.include_router(api_router, prefix="/api")
+
+_maintenance_task = None
+
+
+async def _agent_logs_maintenance():
+    """Create upcoming agent_logs partitions, refresh rollups and apply retention, periodically."""
+    while True:
+        try:
+            await asyncio.to_thread(run_maintenance)
+        except Exception as e:
+            logger.warning(f"agent_logs maintenance failed: {e}")
+        await asyncio.sleep(AGENT_LOGS_MAINTENANCE_INTERVAL_S)
+
+@app.on_event("startup")
+async def check_database():
+    # a mismatched embedding model stops startup; an unreachable database is retried per request
+    try:
+        await get_async_db().connect()
+    except EmbeddingDimensionError:
+        raise
+    except Exception as e:
+        logger.warning(f"database not reachable at startup: {e}")
+
+@app.on_event("startup")
+async def start_maintenance():
+    global _maintenance_task
+    if AGENT_LOGS_MAINTENANCE_INTERVAL_S > 0:
+        _maintenance_task = asyncio.create_task(_agent_logs_maintenance())
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+    await close_async_db()
+    # write out queued agent_logs rows before exiting
+    await asyncio.to_thread(close_log_writer)
+
+@app.get("/")
+def health():
     return {"status": "ok", "service": "infinity-csa-api"}
\ No newline at end of file
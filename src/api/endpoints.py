@@ -1,72 +1,221 @@
-from fastapi import APIRouter, Query, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
-from typing import Optional
-import asyncio
-
-from src.massgen_integration.massgen_orchestrator_v005 import MassGenOrchestratorV005
-from src.massgen_integration.massgen_tools_v005 import stream_massgen
-
-router = APIRouter()
-# instantiate a single orchestrator for the API process (reuse across requests)
-_orchestrator = MassGenOrchestratorV005()
-
-VALID_VERBOSITY = {"minimal", "balanced", "verbose"}
-
-def _validate_verbosity(v: Optional[str]) -> str:
-    if v is None:
-        return _orchestrator.default_verbosity or "minimal"
-    if v not in VALID_VERBOSITY:
-        raise HTTPException(status_code=400, detail=f"verbosity must be one of {sorted(VALID_VERBOSITY)}")
-    return v
-
-@router.get("/chat/stream", summary="Stream responses from the orchestrator")
-async def chat_stream(
-    prompt: str = Query(..., description="User prompt to send to the orchestrator"),
-    model: Optional[str] = Query(None, description="Backend hint (gpt5|claude|mistral|gemini)"),
-    verbosity: Optional[str] = Query(None, description="verbosity level: minimal|balanced|verbose"),
-    task_type: Optional[str] = Query("research_query", description="Task type hint for model switching"),
-):
-    """
-    Streams content chunks as plain text. Each chunk is sent as a chunked HTTP response (text/plain).
-    The very first chunk is a fast primary response from the low-latency model switcher, followed by orchestrator streaming.
-    """
-    verbosity = _validate_verbosity(verbosity)
-
-    async def _event_stream():
-        async for chunk in _orchestrator.chat(prompt, model=model, verbosity=verbosity, task_type=task_type):
-            # Only stream content chunks to UI; if vote_info present, stream a short metadata line
-            if chunk.get("type") == "content":
-                text = chunk.get("content", "")
-                # ensure newline separation for streaming clients
-                yield text
-            elif chunk.get("type") == "vote_info":
-                vi = chunk.get("vote_info", {})
-                yield f"\n[Vote] agent={vi.get('agent')} score={vi.get('score')}\n"
-            else:
-                # fallback: try to stringify
-                yield str(chunk)
-
-            # tiny sleep to yield cooperatively (helps some WSGI/ASGI servers)
-            await asyncio.sleep(0)
-
-    return StreamingResponse(_event_stream(), media_type="text/plain; charset=utf-8")
-
-
-@router.post("/chat/sync", summary="Synchronous (collected) response")
-async def chat_sync(
-    prompt: str,
-    model: Optional[str] = None,
-    verbosity: Optional[str] = None,
-    task_type: Optional[str] = "research_query",
-):
-    """
-    Runs the orchestrator and returns the full concatenated response (useful for tests or non-streaming clients).
-    """
-    verbosity = _validate_verbosity(verbosity)
-    out = await stream_massgen(_orchestrator, prompt, model=model, verbosity=verbosity, task_type=task_type)
-    return JSONResponse({"prompt": prompt, "model": model or _orchestrator.model_switcher.select_model(task_type), "verbosity": verbosity, "response": out})
-
- @router.post("/scrape")
-async def scrape_endpoint(request: ScrapeRequest):
-    result = await scrape_page(request.url, selector=request.selector)
-    return result
\ No newline at end of file
+from fastapi import APIRouter, Query, HTTPException, Header
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, JSONResponse
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import psycopg2
+
+from src.massgen_integration.massgen_orchestrator_v005 import MassGenOrchestratorV005
+from src.massgen_integration.massgen_tools_v005 import stream_massgen, format_deadline_marker
+from src.agents.prompt_layout import get_prompt_cache_stats
+from src.db.async_postgres import AsyncPostgres, get_async_db
+from src.db.leads import upsert_leads
+from src.db.log_writer import get_log_writer
+from src.db.postgresql_connector import PoolTimeout, get_pool
+from src.rag_pipeline.embeddings import EmbeddingDimensionError, get_embedding_service
+from src.rag_pipeline.retrieval_cache import get_retrieval_cache
+from src.state.deadline import DEADLINE_HEADER, Deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+# instantiate a single orchestrator for the API process (reuse across requests)
+_orchestrator = MassGenOrchestratorV005()
+
+VALID_VERBOSITY = {"minimal", "balanced", "verbose"}
+
+def _validate_verbosity(v: Optional[str]) -> str:
+    if v is None:
+        return _orchestrator.default_verbosity or "minimal"
+    if v not in VALID_VERBOSITY:
+        raise HTTPException(status_code=400, detail=f"verbosity must be one of {sorted(VALID_VERBOSITY)}")
+    return v
+
+class ScrapeRequest(BaseModel):
+    url: str
+    selector: Optional[str] = None
+
+class DocumentSearchRequest(BaseModel):
+    query: str
+    top_k: int = 5
+    filters: Optional[Dict[str, Any]] = None
+
+class LeadBulkRequest(BaseModel):
+    leads: List[Dict[str, Any]]
+    source: str = "api"
+
+async def _db() -> AsyncPostgres:
+    """Async DB handle for request handlers; 503 when the database is unreachable."""
+    db = get_async_db()
+    try:
+        await db.connect()
+    except EmbeddingDimensionError:
+        raise
+    except Exception as e:
+        logger.warning(f"database unavailable: {e}")
+        raise HTTPException(status_code=503, detail="database unavailable")
+    return db
+
+@router.get("/chat/stream", summary="Stream responses from the orchestrator")
+async def chat_stream(
+    prompt: str = Query(..., description="User prompt to send to the orchestrator"),
+    model: Optional[str] = Query(None, description="Backend hint (gpt5|claude|mistral|gemini)"),
+    verbosity: Optional[str] = Query(None, description="verbosity level: minimal|balanced|verbose"),
+    task_type: Optional[str] = Query("research_query", description="Task type hint for model switching"),
+    request_timeout: Optional[str] = Header(None, alias=DEADLINE_HEADER, description="Request budget in seconds"),
+):
+    """
+    Streams content chunks as plain text. Each chunk is sent as a chunked HTTP response (text/plain).
+    The very first chunk is a fast primary response from the low-latency model switcher, followed by orchestrator streaming.
+    If the request deadline runs out, the stream ends with a `[deadline_exceeded]` line.
+    """
+    verbosity = _validate_verbosity(verbosity)
+    deadline = Deadline.from_header(request_timeout)
+
+    async def _event_stream():
+        async for chunk in _orchestrator.chat(prompt, model=model, verbosity=verbosity, task_type=task_type, deadline=deadline):
+            # Only stream content chunks to UI; if vote_info present, stream a short metadata line
+            if chunk.get("type") == "content":
+                text = chunk.get("content", "")
+                # ensure newline separation for streaming clients
+                yield text
+            elif chunk.get("type") == "vote_info":
+                vi = chunk.get("vote_info", {})
+                yield f"\n[Vote] agent={vi.get('agent')} score={vi.get('score')}\n"
+            elif chunk.get("type") == "deadline_exceeded":
+                yield format_deadline_marker(chunk)
+            else:
+                # fallback: try to stringify
+                yield str(chunk)
+
+            # tiny sleep to yield cooperatively (helps some WSGI/ASGI servers)
+            await asyncio.sleep(0)
+
+    return StreamingResponse(_event_stream(), media_type="text/plain; charset=utf-8")
+
+
+@router.post("/chat/sync", summary="Synchronous (collected) response")
+async def chat_sync(
+    prompt: str,
+    model: Optional[str] = None,
+    verbosity: Optional[str] = None,
+    task_type: Optional[str] = "research_query",
+    request_timeout: Optional[str] = Header(None, alias=DEADLINE_HEADER),
+):
+    """
+    Runs the orchestrator and returns the full concatenated response (useful for tests or non-streaming clients).
+    `deadline_exceeded` is true when the response is partial because the request budget ran out.
+    """
+    verbosity = _validate_verbosity(verbosity)
+    deadline = Deadline.from_header(request_timeout)
+    out = await stream_massgen(_orchestrator, prompt, model=model, verbosity=verbosity, task_type=task_type, deadline=deadline)
+    return JSONResponse({"prompt": prompt, "model": model or _orchestrator.model_switcher.select_model(task_type), "verbosity": verbosity, "response": out, "deadline_exceeded": deadline.expired})
+
+@router.get("/metrics/prompt-cache", summary="Provider prefix-cache hit rates per caller")
+async def prompt_cache_metrics():
+    return JSONResponse(get_prompt_cache_stats().snapshot())
+
+@router.get("/metrics/embeddings", summary="Embedding service throughput and cache hit rates")
+async def embedding_metrics():
+    return JSONResponse(get_embedding_service().metrics())
+
+@router.get("/metrics/retrieval-cache", summary="Retrieval result cache hit rates per caller")
+async def retrieval_cache_metrics():
+    return JSONResponse(get_retrieval_cache().snapshot())
+
+@router.get("/metrics/db-pool", summary="Database connection pool size, wait times and recycling")
+async def db_pool_metrics():
+    return JSONResponse(get_pool().metrics())
+
+@router.get("/metrics/agent-logs", summary="Write-behind agent_logs queue depth, batches and drops")
+async def agent_log_metrics():
+    return JSONResponse(get_log_writer().metrics())
+
+@router.get("/metrics/agents", summary="Per agent/task call counts and latency from the hourly rollups")
+async def agent_metrics(
+    hours: int = Query(24, ge=1, le=24 * 90),
+    agent: Optional[str] = Query(None, description="Only this agent (model) name"),
+):
+    db = await _db()
+    return JSONResponse(jsonable_encoder({"hours": hours, "agents": await db.agent_stats(hours=hours, agent_name=agent)}))
+
+@router.post("/documents/search", summary="Vector search over rag_data")
+async def search_documents(request: DocumentSearchRequest):
+    db = await _db()
+    try:
+        hits = await db.search_text(request.query, top_k=request.top_k, filters=request.filters, caller="api")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(jsonable_encoder({"query": request.query, "results": hits}))
+
+@router.get("/documents/{document_id}")
+async def get_document(document_id: str):
+    db = await _db()
+    doc = await db.get_document(document_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="document not found")
+    return JSONResponse(jsonable_encoder(doc))
+
+@router.delete("/documents/{document_id}")
+async def delete_document(document_id: str):
+    db = await _db()
+    if not await db.delete_document(document_id):
+        raise HTTPException(status_code=404, detail="document not found")
+    return {"document_id": document_id, "deleted": True}
+
+@router.get("/leads", summary="Most recent leads")
+async def list_leads(
+    company: Optional[str] = Query(None, description="Case-insensitive company name match"),
+    source: Optional[str] = Query(None, description="Source tool, e.g. TavilyTool"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    db = await _db()
+    leads = await db.fetch_leads(company=company, source=source, limit=limit)
+    return JSONResponse(jsonable_encoder({"leads": leads}))
+
+@router.get("/leads/search", summary="Fuzzy lead search with filters and cursor pagination")
+async def search_leads(
+    q: Optional[str] = Query(None, min_length=3, description="Fuzzy match on company, contact name or email"),
+    industry: Optional[str] = Query(None, description="Industry (case-insensitive exact match)"),
+    title: Optional[str] = Query(None, description="Job title substring, e.g. CTO"),
+    source: Optional[str] = Query(None, description="Source tool, e.g. TavilyTool"),
+    sort: str = Query("recent", description="recent (newest first) or relevance (needs q)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+):
+    db = await _db()
+    try:
+        page = await db.search_leads(q=q, industry=industry, title=title, source=source, sort=sort, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(jsonable_encoder(page))
+
+@router.post("/leads/bulk", summary="Normalize, deduplicate and upsert a batch of leads")
+async def bulk_upsert_leads(request: LeadBulkRequest):
+    # COPY + merge on a pooled psycopg2 connection, off the event loop
+    # unreachable or saturated database -> 503, rejected lead data -> 400; anything else is a 500
+    try:
+        summary = await asyncio.to_thread(upsert_leads, request.leads, request.source)
+    except (psycopg2.OperationalError, PoolTimeout) as e:
+        logger.warning(f"lead upsert failed: {e}")
+        raise HTTPException(status_code=503, detail="database unavailable")
+    except (psycopg2.DataError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"invalid leads: {e}")
+    return JSONResponse(summary)
+
+@router.post("/scrape")
+async def scrape_endpoint(
+    request: ScrapeRequest,
+    request_timeout: Optional[str] = Header(None, alias=DEADLINE_HEADER),
+):
+    # imported lazily: the scraper pulls in bs4/playwright, which the chat endpoints don't need
+    from src.web_automation.scraper import scrape_page
+
+    deadline = Deadline.from_header(request_timeout)
+    try:
+        result = await scrape_page(request.url, selector=request.selector, deadline=deadline)
+    except DeadlineExceeded:
+        return JSONResponse({"url": request.url, "deadline_exceeded": True}, status_code=504)
+    return result
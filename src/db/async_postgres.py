@@ -0,0 +1,391 @@
+import asyncio
+import datetime
+import json
+import logging
+import os
+import re
+import struct
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    ASYNCPG_AVAILABLE = False
+
+from src.db.migrations.rag_manager import (
+    DATE_FILTERS,
+    EMBEDDING_COLUMN_DIM_SQL,
+    FILTER_ESTIMATE_TTL_S,
+    RAG_HNSW_EF_SEARCH,
+    RAG_IVFFLAT_PROBES,
+    build_metadata_filter,
+    filter_plan,
+    partition_route,
+    search_scan_sql,
+)
+from src.db.leads import lead_search_sql, search_page
+from src.db.postgresql_connector import DB_CONFIG, POSTGRES_URI
+from src.rag_pipeline.embeddings import check_embedding_dim, get_embedding_service
+from src.rag_pipeline.partitioned_index import partition_key
+from src.rag_pipeline.retrieval_cache import RetrievalCache, get_retrieval_cache
+
+logger = logging.getLogger(__name__)
+
+ASYNC_DB_POOL_MIN = int(os.getenv("ASYNC_DB_POOL_MIN", "1"))
+ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", "10"))
+ASYNC_DB_COMMAND_TIMEOUT_S = float(os.getenv("ASYNC_DB_COMMAND_TIMEOUT_S", "10"))
+
+_NAMED_PARAM = re.compile(r"%\((\w+)\)s|%%")
+_VECTOR_HEADER = struct.Struct("!HH")
+
+
+def to_positional(sql: str, params: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """Rewrite psycopg2 %(name)s placeholders as asyncpg $n (a repeated name reuses its number; %% becomes %)."""
+    order: Dict[str, int] = {}
+
+    def number(match: "re.Match") -> str:
+        name = match.group(1)
+        if name is None:
+            return "%"
+        if name not in order:
+            order[name] = len(order) + 1
+        return f"${order[name]}"
+
+    sql = _NAMED_PARAM.sub(number, sql)
+    return sql, [params[name] for name in order]
+
+
+def encode_vector(value) -> bytes:
+    """pgvector binary wire format: uint16 dim, uint16 unused, big-endian float32 values."""
+    v = np.asarray(value, dtype=">f4").ravel()
+    return _VECTOR_HEADER.pack(len(v), 0) + v.tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    dim, _ = _VECTOR_HEADER.unpack_from(data)
+    return np.frombuffer(data, dtype=">f4", count=dim, offset=_VECTOR_HEADER.size).astype(np.float32)
+
+
+def _encode_json(value) -> str:
+    # filter parameters arrive already serialized
+    return value if isinstance(value, str) else json.dumps(value, default=str)
+
+
+def _as_timestamp(value):
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return datetime.datetime.combine(value, datetime.time())
+    return value
+
+
+async def _init_connection(conn) -> None:
+    for name in ("json", "jsonb"):
+        await conn.set_type_codec(name, schema="pg_catalog", encoder=_encode_json, decoder=json.loads, format="text")
+    try:
+        await conn.set_type_codec("vector", schema="public", encoder=encode_vector, decoder=decode_vector, format="binary")
+    except ValueError:
+        # pgvector not installed in this database; document search is unavailable
+        logger.warning("pgvector type not found; vector columns will not be decoded")
+
+
+class AsyncPostgres:
+    """
+    asyncpg data access for request-path code (API handlers, orchestrator).
+
+    Covers the same operations as the psycopg2 helpers (agent log writes,
+    rag_data upsert / search / get / delete, lead queries) without
+    blocking the event loop. Connections come from one pool opened on
+    first use; vectors travel in pgvector's binary format, and rag_data
+    writes invalidate the shared retrieval cache exactly like the sync
+    RAGManager does.
+    """
+
+    def __init__(self, dsn: Optional[str] = POSTGRES_URI, embedder=None, cache: Optional[RetrievalCache] = None,
+                 min_size: int = ASYNC_DB_POOL_MIN, max_size: int = ASYNC_DB_POOL_MAX):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.embedder = embedder
+        self.cache = cache or get_retrieval_cache()
+        self.pool = None
+        self._connect_lock = asyncio.Lock()
+        # filter -> (timestamp, selectivity, estimated rows)
+        self._filter_estimates: Dict[Tuple[str, str], Tuple[float, float, int]] = {}
+
+    async def connect(self):
+        """Open the pool (idempotent); raises EmbeddingDimensionError if the embedder does not fit rag_data."""
+        if self.pool is not None:
+            return self.pool
+        if not ASYNCPG_AVAILABLE:
+            raise RuntimeError("asyncpg is not installed")
+        async with self._connect_lock:
+            if self.pool is None:
+                options = {} if self.dsn else {
+                    "database": DB_CONFIG["dbname"], "user": DB_CONFIG["user"], "password": DB_CONFIG["password"],
+                    "host": DB_CONFIG["host"], "port": int(DB_CONFIG["port"]),
+                }
+                pool = await asyncpg.create_pool(
+                    dsn=self.dsn, min_size=self.min_size, max_size=self.max_size,
+                    command_timeout=ASYNC_DB_COMMAND_TIMEOUT_S, init=_init_connection, **options,
+                )
+                try:
+                    if self.embedder is None:
+                        self.embedder = get_embedding_service()
+                    check_embedding_dim(self.embedder, await pool.fetchval(EMBEDDING_COLUMN_DIM_SQL))
+                except Exception:
+                    await pool.close()
+                    raise
+                self.pool = pool
+        return self.pool
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def _embed(self, texts: List[str]) -> np.ndarray:
+        if self.embedder is None:
+            self.embedder = get_embedding_service()
+        return await asyncio.to_thread(self.embedder.embed, texts)
+
+    # -------------------------------
+    # agent_logs / csa_query_logs
+    # -------------------------------
+    async def log_agent_output(self, agent_name: str, task_name: str, input_text: str, output_text: str, latency_ms: Optional[float] = None) -> None:
+        pool = await self.connect()
+        await pool.execute(
+            "INSERT INTO agent_logs (agent_name, task_name, input, output, latency_ms) VALUES ($1, $2, $3, $4, $5);",
+            agent_name, task_name, input_text, output_text, latency_ms,
+        )
+
+    async def agent_stats(self, hours: int = 24, agent_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Per agent/task call counts and latency over the last `hours`, from the hourly rollups."""
+        args: List[Any] = [hours]
+        where = "bucket >= date_trunc('hour', now()) - make_interval(hours => $1)"
+        if agent_name:
+            args.append(agent_name)
+            where += " AND agent_name = $2"
+        pool = await self.connect()
+        rows = await pool.fetch(
+            f"""
+            SELECT agent_name, task_name, sum(calls)::bigint AS calls,
+                   sum(latency_ms_sum) / NULLIF(sum(calls), 0) AS latency_ms_avg,
+                   max(latency_ms_max) AS latency_ms_max,
+                   max(latency_ms_p95) AS latency_ms_p95_max
+            FROM agent_logs_hourly
+            WHERE {where}
+            GROUP BY agent_name, task_name
+            ORDER BY calls DESC;
+            """,
+            *args,
+        )
+        return [dict(r) for r in rows]
+
+    # -------------------------------
+    # rag_data
+    # -------------------------------
+    async def upsert_documents(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Upsert documents (document_id, content, optional embedding / metadata) in one transaction."""
+        latest = {r["document_id"]: r for r in rows}
+        if not latest:
+            return 0
+        docs = list(latest.values())
+        missing = [i for i, r in enumerate(docs) if r.get("embedding") is None]
+        if missing:
+            vectors = await self._embed([docs[i]["content"] for i in missing])
+            for i, vec in zip(missing, vectors):
+                docs[i] = dict(docs[i], embedding=vec)
+        pool = await self.connect()
+        try:
+            keys = [partition_key(r.get("metadata") or {}) for r in docs]
+            async with pool.acquire() as conn, conn.transaction():
+                # a document whose partition changed leaves its old partition
+                await conn.execute(
+                    """
+                    DELETE FROM rag_data r
+                    USING unnest($1::text[], $2::text[]) AS n(document_id, partition_key)
+                    WHERE r.document_id = n.document_id AND r.partition_key <> n.partition_key;
+                    """,
+                    [r["document_id"] for r in docs], keys,
+                )
+                await conn.executemany(
+                    """
+                    INSERT INTO rag_data (partition_key, document_id, content, embedding, metadata)
+                    VALUES ($1, $2, $3, $4, $5)
+                    ON CONFLICT (partition_key, document_id) DO UPDATE
+                    SET content = EXCLUDED.content,
+                        embedding = EXCLUDED.embedding,
+                        metadata = EXCLUDED.metadata,
+                        updated_at = NOW();
+                    """,
+                    [(key, r["document_id"], r["content"], r["embedding"], r.get("metadata") or {}) for key, r in zip(keys, docs)],
+                )
+        finally:
+            self.cache.bump()
+        return len(docs)
+
+    async def upsert_document(self, document_id: str, content: str, embedding: Optional[Sequence[float]] = None, metadata: Optional[Dict[str, Any]] = None) -> None:
+        await self.upsert_documents([{"document_id": document_id, "content": content, "embedding": embedding, "metadata": metadata}])
+
+    async def _estimate_selectivity(self, conn, where: str, params: Dict[str, Any]) -> Tuple[float, int]:
+        key = (where, json.dumps(params, sort_keys=True, default=str))
+        cached = self._filter_estimates.get(key)
+        if cached and time.monotonic() - cached[0] < FILTER_ESTIMATE_TTL_S:
+            return cached[1], cached[2]
+        sql, args = to_positional(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM rag_data WHERE {where}", params)
+        plan = await conn.fetchval(sql, *args)
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimated = int(plan[0]["Plan"]["Plan Rows"])
+        total = int(await conn.fetchval("SELECT GREATEST(reltuples, 1)::bigint FROM pg_class WHERE oid = 'rag_data'::regclass;"))
+        selectivity = min(1.0, estimated / max(total, estimated, 1))
+        self._filter_estimates[key] = (time.monotonic(), selectivity, estimated)
+        return selectivity, estimated
+
+    async def search_similar_batch(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        top_k: int = 5,
+        probes: Optional[int] = RAG_IVFFLAT_PROBES,
+        ef_search: Optional[int] = RAG_HNSW_EF_SEARCH,
+        filters: Optional[Dict[str, Any]] = None,
+        caller: str = "default",
+        use_cache: bool = True,
+    ) -> List[List[Dict[str, Any]]]:
+        """Same contract as RAGManager.search_similar_batch (and the same cache entries)."""
+        if len(embeddings) == 0:
+            return []
+        if not use_cache:
+            return await self._search_batch(embeddings, top_k, probes, ef_search, filters)
+        generation = self.cache.generation
+        keys = [self.cache.key(e, top_k, filters, probes=probes, ef_search=ef_search) for e in embeddings]
+        results = [self.cache.get(k, caller) for k in keys]
+        missing = [i for i, hits in enumerate(results) if hits is None]
+        if missing:
+            fetched = await self._search_batch([embeddings[i] for i in missing], top_k, probes, ef_search, filters)
+            for i, hits in zip(missing, fetched):
+                self.cache.put(keys[i], hits, generation)
+                results[i] = hits
+        return results
+
+    async def _search_batch(self, embeddings, top_k, probes, ef_search, filters) -> List[List[Dict[str, Any]]]:
+        where, params = build_metadata_filter(filters)
+        route = partition_route(filters)
+        for key in DATE_FILTERS:
+            if f"f_{key}" in params:
+                params[f"f_{key}"] = _as_timestamp(params[f"f_{key}"])
+        pool = await self.connect()
+        results: List[List[Dict[str, Any]]] = [[] for _ in embeddings]
+        async with pool.acquire() as conn:
+            if where == "TRUE":
+                plan = filter_plan(where, params, 1.0, 0, top_k, route)
+            else:
+                plan = filter_plan(where, params, *await self._estimate_selectivity(conn, where, params), top_k, route)
+            # asyncpg treats any non-tuple sequence inside an array parameter as a
+            # sub-array, so each query vector must be a tuple to stay one vector[] element
+            queries = [tuple(np.asarray(e, dtype=np.float32).ravel().tolist()) for e in embeddings]
+            sql, args = to_positional(
+                search_scan_sql(plan),
+                dict(plan["params"], queries=queries, top_k=top_k, candidates=plan["candidates"]),
+            )
+            async with conn.transaction():
+                if plan["strategy"] == "prefilter":
+                    await conn.execute("SET LOCAL enable_indexscan = off;")
+                if probes:
+                    await conn.execute(f"SET LOCAL ivfflat.probes = {int(probes)};")
+                if ef_search:
+                    await conn.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)};")
+                for row in await conn.fetch(sql, *args):
+                    hit = dict(row)
+                    results[hit.pop("query_index")].append(hit)
+        return results
+
+    async def search_similar(self, embedding: Sequence[float], top_k: int = 5, **kwargs) -> List[Dict[str, Any]]:
+        return (await self.search_similar_batch([embedding], top_k=top_k, **kwargs))[0]
+
+    async def search_text(self, query: str, top_k: int = 5, **kwargs) -> List[Dict[str, Any]]:
+        """Embed `query` (off the event loop) and search rag_data."""
+        vector = (await self._embed([query]))[0]
+        return await self.search_similar(vector, top_k=top_k, **kwargs)
+
+    async def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        pool = await self.connect()
+        row = await pool.fetchrow(
+            "SELECT document_id, content, metadata, created_at, updated_at FROM rag_data WHERE document_id = $1;",
+            document_id,
+        )
+        return dict(row) if row else None
+
+    async def delete_documents(self, document_ids: Sequence[str]) -> int:
+        if not document_ids:
+            return 0
+        pool = await self.connect()
+        try:
+            status = await pool.execute("DELETE FROM rag_data WHERE document_id = ANY($1::text[]);", list(document_ids))
+        finally:
+            self.cache.bump()
+        return int(status.split()[-1])
+
+    async def delete_document(self, document_id: str) -> bool:
+        return await self.delete_documents([document_id]) > 0
+
+    # -------------------------------
+    # leads
+    # -------------------------------
+    async def fetch_leads(self, company: Optional[str] = None, source: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent leads, optionally narrowed by company (case-insensitive substring) and source."""
+        clauses, args = [], []
+        if company:
+            args.append(f"%{company}%")
+            clauses.append(f"company ILIKE ${len(args)}")
+        if source:
+            args.append(source)
+            clauses.append(f"source = ${len(args)}")
+        args.append(limit)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        pool = await self.connect()
+        rows = await pool.fetch(f"SELECT * FROM leads {where} ORDER BY created_at DESC, id DESC LIMIT ${len(args)};", *args)
+        return [dict(r) for r in rows]
+
+    async def search_leads(
+        self,
+        q: Optional[str] = None,
+        industry: Optional[str] = None,
+        title: Optional[str] = None,
+        source: Optional[str] = None,
+        sort: str = "recent",
+        cursor: Optional[str] = None,
+        limit: int = 50,
+    ) -> Dict[str, Any]:
+        """One keyset page of fuzzy lead search; {"leads": [...], "next_cursor": str or None}."""
+        query, params = lead_search_sql(q=q, industry=industry, title=title, source=source, sort=sort, cursor=cursor, limit=limit)
+        query, args = to_positional(query, params)
+        pool = await self.connect()
+        rows = await pool.fetch(query, *args)
+        return search_page([dict(r) for r in rows], limit, sort)
+
+    async def get_lead(self, lead_id: int) -> Optional[Dict[str, Any]]:
+        pool = await self.connect()
+        row = await pool.fetchrow("SELECT * FROM leads WHERE id = $1;", lead_id)
+        return dict(row) if row else None
+
+
+_default_db: Optional[AsyncPostgres] = None
+
+
+def get_async_db() -> AsyncPostgres:
+    """Process-wide async data access (one connection pool per process)."""
+    global _default_db
+    if _default_db is None:
+        _default_db = AsyncPostgres()
+    return _default_db
+
+
+async def close_async_db() -> None:
+    if _default_db is not None:
+        await _default_db.close()
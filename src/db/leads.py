@@ -0,0 +1,339 @@
+import base64
+import io
+import json
+import logging
+import os
+import re
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import psycopg2.extras
+
+from src.db.migrations.rag_manager import copy_line
+from src.db.postgresql_connector import ConnectionPool, get_pool
+
+logger = logging.getLogger(__name__)
+
+# Leads per COPY + merge round
+LEADS_BATCH_SIZE = int(os.getenv("LEADS_BATCH_SIZE", "5000"))
+# Page size cap for lead search
+LEADS_SEARCH_MAX_LIMIT = int(os.getenv("LEADS_SEARCH_MAX_LIMIT", "200"))
+# Shortest q: trigram indexes cannot serve shorter patterns
+LEADS_SEARCH_MIN_Q = 3
+# sort="relevance" ranks only this many nearest candidates per name column
+# (trigram KNN on the GiST indexes), so deep relevance pages end there
+LEADS_RELEVANCE_CANDIDATES = int(os.getenv("LEADS_RELEVANCE_CANDIDATES", "500"))
+
+LEAD_SEARCH_SORTS = ("recent", "relevance")
+# Columns returned by lead search (input text and internal keys are left out)
+LEAD_SEARCH_COLUMNS = ("id", "company", "industry", "contact_name", "title", "email", "phone", "source", "created_at", "updated_at")
+
+LEAD_FIELDS = ("company", "industry", "contact_name", "title", "email", "phone", "source")
+
+# Keep in sync with lead_dedupe_key() in _v005_leads_dedupe_key.sql
+_LEGAL_SUFFIX = re.compile(
+    r"( (inc|incorporated|llc|ltd|limited|gmbh|corp|corporation|co|company|plc|sa|ag|bv|pty|srl))+$"
+)
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_SPACES = re.compile(r"\s+")
+_NON_DIGIT = re.compile(r"\D+")
+
+_MERGE_STAGING_SQL = """
+INSERT INTO leads (company, industry, contact_name, title, email, phone, source, dedupe_key)
+SELECT company, industry, contact_name, title, email, phone, source, dedupe_key
+FROM leads_staging
+ON CONFLICT (dedupe_key) DO UPDATE
+SET industry = COALESCE(EXCLUDED.industry, leads.industry),
+    contact_name = COALESCE(EXCLUDED.contact_name, leads.contact_name),
+    title = COALESCE(EXCLUDED.title, leads.title),
+    email = COALESCE(EXCLUDED.email, leads.email),
+    phone = COALESCE(EXCLUDED.phone, leads.phone),
+    updated_at = NOW()
+WHERE (leads.industry, leads.contact_name, leads.title, leads.email, leads.phone)
+      IS DISTINCT FROM
+      (COALESCE(EXCLUDED.industry, leads.industry), COALESCE(EXCLUDED.contact_name, leads.contact_name),
+       COALESCE(EXCLUDED.title, leads.title), COALESCE(EXCLUDED.email, leads.email),
+       COALESCE(EXCLUDED.phone, leads.phone))
+RETURNING (xmax = 0) AS inserted;
+"""
+
+
+def _clean(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    text = _SPACES.sub(" ", str(value)).strip()
+    return text or None
+
+
+def normalize_email(value: Any) -> Optional[str]:
+    email = _clean(value)
+    if email is None:
+        return None
+    email = email.lower().replace(" ", "")
+    if email.startswith("mailto:"):
+        email = email[len("mailto:"):]
+    return email if "@" in email.strip("@") else None
+
+
+def normalize_phone(value: Any) -> Optional[str]:
+    """Digits with a leading "+" when the number was international ("+" or "00" prefix)."""
+    phone = _clean(value)
+    if phone is None:
+        return None
+    digits = _NON_DIGIT.sub("", phone)
+    international = phone.startswith("+") or digits.startswith("00")
+    digits = digits[2:] if digits.startswith("00") else digits
+    if len(digits) < 7:
+        return None
+    return f"+{digits}" if international else digits
+
+
+def company_key(value: Any) -> Optional[str]:
+    """Company name for matching: lower-case alphanumerics without legal suffixes ("Acme, Inc." -> "acme")."""
+    company = _clean(value)
+    if company is None:
+        return None
+    key = _NON_ALNUM.sub(" ", company.lower()).strip()
+    return _LEGAL_SUFFIX.sub("", key).strip() or key or None
+
+
+def dedupe_key(lead: Dict[str, Any]) -> Optional[str]:
+    """
+    Identity of a normalized lead: its email, else contact at company, else
+    phone at company, else the company itself. None when there is no company
+    (leads.company is required).
+    """
+    company = company_key(lead.get("company"))
+    if company is None:
+        return None
+    if lead.get("email"):
+        return f"email:{lead['email']}"
+    if lead.get("contact_name"):
+        return f"contact:{company}|{lead['contact_name'].lower()}"
+    if lead.get("phone"):
+        return f"phone:{company}|{lead['phone'].lstrip('+')}"
+    return f"company:{company}"
+
+
+def normalize_lead(lead: Dict[str, Any], default_source: str = "unknown") -> Dict[str, Any]:
+    """Trimmed/normalized lead fields plus its dedupe_key (None when the lead is unusable)."""
+    out = {field: _clean(lead.get(field)) for field in LEAD_FIELDS}
+    # tools report leads with slightly different field names
+    out["contact_name"] = out["contact_name"] or _clean(lead.get("name"))
+    out["title"] = out["title"] or _clean(lead.get("role"))
+    out["email"] = normalize_email(lead.get("email"))
+    out["phone"] = normalize_phone(lead.get("phone"))
+    out["source"] = out["source"] or default_source
+    out["dedupe_key"] = dedupe_key(out)
+    return out
+
+
+def dedupe_batch(leads: Iterable[Dict[str, Any]], default_source: str = "unknown") -> Dict[str, Any]:
+    """
+    Normalize a batch and collapse leads sharing a dedupe_key (later
+    non-empty fields win, the first source is kept). Returns
+    {"leads": [...], "duplicates": n, "invalid": n}.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    received = invalid = 0
+    for lead in leads:
+        received += 1
+        row = normalize_lead(lead, default_source)
+        key = row["dedupe_key"]
+        if key is None:
+            invalid += 1
+            continue
+        if key in merged:
+            current = merged[key]
+            for field in LEAD_FIELDS:
+                if field not in ("company", "source") and row[field] is not None:
+                    current[field] = row[field]
+        else:
+            merged[key] = row
+    return {"leads": list(merged.values()), "duplicates": received - invalid - len(merged), "invalid": invalid}
+
+
+def upsert_leads(
+    leads: Iterable[Dict[str, Any]],
+    source: str = "unknown",
+    batch_size: int = LEADS_BATCH_SIZE,
+    pool: Optional[ConnectionPool] = None,
+) -> Dict[str, Any]:
+    """
+    Bulk-ingest leads in one transaction.
+
+    Each batch is normalized and deduplicated in memory, COPYed into a temp
+    staging table and merged into `leads` on the unique dedupe_key: new
+    leads are inserted, known ones get their empty fields filled and
+    changed fields updated. `source` is used for leads without one.
+    Returns {"rows", "inserted", "merged", "skipped", "duplicates",
+    "invalid", "unchanged", "batches", "seconds"}; skipped = duplicates +
+    invalid + unchanged.
+    """
+    pool = pool or get_pool()
+    start = time.perf_counter()
+    stats = {"rows": 0, "inserted": 0, "merged": 0, "duplicates": 0, "invalid": 0, "unchanged": 0, "batches": 0}
+    it = iter(leads)
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TEMP TABLE IF NOT EXISTS leads_staging (
+                    company TEXT, industry TEXT, contact_name TEXT, title TEXT,
+                    email TEXT, phone TEXT, source TEXT, dedupe_key TEXT
+                ) ON COMMIT DROP;
+                """
+            )
+            while True:
+                raw = list(islice(it, batch_size))
+                if not raw:
+                    break
+                batch = dedupe_batch(raw, source)
+                stats["rows"] += len(raw)
+                stats["duplicates"] += batch["duplicates"]
+                stats["invalid"] += batch["invalid"]
+                stats["batches"] += 1
+                if not batch["leads"]:
+                    continue
+                buf = io.StringIO("".join(copy_line([lead[f] for f in LEAD_FIELDS] + [lead["dedupe_key"]]) for lead in batch["leads"]))
+                cur.copy_expert(f"COPY leads_staging ({', '.join(LEAD_FIELDS)}, dedupe_key) FROM STDIN", buf)
+                cur.execute(_MERGE_STAGING_SQL)
+                written = [row[0] for row in cur.fetchall()]
+                inserted = sum(written)
+                stats["inserted"] += inserted
+                stats["merged"] += len(written) - inserted
+                stats["unchanged"] += len(batch["leads"]) - len(written)
+                cur.execute("TRUNCATE leads_staging;")
+        conn.commit()
+    stats["skipped"] = stats["duplicates"] + stats["invalid"] + stats["unchanged"]
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info(f"leads upsert: {stats}")
+    return stats
+
+
+def insert_lead(lead: Dict[str, Any], pool: Optional[ConnectionPool] = None) -> Dict[str, Any]:
+    """Upsert a single lead (prefer upsert_leads for more than a handful)."""
+    return upsert_leads([lead], source=lead.get("source") or "unknown", pool=pool)
+
+
+def fetch_leads(limit: int = 50, pool: Optional[ConnectionPool] = None) -> List[Dict[str, Any]]:
+    """Most recently added leads."""
+    pool = pool or get_pool()
+    with pool.connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute("SELECT * FROM leads ORDER BY created_at DESC, id DESC LIMIT %s;", (limit,))
+        return [dict(row) for row in cur.fetchall()]
+
+
+# -------------------------------
+# search
+# -------------------------------
+def encode_cursor(values: List[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError("malformed cursor")
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError("malformed cursor")
+    return values
+
+
+def _like_pattern(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def lead_search_sql(
+    q: Optional[str] = None,
+    industry: Optional[str] = None,
+    title: Optional[str] = None,
+    source: Optional[str] = None,
+    sort: str = "recent",
+    cursor: Optional[str] = None,
+    limit: int = 50,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    One keyset page of lead search, as (sql, params) in psycopg2 style.
+
+    Every predicate has an index from _v006_leads_search_indexes.sql:
+      - q: substring or trigram-similar company / contact name / email
+        (GIN gin_trgm_ops indexes)
+      - title: case-insensitive substring (GIN gin_trgm_ops on title)
+      - industry: case-insensitive equality ((lower(industry), id DESC))
+      - source: equality ((source, id DESC))
+    sort="recent" pages by id (newest first); sort="relevance" (needs q)
+    by trigram score, then id, over a bounded candidate set: the
+    LEADS_RELEVANCE_CANDIDATES nearest companies and contact names by
+    trigram distance (`<->`, GiST indexes from _v008), so a ranked query
+    never scores every match. The query fetches limit + 1 rows so the
+    caller can tell whether another page exists; the cursor of a page is
+    built from its last row (see search_page).
+    """
+    if sort not in LEAD_SEARCH_SORTS:
+        raise ValueError(f"unknown sort: {sort}")
+    if sort == "relevance" and not q:
+        raise ValueError("sort='relevance' needs q")
+    if q is not None and len(q.strip()) < LEADS_SEARCH_MIN_Q:
+        raise ValueError(f"q needs at least {LEADS_SEARCH_MIN_Q} characters")
+    limit = max(1, min(limit, LEADS_SEARCH_MAX_LIMIT))
+    clauses: List[str] = []
+    params: Dict[str, Any] = {"limit": limit + 1}
+    columns = ", ".join(LEAD_SEARCH_COLUMNS)
+    score = "0::float8"
+    if q:
+        params["q"] = q
+        params["q_like"] = _like_pattern(q)
+        clauses.append(
+            "(company ILIKE %(q_like)s OR contact_name ILIKE %(q_like)s OR email ILIKE %(q_like)s"
+            " OR company %% %(q)s OR contact_name %% %(q)s)"
+        )
+        score = "GREATEST(similarity(company, %(q)s), similarity(COALESCE(contact_name, ''), %(q)s))::float8"
+    if industry:
+        params["industry"] = industry.strip().lower()
+        clauses.append("lower(industry) = %(industry)s")
+    if title:
+        params["title_like"] = _like_pattern(title.strip())
+        clauses.append("title ILIKE %(title_like)s")
+    if source:
+        params["source"] = source
+        clauses.append("source = %(source)s")
+    filters = " AND ".join(clauses) or "TRUE"
+    if cursor:
+        after_score, after_id = decode_cursor(cursor)
+        params["after_id"] = int(after_id)
+        if sort == "relevance":
+            params["after_score"] = float(after_score)
+            clauses.append(f"({score} < %(after_score)s OR ({score} = %(after_score)s AND id < %(after_id)s))")
+        else:
+            clauses.append("id < %(after_id)s")
+    where = " AND ".join(clauses) or "TRUE"
+    if sort != "relevance":
+        return f"SELECT {columns}, {score} AS score FROM leads WHERE {where} ORDER BY id DESC LIMIT %(limit)s;", params
+    params["candidates"] = LEADS_RELEVANCE_CANDIDATES
+    candidates = (
+        f"(SELECT id FROM leads WHERE {filters} ORDER BY company <-> %(q)s LIMIT %(candidates)s)"
+        f" UNION (SELECT id FROM leads WHERE {filters} ORDER BY contact_name <-> %(q)s LIMIT %(candidates)s)"
+    )
+    return (
+        f"SELECT {columns}, {score} AS score FROM leads WHERE id IN ({candidates}) AND {where}"
+        " ORDER BY score DESC, id DESC LIMIT %(limit)s;",
+        params,
+    )
+
+
+def search_page(rows: List[Dict[str, Any]], limit: int, sort: str = "recent") -> Dict[str, Any]:
+    """Trim the limit + 1 fetched rows to a page and build the cursor for the next one."""
+    limit = max(1, min(limit, LEADS_SEARCH_MAX_LIMIT))
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and page:
+        last = page[-1]
+        next_cursor = encode_cursor([last["score"] if sort == "relevance" else None, last["id"]])
+    if sort != "relevance":
+        for row in page:
+            row.pop("score", None)
+    return {"leads": page, "next_cursor": next_cursor}
@@ -0,0 +1,163 @@
+import datetime
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from psycopg2 import sql
+
+from src.db.postgresql_connector import ConnectionPool, get_pool
+
+logger = logging.getLogger(__name__)
+
+# Daily agent_logs partitions are created this many days ahead
+AGENT_LOGS_PREMAKE_DAYS = int(os.getenv("AGENT_LOGS_PREMAKE_DAYS", "7"))
+# Raw log partitions ending longer ago than this are dropped
+AGENT_LOGS_RETENTION_DAYS = int(os.getenv("AGENT_LOGS_RETENTION_DAYS", "30"))
+# Hourly rollup rows older than this are deleted
+AGENT_LOGS_ROLLUP_RETENTION_DAYS = int(os.getenv("AGENT_LOGS_ROLLUP_RETENTION_DAYS", "400"))
+# Hours already rolled up are recomputed this far back (the log writer delivers late)
+AGENT_LOGS_ROLLUP_LOOKBACK_HOURS = int(os.getenv("AGENT_LOGS_ROLLUP_LOOKBACK_HOURS", "2"))
+# How often the API process runs maintenance (0 = only via `python -m src.db.log_maintenance`)
+AGENT_LOGS_MAINTENANCE_INTERVAL_S = float(os.getenv("AGENT_LOGS_MAINTENANCE_INTERVAL_S", "3600"))
+
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+_ROLLUP_SQL = """
+INSERT INTO agent_logs_hourly (
+    bucket, agent_name, task_name, calls,
+    latency_ms_sum, latency_ms_min, latency_ms_max, latency_ms_p95, input_chars, output_chars
+)
+SELECT date_trunc('hour', created_at), COALESCE(agent_name, ''), COALESCE(task_name, ''), count(*),
+       sum(latency_ms), min(latency_ms), max(latency_ms),
+       percentile_cont(0.95) WITHIN GROUP (ORDER BY latency_ms),
+       COALESCE(sum(length(input)), 0), COALESCE(sum(length(output)), 0)
+FROM agent_logs
+WHERE created_at >= %(start)s AND created_at < %(end)s
+GROUP BY 1, 2, 3
+ON CONFLICT (bucket, agent_name, task_name) DO UPDATE
+SET calls = EXCLUDED.calls,
+    latency_ms_sum = EXCLUDED.latency_ms_sum,
+    latency_ms_min = EXCLUDED.latency_ms_min,
+    latency_ms_max = EXCLUDED.latency_ms_max,
+    latency_ms_p95 = EXCLUDED.latency_ms_p95,
+    input_chars = EXCLUDED.input_chars,
+    output_chars = EXCLUDED.output_chars;
+"""
+
+
+def partition_upper_bound(bound: str) -> Optional[datetime.datetime]:
+    """Upper end of a range partition bound expression (None for DEFAULT / MAXVALUE)."""
+    match = _UPPER_BOUND.search(bound)
+    if not match:
+        return None
+    value = datetime.datetime.fromisoformat(match.group(1))
+    return value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)
+
+
+def expired_partitions(bounds: Dict[str, str], now: datetime.datetime, retention_days: int) -> List[str]:
+    """Partitions whose whole range lies before now - retention_days (never the default partition)."""
+    cutoff = now - datetime.timedelta(days=retention_days)
+    out = []
+    for name, bound in bounds.items():
+        upper = partition_upper_bound(bound)
+        if upper is not None and upper <= cutoff:
+            out.append(name)
+    return sorted(out)
+
+
+def ensure_partitions(days_ahead: int = AGENT_LOGS_PREMAKE_DAYS, pool: Optional[ConnectionPool] = None) -> List[str]:
+    """Create daily agent_logs partitions from today through `days_ahead`; returns their names."""
+    pool = pool or get_pool()
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT agent_logs_ensure_partition(current_date + n) FROM generate_series(0, %s) AS n;",
+                (days_ahead,),
+            )
+            names = [row[0] for row in cur.fetchall()]
+        conn.commit()
+    return names
+
+
+def partition_bounds(pool: Optional[ConnectionPool] = None) -> Dict[str, str]:
+    """Bound expression per agent_logs partition."""
+    pool = pool or get_pool()
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'agent_logs'::regclass;
+            """
+        )
+        return dict(cur.fetchall())
+
+
+def drop_expired_partitions(retention_days: int = AGENT_LOGS_RETENTION_DAYS, pool: Optional[ConnectionPool] = None) -> List[str]:
+    """Drop raw log partitions older than the retention window (roll them up first)."""
+    pool = pool or get_pool()
+    expired = expired_partitions(partition_bounds(pool), datetime.datetime.now(datetime.timezone.utc), retention_days)
+    for name in expired:
+        with pool.connection() as conn:
+            with conn.cursor() as cur:
+                # do not queue behind long readers while holding up inserts into agent_logs
+                cur.execute("SET LOCAL lock_timeout = '5s';")
+                cur.execute(sql.SQL("DROP TABLE {};").format(sql.Identifier(name)))
+            conn.commit()
+        logger.info(f"agent_logs partition {name} dropped (older than {retention_days} days)")
+    return expired
+
+
+def rollup_hourly(lookback_hours: int = AGENT_LOGS_ROLLUP_LOOKBACK_HOURS, pool: Optional[ConnectionPool] = None) -> Dict[str, Any]:
+    """
+    Recompute agent_logs_hourly from the last rolled-up hour (minus
+    `lookback_hours` for late rows) through the current, partial hour.
+    Idempotent: every bucket in the window is rewritten from raw logs.
+    """
+    pool = pool or get_pool()
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT COALESCE(max(bucket) - make_interval(hours => %s), (SELECT min(date_trunc('hour', created_at)) FROM agent_logs)),
+                       date_trunc('hour', now()) + interval '1 hour'
+                FROM agent_logs_hourly;
+                """,
+                (lookback_hours,),
+            )
+            start, end = cur.fetchone()
+            rows = 0
+            if start is not None:
+                cur.execute(_ROLLUP_SQL, {"start": start, "end": end})
+                rows = cur.rowcount
+        conn.commit()
+    return {"start": start, "end": end, "buckets": rows}
+
+
+def drop_expired_rollups(retention_days: int = AGENT_LOGS_ROLLUP_RETENTION_DAYS, pool: Optional[ConnectionPool] = None) -> int:
+    pool = pool or get_pool()
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM agent_logs_hourly WHERE bucket < now() - make_interval(days => %s);", (retention_days,))
+            deleted = cur.rowcount
+        conn.commit()
+    return deleted
+
+
+def run_maintenance(pool: Optional[ConnectionPool] = None) -> Dict[str, Any]:
+    """Create upcoming partitions, refresh rollups, then apply retention."""
+    pool = pool or get_pool()
+    summary = {
+        "created": ensure_partitions(pool=pool),
+        "rollup": rollup_hourly(pool=pool),
+        "dropped": drop_expired_partitions(pool=pool),
+        "rollups_deleted": drop_expired_rollups(pool=pool),
+    }
+    logger.info(f"agent_logs maintenance: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(run_maintenance())
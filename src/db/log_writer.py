@@ -0,0 +1,283 @@
+import atexit
+import datetime
+import io
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import psycopg2.extras
+
+from src.db.migrations.rag_manager import copy_line
+from src.db.postgresql_connector import ConnectionPool, get_pool
+
+logger = logging.getLogger(__name__)
+
+# Records buffered in memory before the overflow policy applies
+LOG_WRITER_QUEUE_SIZE = int(os.getenv("LOG_WRITER_QUEUE_SIZE", "10000"))
+# A flush starts once this many records are queued ...
+LOG_WRITER_BATCH_SIZE = int(os.getenv("LOG_WRITER_BATCH_SIZE", "500"))
+# ... or this long after the previous one, whichever comes first
+LOG_WRITER_FLUSH_INTERVAL_S = float(os.getenv("LOG_WRITER_FLUSH_INTERVAL_S", "1.0"))
+# What submit() does when the queue is full: "block", "drop_oldest" or "spill"
+LOG_WRITER_OVERFLOW = os.getenv("LOG_WRITER_OVERFLOW", "drop_oldest")
+# Longest a "block" submit waits for room before dropping the record
+LOG_WRITER_BLOCK_TIMEOUT_S = float(os.getenv("LOG_WRITER_BLOCK_TIMEOUT_S", "0.05"))
+# JSON-lines file for "spill": overflow and failed batches go here and are replayed later
+LOG_WRITER_SPILL_PATH = os.getenv("LOG_WRITER_SPILL_PATH", "data/cache/agent_logs.spill.jsonl")
+# "copy" (COPY FROM STDIN) or "values" (one multi-row INSERT per batch)
+LOG_WRITER_METHOD = os.getenv("LOG_WRITER_METHOD", "copy")
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "spill")
+COLUMNS = ("agent_name", "task_name", "input", "output", "latency_ms", "created_at")
+
+Record = Tuple[Any, ...]
+
+
+class AgentLogWriter:
+    """
+    Write-behind logger for agent_logs.
+
+    `submit()` only appends to a bounded in-memory queue (it never touches
+    the database); a background thread writes the queue in batches of up to
+    `batch_size` records, with COPY or one multi-row INSERT, whenever a full
+    batch is waiting or `flush_interval_s` has passed. `created_at` is taken
+    at submit time, so batching does not shift timestamps.
+
+    When the queue is full, `overflow` decides:
+      - "block": wait up to `block_timeout_s` for room, then drop the record
+      - "drop_oldest": discard the oldest queued record to make room
+      - "spill": append the record to `spill_path`
+    Spilled records (and, under "spill", batches whose write failed) are
+    replayed from the file once the queue is empty again. `close()` stops
+    accepting records and writes everything still queued.
+    """
+
+    def __init__(
+        self,
+        pool: Optional[ConnectionPool] = None,
+        queue_size: int = LOG_WRITER_QUEUE_SIZE,
+        batch_size: int = LOG_WRITER_BATCH_SIZE,
+        flush_interval_s: float = LOG_WRITER_FLUSH_INTERVAL_S,
+        overflow: str = LOG_WRITER_OVERFLOW,
+        block_timeout_s: float = LOG_WRITER_BLOCK_TIMEOUT_S,
+        spill_path: Optional[str] = LOG_WRITER_SPILL_PATH,
+        method: str = LOG_WRITER_METHOD,
+        write: Optional[Callable[[List[Record]], None]] = None,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy: {overflow}")
+        if overflow == "spill" and not spill_path:
+            raise ValueError("overflow='spill' needs a spill_path")
+        if method not in ("copy", "values"):
+            raise ValueError(f"unknown write method: {method}")
+        self.pool = pool
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.overflow = overflow
+        self.block_timeout_s = block_timeout_s
+        self.spill_path = spill_path
+        self.method = method
+        self._write = write or self._write_rows
+        self._queue: Deque[Record] = deque()
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._flushing = 0
+        self._stats = {"submitted": 0, "written": 0, "batches": 0, "dropped": 0, "spilled": 0, "replayed": 0, "failed": 0}
+
+    # -------------------------------
+    # producer side
+    # -------------------------------
+    def submit(
+        self,
+        agent_name: str,
+        task_name: str,
+        input_text: str,
+        output_text: str,
+        latency_ms: Optional[float] = None,
+        created_at: Optional[datetime.datetime] = None,
+    ) -> bool:
+        """Queue one agent_logs row; returns False if it was dropped."""
+        record = (agent_name, task_name, input_text, output_text, latency_ms, created_at or datetime.datetime.now(datetime.timezone.utc))
+        spill = False
+        with self._cond:
+            if self._closed:
+                self._stats["dropped"] += 1
+                return False
+            self._stats["submitted"] += 1
+            if len(self._queue) >= self.queue_size:
+                if self.overflow == "drop_oldest":
+                    self._queue.popleft()
+                    self._stats["dropped"] += 1
+                elif self.overflow == "block":
+                    if not self._cond.wait_for(lambda: len(self._queue) < self.queue_size or self._closed, self.block_timeout_s) or self._closed:
+                        self._stats["dropped"] += 1
+                        return False
+                else:
+                    spill = True
+            if not spill:
+                self._queue.append(record)
+                if len(self._queue) >= self.batch_size:
+                    self._cond.notify_all()
+        if spill:
+            self._spill([record])
+        self._ensure_started()
+        return True
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="agent-log-writer", daemon=True)
+                self._thread.start()
+
+    # -------------------------------
+    # background flushing
+    # -------------------------------
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._closed and len(self._queue) < self.batch_size:
+                    self._cond.wait_for(lambda: self._closed or len(self._queue) >= self.batch_size, self.flush_interval_s)
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._flushing = len(batch)
+                # producers blocked on a full queue can continue
+                self._cond.notify_all()
+                finished = self._closed and not self._queue
+            if batch:
+                self._flush(batch)
+            elif not finished:
+                self._replay_spill()
+            with self._cond:
+                self._flushing = 0
+                self._cond.notify_all()
+            if finished:
+                self._replay_spill()
+                return
+
+    def _flush(self, batch: List[Record]) -> bool:
+        try:
+            self._write(batch)
+        except Exception as e:
+            logger.warning(f"agent_logs write of {len(batch)} records failed: {e}")
+            if self.overflow == "spill":
+                self._spill(batch)
+            else:
+                with self._cond:
+                    self._stats["failed"] += len(batch)
+            return False
+        with self._cond:
+            self._stats["written"] += len(batch)
+            self._stats["batches"] += 1
+        return True
+
+    def _write_rows(self, batch: List[Record]) -> None:
+        pool = self.pool or get_pool()
+        with pool.connection() as conn:
+            with conn.cursor() as cur:
+                if self.method == "copy":
+                    buf = io.StringIO("".join(copy_line(record) for record in batch))
+                    cur.copy_expert(f"COPY agent_logs ({', '.join(COLUMNS)}) FROM STDIN", buf)
+                else:
+                    psycopg2.extras.execute_values(
+                        cur, f"INSERT INTO agent_logs ({', '.join(COLUMNS)}) VALUES %s", batch, page_size=len(batch)
+                    )
+            conn.commit()
+
+    # -------------------------------
+    # spill file
+    # -------------------------------
+    def _spill(self, records: Sequence[Record], count: bool = True) -> None:
+        lines = "".join(json.dumps(list(r[:-1]) + [r[-1].isoformat()]) + "\n" for r in records)
+        with self._spill_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        if count:
+            with self._cond:
+                self._stats["spilled"] += len(records)
+
+    def _replay_spill(self) -> None:
+        """Write spilled records back in batches; whatever fails stays in the file."""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        replaying = self.spill_path + ".replay"
+        with self._spill_lock:
+            if not os.path.exists(replaying):
+                os.replace(self.spill_path, replaying)
+        with open(replaying, "r", encoding="utf-8") as f:
+            records = [tuple(row[:-1]) + (datetime.datetime.fromisoformat(row[-1]),) for row in map(json.loads, f) if row]
+        os.remove(replaying)
+        for start in range(0, len(records), self.batch_size):
+            batch = records[start:start + self.batch_size]
+            try:
+                self._write(batch)
+            except Exception as e:
+                logger.warning(f"agent_logs spill replay failed, {len(records) - start} records kept: {e}")
+                self._spill(records[start:], count=False)
+                return
+            with self._cond:
+                self._stats["written"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["replayed"] += len(batch)
+
+    # -------------------------------
+    # lifecycle
+    # -------------------------------
+    def flush(self, timeout_s: Optional[float] = None) -> bool:
+        """Wait until everything queued so far has been written; True if it was."""
+        self._ensure_started()
+        with self._cond:
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._queue and not self._flushing, timeout_s)
+
+    def close(self, timeout_s: Optional[float] = 30.0) -> None:
+        """Stop accepting records and write out everything still queued."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+            pending = bool(self._queue)
+        if thread is None and pending:
+            self._run()
+        elif thread is not None:
+            thread.join(timeout_s)
+            if thread.is_alive():
+                logger.warning(f"agent_logs writer did not finish within {timeout_s}s; {len(self._queue)} records left")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(queued=len(self._queue), queue_size=self.queue_size, overflow=self.overflow)
+        return stats
+
+
+_log_writer: Optional[AgentLogWriter] = None
+_log_writer_lock = threading.Lock()
+
+
+def get_log_writer() -> AgentLogWriter:
+    """Process-wide agent_logs writer; it is flushed at interpreter exit."""
+    global _log_writer
+    with _log_writer_lock:
+        if _log_writer is None:
+            _log_writer = AgentLogWriter()
+            atexit.register(_log_writer.close)
+        return _log_writer
+
+
+def close_log_writer() -> None:
+    """Flush and stop the shared writer (e.g. on application shutdown)."""
+    global _log_writer
+    with _log_writer_lock:
+        writer, _log_writer = _log_writer, None
+    if writer is not None:
+        writer.close()
@@ -0,0 +1,18 @@
+-- HNSW index as an alternative to idx_rag_data_embedding (ivfflat, lists = 100).
+-- Better recall/latency at the cost of build time and memory; needs no training
+-- data, so it stays accurate as rag_data grows. Tune per query with
+-- `SET LOCAL hnsw.ef_search` (see RAGManager.search_similar_batch).
+-- Requires pgvector >= 0.5.0.
+--
+-- Built CONCURRENTLY (outside a transaction) so reads and writes on rag_data
+-- continue during the build; an interrupted build is dropped and redone by
+-- run_migrations.
+-- migrate: no-transaction
+-- migrate: statement_timeout=0
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_rag_data_embedding_hnsw
+    ON rag_data USING hnsw (embedding vector_l2_ops)
+    WITH (m = 16, ef_construction = 64);
+
+-- With both indexes present the planner picks one per query; to standardize
+-- on HNSW, drop the ivfflat index:
+--   DROP INDEX IF EXISTS idx_rag_data_embedding;
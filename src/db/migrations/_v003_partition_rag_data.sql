@@ -0,0 +1,164 @@
+-- List-partition rag_data by partition_key (the normalized metadata "source"
+-- by default, see RAG_PARTITION_FIELD), so searches restricted to one source
+-- or tenant only scan that partition and its own ANN index.
+--
+-- Uniqueness on a partitioned table must include the partition key, so the
+-- upsert target becomes (partition_key, document_id). New sources land in
+-- rag_data_default until RAGManager.ensure_partition() gives them their own
+-- partition; RAGManager.rebuild_partition() reindexes one partition without
+-- touching the others.
+--
+-- Runs online, one statement at a time:
+--   1. create the partitioned table as rag_data_partitioned, with its indexes
+--      (built on the empty table and maintained row by row from then on)
+--   2. a trigger on rag_data mirrors every write into it
+--   3. existing rows are copied in keyset batches, each its own transaction
+--   4. a short swap under lock copies the last rows and renames the tables
+-- Only the swap and the trigger creation take strong locks, each bounded by
+-- lock_timeout and retried. Every step is a no-op once rag_data is
+-- partitioned, so an interrupted run resumes from where it stopped.
+--
+-- The old table is kept as rag_data_unpartitioned; drop it once verified:
+--   DROP TABLE rag_data_unpartitioned;
+-- migrate: no-transaction
+-- migrate: lock_timeout=3s retries=10
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'rag_data'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    CREATE TABLE IF NOT EXISTS rag_data_partitioned (
+        id SERIAL,
+        partition_key TEXT NOT NULL DEFAULT 'default',
+        document_id VARCHAR(255) NOT NULL,
+        content TEXT NOT NULL,
+        embedding VECTOR(1536),
+        metadata JSONB DEFAULT '{}',
+        created_at TIMESTAMP DEFAULT NOW(),
+        updated_at TIMESTAMP DEFAULT NOW(),
+        PRIMARY KEY (partition_key, document_id)
+    ) PARTITION BY LIST (partition_key);
+
+    -- enrichment_pipeline tags documents "tavily" / "agentql" / "jigsawstack"; the tools use "<Name>Tool"
+    CREATE TABLE IF NOT EXISTS rag_data_tavily PARTITION OF rag_data_partitioned FOR VALUES IN ('tavily', 'tavilytool');
+    CREATE TABLE IF NOT EXISTS rag_data_agentql PARTITION OF rag_data_partitioned FOR VALUES IN ('agentql', 'agentqltool');
+    CREATE TABLE IF NOT EXISTS rag_data_jigsawstack PARTITION OF rag_data_partitioned FOR VALUES IN ('jigsawstack', 'jigsawstacktool');
+    CREATE TABLE IF NOT EXISTS rag_data_default PARTITION OF rag_data_partitioned DEFAULT;
+
+    -- Created on the parent, so every partition (including later ones) gets its own
+    CREATE INDEX IF NOT EXISTS idx_rag_data_partitioned_embedding_hnsw ON rag_data_partitioned
+        USING hnsw (embedding vector_l2_ops) WITH (m = 16, ef_construction = 64);
+    CREATE INDEX IF NOT EXISTS idx_rag_data_partitioned_metadata ON rag_data_partitioned USING GIN (metadata);
+    CREATE INDEX IF NOT EXISTS idx_rag_data_partitioned_document_id ON rag_data_partitioned (document_id);
+
+    -- keyset position of the batched copy
+    CREATE TABLE IF NOT EXISTS rag_data_partition_progress (last_id INT NOT NULL);
+    INSERT INTO rag_data_partition_progress (last_id)
+    SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM rag_data_partition_progress);
+END
+$$;
+
+CREATE OR REPLACE FUNCTION rag_data_mirror_to_partitioned()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM rag_data_partitioned WHERE document_id = OLD.document_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO rag_data_partitioned (id, partition_key, document_id, content, embedding, metadata, created_at, updated_at)
+        VALUES (NEW.id, COALESCE(NULLIF(lower(btrim(NEW.metadata->>'source')), ''), 'default'),
+                NEW.document_id, NEW.content, NEW.embedding, NEW.metadata, NEW.created_at, NEW.updated_at)
+        ON CONFLICT (partition_key, document_id) DO UPDATE SET
+            id = EXCLUDED.id, content = EXCLUDED.content, embedding = EXCLUDED.embedding,
+            metadata = EXCLUDED.metadata, created_at = EXCLUDED.created_at, updated_at = EXCLUDED.updated_at;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'rag_data'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+    DROP TRIGGER IF EXISTS trg_rag_data_mirror ON rag_data;
+    CREATE TRIGGER trg_rag_data_mirror
+        AFTER INSERT OR UPDATE OR DELETE ON rag_data
+        FOR EACH ROW
+        EXECUTE FUNCTION rag_data_mirror_to_partitioned();
+END
+$$;
+
+-- Copies the next batch of rows above the saved keyset position and returns
+-- how many it looked at. Rows are locked while copied, so a concurrent update
+-- or delete waits and its mirror trigger then applies on top of the copy.
+CREATE OR REPLACE FUNCTION rag_data_partition_backfill(batch_size INT)
+RETURNS INT AS $$
+DECLARE
+    copied INT;
+    max_id INT;
+BEGIN
+    IF to_regclass('rag_data_partitioned') IS NULL THEN
+        RETURN 0;  -- already swapped
+    END IF;
+    WITH batch AS (
+        SELECT * FROM rag_data
+        WHERE id > (SELECT last_id FROM rag_data_partition_progress)
+        ORDER BY id
+        LIMIT batch_size
+        FOR UPDATE
+    ), moved AS (
+        INSERT INTO rag_data_partitioned (id, partition_key, document_id, content, embedding, metadata, created_at, updated_at)
+        SELECT id, COALESCE(NULLIF(lower(btrim(metadata->>'source')), ''), 'default'),
+               document_id, content, embedding, metadata, created_at, updated_at
+        FROM batch
+        ON CONFLICT (partition_key, document_id) DO NOTHING
+    )
+    SELECT count(*), max(id) INTO copied, max_id FROM batch;
+    IF max_id IS NOT NULL THEN
+        UPDATE rag_data_partition_progress SET last_id = max_id;
+    END IF;
+    RETURN copied;
+END;
+$$ LANGUAGE plpgsql;
+
+-- migrate: backfill batch_size=5000 sleep_ms=50
+SELECT rag_data_partition_backfill(:batch_size);
+
+DO $$
+BEGIN
+    IF to_regclass('rag_data_partitioned') IS NULL THEN
+        RETURN;
+    END IF;
+    LOCK TABLE rag_data IN ACCESS EXCLUSIVE MODE;
+    -- rows written since the last batch are already mirrored; this only
+    -- covers rows that predate the trigger and were not reached yet
+    PERFORM rag_data_partition_backfill(2147483647);
+
+    DROP TRIGGER IF EXISTS trg_rag_data_mirror ON rag_data;
+    DROP TRIGGER IF EXISTS trg_update_rag_data_updated_at ON rag_data;
+    ALTER TABLE rag_data RENAME TO rag_data_unpartitioned;
+    ALTER TABLE rag_data_unpartitioned RENAME CONSTRAINT rag_data_pkey TO rag_data_unpartitioned_pkey;
+    ALTER INDEX IF EXISTS idx_rag_data_embedding RENAME TO idx_rag_data_unpartitioned_embedding;
+    ALTER INDEX IF EXISTS idx_rag_data_embedding_hnsw RENAME TO idx_rag_data_unpartitioned_embedding_hnsw;
+    ALTER INDEX IF EXISTS idx_rag_data_metadata RENAME TO idx_rag_data_unpartitioned_metadata;
+
+    ALTER TABLE rag_data_partitioned RENAME TO rag_data;
+    ALTER TABLE rag_data RENAME CONSTRAINT rag_data_partitioned_pkey TO rag_data_pkey;
+    ALTER INDEX idx_rag_data_partitioned_embedding_hnsw RENAME TO idx_rag_data_embedding_hnsw;
+    ALTER INDEX idx_rag_data_partitioned_metadata RENAME TO idx_rag_data_metadata;
+    ALTER INDEX idx_rag_data_partitioned_document_id RENAME TO idx_rag_data_document_id;
+    CREATE TRIGGER trg_update_rag_data_updated_at
+        BEFORE UPDATE ON rag_data
+        FOR EACH ROW
+        EXECUTE FUNCTION update_rag_data_updated_at();
+
+    PERFORM setval(pg_get_serial_sequence('rag_data', 'id'), GREATEST((SELECT MAX(id) FROM rag_data_unpartitioned), 1));
+    DROP TABLE rag_data_partition_progress;
+END
+$$;
+
+DROP FUNCTION IF EXISTS rag_data_partition_backfill(INT);
+
+DROP FUNCTION IF EXISTS rag_data_mirror_to_partitioned();
@@ -0,0 +1,197 @@
+-- Range-partition agent_logs by day on created_at so retention drops whole
+-- partitions instead of deleting rows, and add hourly per-agent/task
+-- rollups for dashboards (see src/db/log_maintenance.py, which creates
+-- partitions ahead of time, drops expired ones and refreshes the rollups).
+--
+-- Existing rows are moved into one agent_logs_archive partition ending at
+-- the start of today; it expires with the daily partitions. Rows with no
+-- matching partition land in agent_logs_default.
+--
+-- Runs online, the same way as _v003_partition_rag_data.sql: the new table
+-- is built as agent_logs_partitioned, a trigger mirrors writes into it, old
+-- rows are copied in keyset batches and a short swap under lock renames the
+-- tables. Log writers only wait for the trigger creation and the swap.
+--
+-- The old table is kept as agent_logs_unpartitioned; drop it once verified:
+--   DROP TABLE agent_logs_unpartitioned;
+-- migrate: no-transaction
+-- migrate: lock_timeout=3s retries=10
+CREATE TABLE IF NOT EXISTS agent_logs (
+    id SERIAL PRIMARY KEY,
+    agent_name TEXT,
+    task_name TEXT,
+    input TEXT,
+    output TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'agent_logs'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    -- metadata-only: lets the mirror trigger and the copy carry latency_ms
+    ALTER TABLE agent_logs ADD COLUMN IF NOT EXISTS latency_ms DOUBLE PRECISION;
+
+    CREATE TABLE IF NOT EXISTS agent_logs_partitioned (
+        id BIGSERIAL,
+        agent_name TEXT,
+        task_name TEXT,
+        input TEXT,
+        output TEXT,
+        latency_ms DOUBLE PRECISION,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (created_at, id)
+    ) PARTITION BY RANGE (created_at);
+
+    CREATE TABLE IF NOT EXISTS agent_logs_default PARTITION OF agent_logs_partitioned DEFAULT;
+    IF to_regclass('agent_logs_archive') IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE agent_logs_archive PARTITION OF agent_logs_partitioned FOR VALUES FROM (MINVALUE) TO (%L)',
+            current_date::timestamptz
+        );
+    END IF;
+    FOR n IN 0..7 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF agent_logs_partitioned FOR VALUES FROM (%L) TO (%L)',
+            'agent_logs_p' || to_char(current_date + n, 'YYYYMMDD'),
+            (current_date + n)::timestamptz, (current_date + n + 1)::timestamptz
+        );
+    END LOOP;
+
+    -- Created on the parent, so every partition gets its own
+    CREATE INDEX IF NOT EXISTS idx_agent_logs_partitioned_agent_created ON agent_logs_partitioned (agent_name, created_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_agent_logs_partitioned_task_created ON agent_logs_partitioned (task_name, created_at DESC);
+
+    -- keyset position of the batched copy; started_at stands in for a missing
+    -- created_at, so the trigger and the copy place such rows identically
+    CREATE TABLE IF NOT EXISTS agent_logs_partition_progress (
+        last_id BIGINT NOT NULL,
+        started_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+    INSERT INTO agent_logs_partition_progress (last_id)
+    SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM agent_logs_partition_progress);
+END
+$$;
+
+CREATE OR REPLACE FUNCTION agent_logs_mirror_to_partitioned()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM agent_logs_partitioned WHERE id = OLD.id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO agent_logs_partitioned (id, agent_name, task_name, input, output, latency_ms, created_at)
+        VALUES (NEW.id, NEW.agent_name, NEW.task_name, NEW.input, NEW.output, NEW.latency_ms,
+                COALESCE(NEW.created_at, (SELECT started_at FROM agent_logs_partition_progress)))
+        ON CONFLICT (created_at, id) DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'agent_logs'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+    DROP TRIGGER IF EXISTS trg_agent_logs_mirror ON agent_logs;
+    CREATE TRIGGER trg_agent_logs_mirror
+        AFTER INSERT OR UPDATE OR DELETE ON agent_logs
+        FOR EACH ROW
+        EXECUTE FUNCTION agent_logs_mirror_to_partitioned();
+END
+$$;
+
+-- Copies the next batch above the saved keyset position; returns how many rows it looked at
+CREATE OR REPLACE FUNCTION agent_logs_partition_backfill(batch_size INT)
+RETURNS INT AS $$
+DECLARE
+    copied INT;
+    max_id BIGINT;
+BEGIN
+    IF to_regclass('agent_logs_partitioned') IS NULL THEN
+        RETURN 0;  -- already swapped
+    END IF;
+    WITH batch AS (
+        SELECT * FROM agent_logs
+        WHERE id > (SELECT last_id FROM agent_logs_partition_progress)
+        ORDER BY id
+        LIMIT batch_size
+        FOR UPDATE
+    ), moved AS (
+        INSERT INTO agent_logs_partitioned (id, agent_name, task_name, input, output, latency_ms, created_at)
+        SELECT id, agent_name, task_name, input, output, latency_ms,
+               COALESCE(created_at, (SELECT started_at FROM agent_logs_partition_progress))
+        FROM batch
+        ON CONFLICT (created_at, id) DO NOTHING
+    )
+    SELECT count(*), max(id) INTO copied, max_id FROM batch;
+    IF max_id IS NOT NULL THEN
+        UPDATE agent_logs_partition_progress SET last_id = max_id;
+    END IF;
+    RETURN copied;
+END;
+$$ LANGUAGE plpgsql;
+
+-- migrate: backfill batch_size=10000 sleep_ms=50
+SELECT agent_logs_partition_backfill(:batch_size);
+
+DO $$
+BEGIN
+    IF to_regclass('agent_logs_partitioned') IS NULL THEN
+        RETURN;
+    END IF;
+    LOCK TABLE agent_logs IN ACCESS EXCLUSIVE MODE;
+    PERFORM agent_logs_partition_backfill(2147483647);
+
+    DROP TRIGGER IF EXISTS trg_agent_logs_mirror ON agent_logs;
+    ALTER TABLE agent_logs RENAME TO agent_logs_unpartitioned;
+    ALTER TABLE agent_logs_unpartitioned RENAME CONSTRAINT agent_logs_pkey TO agent_logs_unpartitioned_pkey;
+
+    ALTER TABLE agent_logs_partitioned RENAME TO agent_logs;
+    ALTER TABLE agent_logs RENAME CONSTRAINT agent_logs_partitioned_pkey TO agent_logs_pkey;
+    ALTER INDEX idx_agent_logs_partitioned_agent_created RENAME TO idx_agent_logs_agent_created;
+    ALTER INDEX idx_agent_logs_partitioned_task_created RENAME TO idx_agent_logs_task_created;
+
+    PERFORM setval(pg_get_serial_sequence('agent_logs', 'id'), GREATEST((SELECT MAX(id) FROM agent_logs_unpartitioned), 1));
+    DROP TABLE agent_logs_partition_progress;
+END
+$$;
+
+DROP FUNCTION IF EXISTS agent_logs_partition_backfill(INT);
+
+DROP FUNCTION IF EXISTS agent_logs_mirror_to_partitioned();
+
+-- Daily partition agent_logs_pYYYYMMDD covering [day, day + 1); returns its name
+CREATE OR REPLACE FUNCTION agent_logs_ensure_partition(day DATE) RETURNS TEXT AS $$
+DECLARE
+    part TEXT := 'agent_logs_p' || to_char(day, 'YYYYMMDD');
+BEGIN
+    IF to_regclass(part) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF agent_logs FOR VALUES FROM (%L) TO (%L)',
+            part, day::timestamptz, (day + 1)::timestamptz
+        );
+    END IF;
+    RETURN part;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One row per hour, agent and task; recomputed by log_maintenance.rollup_hourly()
+CREATE TABLE IF NOT EXISTS agent_logs_hourly (
+    bucket TIMESTAMPTZ NOT NULL,
+    agent_name TEXT NOT NULL,
+    task_name TEXT NOT NULL,
+    calls BIGINT NOT NULL,
+    latency_ms_sum DOUBLE PRECISION,
+    latency_ms_min DOUBLE PRECISION,
+    latency_ms_max DOUBLE PRECISION,
+    latency_ms_p95 DOUBLE PRECISION,
+    input_chars BIGINT NOT NULL DEFAULT 0,
+    output_chars BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, agent_name, task_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_agent_logs_hourly_agent_bucket ON agent_logs_hourly (agent_name, bucket DESC);
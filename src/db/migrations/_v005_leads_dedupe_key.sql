@@ -0,0 +1,106 @@
+-- Deduplicate leads on a normalized identity (src/db/leads.py dedupe_key):
+-- the email, else contact at company, else phone at company, else the
+-- company itself. Existing duplicates are merged into their oldest row, then
+-- a unique index lets upsert_leads() merge with ON CONFLICT (dedupe_key).
+-- Rows written without a dedupe_key get one from the trigger. Rows whose
+-- company normalizes to nothing ('', '---'; lead_dedupe_key returns NULL)
+-- cannot be matched to anything and get the unique fallback key 'id:<id>'.
+--
+-- Runs outside a transaction so the backfill commits per batch and the
+-- unique index is built CONCURRENTLY; every step is safe to re-run.
+-- migrate: no-transaction
+
+-- Keep in sync with normalize_email / normalize_phone / company_key / dedupe_key in src/db/leads.py
+CREATE OR REPLACE FUNCTION lead_dedupe_key(email TEXT, phone TEXT, company TEXT, contact_name TEXT)
+RETURNS TEXT AS $$
+DECLARE
+    e TEXT := lower(regexp_replace(COALESCE(email, ''), '\s', '', 'g'));
+    p TEXT := regexp_replace(COALESCE(phone, ''), '\D', '', 'g');
+    c TEXT := btrim(regexp_replace(lower(COALESCE(company, '')), '[^a-z0-9]+', ' ', 'g'));
+    n TEXT := lower(btrim(regexp_replace(COALESCE(contact_name, ''), '\s+', ' ', 'g')));
+BEGIN
+    IF e LIKE 'mailto:%' THEN
+        e := substr(e, 8);
+    END IF;
+    IF position('@' IN btrim(e, '@')) = 0 THEN
+        e := '';
+    END IF;
+    IF p LIKE '00%' THEN
+        p := substr(p, 3);
+    END IF;
+    IF length(p) < 7 THEN
+        p := '';
+    END IF;
+    c := COALESCE(NULLIF(btrim(regexp_replace(c, '( (inc|incorporated|llc|ltd|limited|gmbh|corp|corporation|co|company|plc|sa|ag|bv|pty|srl))+$', '')), ''), NULLIF(c, ''));
+    IF c IS NULL THEN
+        RETURN NULL;
+    ELSIF e <> '' THEN
+        RETURN 'email:' || e;
+    ELSIF n <> '' THEN
+        RETURN 'contact:' || c || '|' || n;
+    ELSIF p <> '' THEN
+        RETURN 'phone:' || c || '|' || p;
+    END IF;
+    RETURN 'company:' || c;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- migrate: lock_timeout=3s retries=10
+ALTER TABLE leads ADD COLUMN IF NOT EXISTS dedupe_key TEXT;
+
+CREATE OR REPLACE FUNCTION set_lead_dedupe_key() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.dedupe_key IS NULL THEN
+        NEW.dedupe_key := COALESCE(lead_dedupe_key(NEW.email, NEW.phone, NEW.company, NEW.contact_name), 'id:' || NEW.id);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_set_lead_dedupe_key ON leads;
+
+CREATE TRIGGER trg_set_lead_dedupe_key
+    BEFORE INSERT ON leads
+    FOR EACH ROW
+    EXECUTE FUNCTION set_lead_dedupe_key();
+
+-- Every updated row leaves the dedupe_key IS NULL set (the fallback covers
+-- a NULL key), so each batch makes progress and the backfill ends
+-- migrate: backfill batch_size=5000 sleep_ms=50
+UPDATE leads SET dedupe_key = COALESCE(lead_dedupe_key(email, phone, company, contact_name), 'id:' || id)
+WHERE id IN (SELECT id FROM leads WHERE dedupe_key IS NULL ORDER BY id LIMIT :batch_size);
+
+-- Fold later duplicates into the oldest row (their newest non-empty fields fill its gaps), then delete them
+WITH ranked AS (
+    SELECT id, min(id) OVER (PARTITION BY dedupe_key) AS keeper
+    FROM leads
+    WHERE dedupe_key IS NOT NULL
+),
+dups AS (
+    DELETE FROM leads l
+    USING ranked r
+    WHERE l.id = r.id AND r.id <> r.keeper
+    RETURNING r.keeper, l.id, l.industry, l.contact_name, l.title, l.email, l.phone
+),
+fill AS (
+    SELECT keeper,
+           (array_agg(industry ORDER BY id DESC) FILTER (WHERE industry IS NOT NULL))[1] AS industry,
+           (array_agg(contact_name ORDER BY id DESC) FILTER (WHERE contact_name IS NOT NULL))[1] AS contact_name,
+           (array_agg(title ORDER BY id DESC) FILTER (WHERE title IS NOT NULL))[1] AS title,
+           (array_agg(email ORDER BY id DESC) FILTER (WHERE email IS NOT NULL))[1] AS email,
+           (array_agg(phone ORDER BY id DESC) FILTER (WHERE phone IS NOT NULL))[1] AS phone
+    FROM dups
+    GROUP BY keeper
+)
+UPDATE leads k
+SET industry = COALESCE(k.industry, f.industry),
+    contact_name = COALESCE(k.contact_name, f.contact_name),
+    title = COALESCE(k.title, f.title),
+    email = COALESCE(k.email, f.email),
+    phone = COALESCE(k.phone, f.phone),
+    updated_at = NOW()
+FROM fill f
+WHERE k.id = f.keeper;
+
+-- migrate: statement_timeout=0
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_dedupe_key ON leads (dedupe_key);
@@ -0,0 +1,23 @@
+-- Indexes for lead search (src/db/leads.py lead_search_sql), one per query shape:
+--   q (fuzzy company / contact / email) -> trigram GIN indexes; ILIKE '%q%'
+--                                           and the % similarity operator use them
+--   title substring                      -> trigram GIN on title
+--   industry / source filters            -> (filter, id DESC), which also serve
+--                                           the id keyset pagination
+--   no filter                            -> the primary key
+-- Built CONCURRENTLY so lead writes continue during the builds.
+-- migrate: no-transaction
+-- migrate: statement_timeout=0
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_company_trgm ON leads USING gin (company gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_contact_name_trgm ON leads USING gin (contact_name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_email_trgm ON leads USING gin (email gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_title_trgm ON leads USING gin (title gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_industry_id ON leads (lower(industry), id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_source_id ON leads (source, id DESC);
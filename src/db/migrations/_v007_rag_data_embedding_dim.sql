@@ -0,0 +1,138 @@
+-- Size rag_data.embedding for the configured embedding backend
+-- (:embedding_dim is EMBEDDING_DIM, substituted by run_migrations; 384 for
+-- the default all-MiniLM-L6-v2 and hashing backends). The column was
+-- created as vector(1536), which no default backend produces.
+--
+-- A no-op when the size already matches. Otherwise it runs online, without
+-- rewriting the table:
+--   1. a new embedding_<dim> column is added (metadata only)
+--   2. vectors that already have the new size are copied into it in keyset
+--      batches (only possible when the old column was declared without a
+--      size; a vector(1536) column holds none)
+--   3. its HNSW index is built CONCURRENTLY, one partition at a time, and
+--      attached to an index on the parent
+--   4. a short swap renames the columns and the index
+-- Vectors of the old size cannot be converted: they stay in
+-- embedding_<old dim> and the new column is NULL for those rows until
+-- RAGManager.reembed_missing() recomputes them. No ivfflat index is built;
+-- it would be trained on an empty column. RAGManager and AsyncPostgres
+-- refuse to start while the embedder and the column disagree, so restart
+-- them after the swap; changing EMBEDDING_DIM later needs a new migration
+-- like this one.
+--
+-- Drop the old vectors once re-embedded:
+--   ALTER TABLE rag_data DROP COLUMN embedding_1536;
+-- migrate: no-transaction
+-- migrate: lock_timeout=3s retries=10
+DO $$
+BEGIN
+    IF (SELECT atttypmod FROM pg_attribute WHERE attrelid = 'rag_data'::regclass AND attname = 'embedding') = :embedding_dim THEN
+        RETURN;
+    END IF;
+    ALTER TABLE rag_data ADD COLUMN IF NOT EXISTS embedding_:embedding_dim vector(:embedding_dim);
+
+    -- keyset position of the batched copy
+    CREATE TABLE IF NOT EXISTS rag_data_embedding_progress (
+        partition_key TEXT NOT NULL,
+        document_id TEXT NOT NULL
+    );
+    INSERT INTO rag_data_embedding_progress (partition_key, document_id)
+    SELECT '', '' WHERE NOT EXISTS (SELECT 1 FROM rag_data_embedding_progress);
+END
+$$;
+
+-- Copies the next batch's vectors that fit the new size; returns how many rows it looked at
+CREATE OR REPLACE FUNCTION rag_data_embedding_backfill(batch_size INT)
+RETURNS INT AS $$
+DECLARE
+    seen INT;
+    last TEXT[];
+BEGIN
+    -- already swapped, or the old column's fixed size rules out any match
+    IF to_regclass('rag_data_embedding_progress') IS NULL
+       OR (SELECT atttypmod FROM pg_attribute WHERE attrelid = 'rag_data'::regclass AND attname = 'embedding') > 0 THEN
+        RETURN 0;
+    END IF;
+    WITH batch AS (
+        SELECT r.partition_key, r.document_id, r.embedding
+        FROM rag_data r, rag_data_embedding_progress p
+        WHERE (r.partition_key, r.document_id::text) > (p.partition_key, p.document_id)
+        ORDER BY r.partition_key, r.document_id
+        LIMIT batch_size
+        FOR UPDATE OF r
+    ), copied AS (
+        UPDATE rag_data r SET embedding_:embedding_dim = b.embedding::vector(:embedding_dim)
+        FROM batch b
+        WHERE r.partition_key = b.partition_key AND r.document_id = b.document_id
+          AND vector_dims(b.embedding) = :embedding_dim
+    )
+    SELECT count(*), (array_agg(ARRAY[partition_key, document_id::text] ORDER BY partition_key DESC, document_id DESC))[1]
+    INTO seen, last FROM batch;
+    IF last IS NOT NULL THEN
+        UPDATE rag_data_embedding_progress SET partition_key = last[1], document_id = last[2];
+    END IF;
+    RETURN seen;
+END;
+$$ LANGUAGE plpgsql;
+
+-- migrate: backfill batch_size=5000 sleep_ms=50
+SELECT rag_data_embedding_backfill(:batch_size);
+
+-- Invalid until every partition's index is attached; the planner ignores it until then
+DO $$
+BEGIN
+    IF to_regclass('rag_data_embedding_progress') IS NOT NULL THEN
+        CREATE INDEX IF NOT EXISTS idx_rag_data_embedding_hnsw_new ON ONLY rag_data
+            USING hnsw (embedding_:embedding_dim vector_l2_ops) WITH (m = 16, ef_construction = 64);
+    END IF;
+END
+$$;
+
+-- migrate: gexec statement_timeout=0
+SELECT format(
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS %I ON %I USING hnsw (embedding_:embedding_dim vector_l2_ops) WITH (m = 16, ef_construction = 64);',
+    left(c.relname, 40) || '_embedding_' || :embedding_dim || '_hnsw', c.relname
+)
+FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'rag_data'::regclass AND to_regclass('idx_rag_data_embedding_hnsw_new') IS NOT NULL;
+
+DO $$
+DECLARE
+    part RECORD;
+BEGIN
+    IF to_regclass('idx_rag_data_embedding_hnsw_new') IS NULL THEN
+        RETURN;
+    END IF;
+    FOR part IN
+        SELECT left(c.relname, 40) || '_embedding_' || :embedding_dim || '_hnsw' AS idx
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'rag_data'::regclass
+    LOOP
+        IF NOT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(part.idx)) THEN
+            EXECUTE format('ALTER INDEX idx_rag_data_embedding_hnsw_new ATTACH PARTITION %I', part.idx);
+        END IF;
+    END LOOP;
+END
+$$;
+
+DO $$
+DECLARE
+    old_dim INT := (SELECT atttypmod FROM pg_attribute WHERE attrelid = 'rag_data'::regclass AND attname = 'embedding');
+BEGIN
+    IF to_regclass('rag_data_embedding_progress') IS NULL THEN
+        RETURN;
+    END IF;
+    IF NOT (SELECT indisvalid FROM pg_index WHERE indexrelid = 'idx_rag_data_embedding_hnsw_new'::regclass) THEN
+        RAISE EXCEPTION 'idx_rag_data_embedding_hnsw_new is missing on a partition created meanwhile; run the migration again';
+    END IF;
+    LOCK TABLE rag_data IN ACCESS EXCLUSIVE MODE;
+    DROP INDEX IF EXISTS idx_rag_data_embedding_hnsw;
+    EXECUTE format('ALTER TABLE rag_data RENAME COLUMN embedding TO %I',
+                   'embedding_' || CASE WHEN old_dim > 0 THEN old_dim::text ELSE 'unsized' END);
+    ALTER TABLE rag_data RENAME COLUMN embedding_:embedding_dim TO embedding;
+    ALTER INDEX idx_rag_data_embedding_hnsw_new RENAME TO idx_rag_data_embedding_hnsw;
+    DROP TABLE rag_data_embedding_progress;
+END
+$$;
+
+DROP FUNCTION IF EXISTS rag_data_embedding_backfill(INT);
@@ -0,0 +1,10 @@
+-- GiST trigram indexes for ranked lead search (sort=relevance in
+-- src/db/leads.py lead_search_sql). GIN (_v006) finds matches but cannot
+-- order by similarity; GiST serves `ORDER BY company <-> q LIMIT n` as a
+-- nearest-neighbour scan, which bounds the candidates that get scored.
+-- Built CONCURRENTLY so lead writes continue during the builds.
+-- migrate: no-transaction
+-- migrate: statement_timeout=0
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_company_trgm_gist ON leads USING gist (company gist_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_contact_name_trgm_gist ON leads USING gist (contact_name gist_trgm_ops);
@@ -1,91 +1,660 @@
-import psycopg2
-import psycopg2.extras
-import os
-from typing import List, Dict, Any, Optional
-
-# Load database credentials from env vars
-DB_CONFIG = {
-    "dbname": os.getenv("POSTGRES_DB", "csa_db"),
-    "user": os.getenv("POSTGRES_USER", "csa_user"),
-    "password": os.getenv("POSTGRES_PASSWORD", "csa_pass"),
-    "host": os.getenv("POSTGRES_HOST", "localhost"),
-    "port": os.getenv("POSTGRES_PORT", "5432"),
-}
-
-
-class RAGManager:
-    def __init__(self):
-        self.conn = psycopg2.connect(**DB_CONFIG)
-
-    def insert_document(self, document_id: str, content: str, embedding: List[float], metadata: Optional[Dict[str, Any]] = None):
-        """Insert a new document into rag_data table"""
-        with self.conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO rag_data (document_id, content, embedding, metadata)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (document_id) DO UPDATE
-                SET content = EXCLUDED.content,
-                    embedding = EXCLUDED.embedding,
-                    metadata = EXCLUDED.metadata,
-                    updated_at = NOW();
-                """,
-                (document_id, content, embedding, psycopg2.extras.Json(metadata or {})),
-            )
-            self.conn.commit()
-
-    def search_similar(self, embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search documents by vector similarity"""
-        with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute(
-                """
-                SELECT document_id, content, metadata, embedding <-> %s::vector AS distance
-                FROM rag_data
-                ORDER BY embedding <-> %s::vector
-                LIMIT %s;
-                """,
-                (embedding, embedding, top_k),
-            )
-            return cur.fetchall()
-
-    def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
-        """Retrieve a single document by ID"""
-        with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("SELECT * FROM rag_data WHERE document_id = %s;", (document_id,))
-            return cur.fetchone()
-
-    def delete_document(self, document_id: str):
-        """Delete a document by ID"""
-        with self.conn.cursor() as cur:
-            cur.execute("DELETE FROM rag_data WHERE document_id = %s;", (document_id,))
-            self.conn.commit()
-
-    def close(self):
-        """Close database connection"""
-        self.conn.close()
-
-
-# -------------------------------
-# Quick test usage (manual run)
-# -------------------------------
-if __name__ == "__main__":
-    import numpy as np
-
-    rag = RAGManager()
-
-    # Insert a demo document with random embedding
-    demo_embedding = np.random.rand(1536).astype(float).tolist()
-    rag.insert_document(
-        document_id="doc_001",
-        content="This is a sample research document about data intelligence.",
-        embedding=demo_embedding,
-        metadata={"source": "demo", "category": "research"}
-    )
-
-    print("Inserted doc_001 ✅")
-
-    # Search similar
-    results = rag.search_similar(demo_embedding, top_k=3)
-    print("Search results:", results)
-
+import psycopg2
+import psycopg2.extras
+import io
+import json
+import logging
+import math
+import os
+import re
+import time
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple
+
+from psycopg2 import sql
+
+from src.db.postgresql_connector import ConnectionPool, get_pool
+from src.rag_pipeline.embeddings import check_embedding_dim, get_embedding_service
+from src.rag_pipeline.partitioned_index import RAG_PARTITION_FIELD, partition_key, partition_keys
+from src.rag_pipeline.retrieval_cache import RetrievalCache, get_retrieval_cache
+
+logger = logging.getLogger(__name__)
+
+# Rows per COPY / execute_values batch for bulk loads
+BULK_BATCH_SIZE = int(os.getenv("RAG_BULK_BATCH_SIZE", "5000"))
+
+# Default ANN search knobs (unset = server defaults): ivfflat lists probed, hnsw beam width
+RAG_IVFFLAT_PROBES = int(os.getenv("RAG_IVFFLAT_PROBES", "0")) or None
+RAG_HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "0")) or None
+
+# ensure_partition(): rows moved per commit, and how long each of its steps waits for a lock
+PARTITION_MOVE_BATCH_SIZE = int(os.getenv("RAG_PARTITION_MOVE_BATCH_SIZE", "5000"))
+PARTITION_LOCK_TIMEOUT = os.getenv("RAG_PARTITION_LOCK_TIMEOUT", "5s")
+
+# COPY text-format escapes
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+# rag_data is list-partitioned by partition_key (_v003); a document whose
+# partition changed is removed from its old partition before the upsert
+_MERGE_STAGING_SQL = """
+    DELETE FROM rag_data r
+    USING rag_data_staging s
+    WHERE r.document_id = s.document_id AND r.partition_key <> s.partition_key;
+
+    INSERT INTO rag_data (partition_key, document_id, content, embedding, metadata)
+    SELECT DISTINCT ON (document_id) partition_key, document_id, content, embedding, metadata
+    FROM rag_data_staging
+    ORDER BY document_id, seq DESC
+    ON CONFLICT (partition_key, document_id) DO UPDATE
+    SET content = EXCLUDED.content,
+        embedding = EXCLUDED.embedding,
+        metadata = EXCLUDED.metadata,
+        updated_at = NOW();
+"""
+
+# Declared size of rag_data.embedding (pgvector keeps it in atttypmod); NULL without the table
+EMBEDDING_COLUMN_DIM_SQL = """
+    SELECT atttypmod FROM pg_attribute
+    WHERE attrelid = to_regclass('rag_data') AND attname = 'embedding' AND NOT attisdropped;
+"""
+
+# Filtered search planning: filters matching at most this fraction of rows are
+# searched exactly (pre-filter); broader ones oversample the ANN scan and filter after.
+FILTER_PREFILTER_SELECTIVITY = float(os.getenv("RAG_FILTER_PREFILTER_SELECTIVITY", "0.05"))
+FILTER_MAX_OVERSAMPLE = int(os.getenv("RAG_FILTER_MAX_OVERSAMPLE", "20"))
+FILTER_ESTIMATE_TTL_S = 60.0
+
+# Filter keys on dedicated columns; every other key is a metadata containment match
+DATE_FILTERS = {"created_after": ">=", "created_before": "<"}
+# Filter keys are user input: only plain identifiers are accepted
+_FILTER_KEY = re.compile(r"^\w+$")
+
+
+def build_metadata_filter(filters: Optional[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Turn filters into a WHERE clause and named parameters.
+
+    Scalar values (source, category, tenant, product, ...) are folded into one
+    `metadata @> '{...}'` containment test so idx_rag_data_metadata (GIN) can
+    serve it; a list value matches any of its items; created_after /
+    created_before bound rag_data.created_at. No filters -> "TRUE".
+    Keys never reach the SQL text (placeholders are numbered and keys only
+    appear inside the JSON parameter values); a key that is not a plain
+    identifier raises ValueError.
+    """
+    clauses: List[str] = []
+    params: Dict[str, Any] = {}
+    contained: Dict[str, Any] = {}
+    for key, value in sorted((filters or {}).items()):
+        if not isinstance(key, str) or not _FILTER_KEY.match(key):
+            raise ValueError(f"invalid filter key: {key!r}")
+        if value is None:
+            continue
+        if key in DATE_FILTERS:
+            name = f"f_{key}"
+            clauses.append(f"created_at {DATE_FILTERS[key]} %({name})s")
+            params[name] = value
+        elif isinstance(value, (list, tuple, set)):
+            options = []
+            for item in sorted(value, key=str):
+                name = f"f_{len(params)}"
+                options.append(f"metadata @> %({name})s::jsonb")
+                params[name] = json.dumps({key: item})
+            clauses.append("(" + " OR ".join(options) + ")" if options else "FALSE")
+        else:
+            contained[key] = value
+    if contained:
+        clauses.insert(0, "metadata @> %(f_contains)s::jsonb")
+        params["f_contains"] = json.dumps(contained, sort_keys=True, default=str)
+    return (" AND ".join(clauses) or "TRUE"), params
+
+
+def partition_route(filters: Optional[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Partitions a filter confines the search to: a RAG_PARTITION_FIELD filter
+    (one value or a list) becomes `partition_key = ANY(...)`, which lets the
+    planner prune every other partition. No such filter -> "TRUE".
+    """
+    value = (filters or {}).get(RAG_PARTITION_FIELD)
+    if value is None:
+        return "TRUE", {}
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    return "partition_key = ANY(%(f_partitions)s)", {"f_partitions": partition_keys(values)}
+
+
+def filter_plan(
+    where: str,
+    params: Dict[str, Any],
+    selectivity: float,
+    estimated: int,
+    top_k: int,
+    route: Tuple[str, Dict[str, Any]] = ("TRUE", {}),
+) -> Dict[str, Any]:
+    """Pick the filtered-search strategy for a filter with the given estimated selectivity."""
+    params = dict(params, **route[1])
+    if where == "TRUE":
+        return {"strategy": "none", "where": where, "route": route[0], "params": params, "candidates": top_k}
+    if selectivity <= FILTER_PREFILTER_SELECTIVITY:
+        strategy, candidates = "prefilter", top_k
+    else:
+        oversample = min(FILTER_MAX_OVERSAMPLE, max(2, math.ceil(2.0 / selectivity)))
+        strategy, candidates = "postfilter", top_k * oversample
+    return {
+        "strategy": strategy,
+        "where": where,
+        "route": route[0],
+        "params": params,
+        "selectivity": round(selectivity, 6),
+        "estimated_rows": estimated,
+        "candidates": candidates,
+    }
+
+
+def search_scan_sql(plan: Dict[str, Any]) -> str:
+    """
+    Batched top-k query for a filter plan: the %(queries)s vectors are
+    unnested WITH ORDINALITY and each drives a LATERAL scan of rag_data,
+    restricted to the plan's partitions. Parameters: queries (vector[]),
+    top_k, candidates, plus the filter's own.
+    """
+    route = plan.get("route", "TRUE")
+    if plan["strategy"] == "postfilter":
+        scan = f"""
+            SELECT document_id, content, metadata, distance FROM (
+                SELECT document_id, content, metadata, created_at, embedding <-> q.embedding AS distance
+                FROM rag_data
+                WHERE {route}
+                ORDER BY embedding <-> q.embedding
+                LIMIT %(candidates)s
+            ) c
+            WHERE {plan["where"]}
+            ORDER BY distance
+            LIMIT %(top_k)s
+        """
+    else:
+        scan = f"""
+            SELECT document_id, content, metadata, embedding <-> q.embedding AS distance
+            FROM rag_data
+            WHERE {route} AND {plan["where"]}
+            ORDER BY embedding <-> q.embedding
+            LIMIT %(top_k)s
+        """
+    return f"""
+        SELECT q.ord - 1 AS query_index, r.document_id, r.content, r.metadata, r.distance
+        FROM unnest(%(queries)s::vector[]) WITH ORDINALITY AS q(embedding, ord)
+        CROSS JOIN LATERAL ({scan}) r
+        ORDER BY q.ord, r.distance;
+    """
+
+
+def vector_literal(embedding) -> str:
+    """pgvector text form: [x1,x2,...]"""
+    return "[" + ",".join(repr(float(x)) for x in embedding) + "]"
+
+
+def copy_line(values: Iterable[Any]) -> str:
+    """One COPY text-format line; None becomes \\N."""
+    return "\t".join("\\N" if v is None else str(v).translate(_COPY_ESCAPES) for v in values) + "\n"
+
+
+class RAGManager:
+    def __init__(self, embedder=None, cache: Optional[RetrievalCache] = None, pool: Optional[ConnectionPool] = None):
+        # Connections are borrowed per call from the shared pool
+        self.pool = pool or get_pool()
+        # Shared batching/caching embedding service unless a specific embedder is given
+        self.embedder = embedder or get_embedding_service()
+        # Search results are cached until the next write through any RAGManager in this process
+        self.cache = cache or get_retrieval_cache()
+        # filter -> (timestamp, selectivity, estimated rows)
+        self._filter_estimates: Dict[Tuple[str, str], Tuple[float, float, int]] = {}
+        # the embedder's dimension must match the rag_data.embedding column
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(EMBEDDING_COLUMN_DIM_SQL)
+            row = cur.fetchone()
+        check_embedding_dim(self.embedder, row[0] if row else None)
+
+    def insert_document(self, document_id: str, content: str, embedding: Optional[List[float]] = None, metadata: Optional[Dict[str, Any]] = None):
+        """Insert a new document into rag_data table (embedding computed when omitted)"""
+        if embedding is None:
+            embedding = self.embedder.embed([content])[0].tolist()
+        key = partition_key(metadata or {})
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM rag_data WHERE document_id = %s AND partition_key <> %s;", (document_id, key))
+            cur.execute(
+                """
+                INSERT INTO rag_data (partition_key, document_id, content, embedding, metadata)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (partition_key, document_id) DO UPDATE
+                SET content = EXCLUDED.content,
+                    embedding = EXCLUDED.embedding,
+                    metadata = EXCLUDED.metadata,
+                    updated_at = NOW();
+                """,
+                (key, document_id, content, embedding, psycopg2.extras.Json(metadata or {})),
+            )
+            conn.commit()
+        self.cache.bump()
+
+    def bulk_upsert(self, rows: Iterable[Dict[str, Any]], batch_size: int = BULK_BATCH_SIZE, method: str = "copy") -> Dict[str, Any]:
+        """
+        Upsert many documents in a single transaction.
+
+        `rows` is any iterable (a generator is consumed batch by batch) of dicts
+        with document_id, content and optional embedding / metadata; missing
+        embeddings are computed per batch in one embedder call.
+          - method="copy": COPY each batch into a temp staging table, then merge
+            it into rag_data with one INSERT ... SELECT ... ON CONFLICT
+          - method="values": execute_values with one page per batch
+        A document_id repeated in the input keeps its last row.
+        Returns {"rows", "batches", "seconds", "rows_per_s", "method"}.
+        """
+        if method not in ("copy", "values"):
+            raise ValueError(f"unknown bulk method: {method}")
+        start = time.perf_counter()
+        total = batches = 0
+        it = iter(rows)
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                if method == "copy":
+                    cur.execute(
+                        """
+                        CREATE TEMP TABLE IF NOT EXISTS rag_data_staging (
+                            seq BIGINT, partition_key TEXT, document_id VARCHAR(255), content TEXT,
+                            embedding VECTOR, metadata JSONB
+                        ) ON COMMIT DROP;
+                        """
+                    )
+                while True:
+                    batch = list(islice(it, batch_size))
+                    if not batch:
+                        break
+                    missing = [i for i, r in enumerate(batch) if r.get("embedding") is None]
+                    if missing:
+                        vectors = self.embedder.embed([batch[i]["content"] for i in missing])
+                        for i, vec in zip(missing, vectors):
+                            batch[i] = dict(batch[i], embedding=vec)
+                    if method == "copy":
+                        self._copy_batch(cur, batch, total)
+                    else:
+                        self._values_batch(cur, batch)
+                    total += len(batch)
+                    batches += 1
+                conn.commit()
+        finally:
+            self.cache.bump()
+        elapsed = time.perf_counter() - start
+        stats = {
+            "rows": total,
+            "batches": batches,
+            "seconds": round(elapsed, 3),
+            "rows_per_s": round(total / elapsed, 1) if elapsed else 0.0,
+            "method": method,
+        }
+        logger.info(f"rag_data bulk upsert: {stats}")
+        return stats
+
+    def reembed_missing(self, batch_size: int = BULK_BATCH_SIZE) -> int:
+        """
+        Embed rows stored without a vector (e.g. after _v007 resized the
+        column; vectors of the old size stay in embedding_<old dim>), one
+        committed batch at a time; returns the number of rows updated.
+        """
+        total = 0
+        while True:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute("SELECT partition_key, document_id, content FROM rag_data WHERE embedding IS NULL LIMIT %s;", (batch_size,))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                vectors = self.embedder.embed([r[2] for r in rows])
+                psycopg2.extras.execute_values(
+                    cur,
+                    """
+                    UPDATE rag_data r SET embedding = v.embedding::vector
+                    FROM (VALUES %s) AS v(partition_key, document_id, embedding)
+                    WHERE r.partition_key = v.partition_key AND r.document_id = v.document_id;
+                    """,
+                    [(key, doc_id, vector_literal(vec)) for (key, doc_id, _), vec in zip(rows, vectors)],
+                    page_size=len(rows),
+                )
+                conn.commit()
+            total += len(rows)
+            self.cache.bump()
+        return total
+
+    def _copy_batch(self, cur, batch: List[Dict[str, Any]], offset: int) -> None:
+        buf = io.StringIO()
+        for seq, r in enumerate(batch, start=offset):
+            metadata = r.get("metadata") or {}
+            buf.write(copy_line((seq, partition_key(metadata), r["document_id"], r["content"], vector_literal(r["embedding"]), json.dumps(metadata))))
+        buf.seek(0)
+        cur.copy_expert("COPY rag_data_staging (seq, partition_key, document_id, content, embedding, metadata) FROM STDIN", buf)
+        cur.execute(_MERGE_STAGING_SQL)
+        cur.execute("TRUNCATE rag_data_staging;")
+
+    def _values_batch(self, cur, batch: List[Dict[str, Any]]) -> None:
+        # ON CONFLICT cannot touch the same row twice in one statement: keep the last row per id
+        latest = {r["document_id"]: r for r in batch}
+        keys = {doc_id: partition_key(r.get("metadata") or {}) for doc_id, r in latest.items()}
+        cur.execute(
+            """
+            DELETE FROM rag_data r
+            USING unnest(%s::text[], %s::text[]) AS n(document_id, partition_key)
+            WHERE r.document_id = n.document_id AND r.partition_key <> n.partition_key;
+            """,
+            (list(keys), list(keys.values())),
+        )
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            INSERT INTO rag_data (partition_key, document_id, content, embedding, metadata)
+            VALUES %s
+            ON CONFLICT (partition_key, document_id) DO UPDATE
+            SET content = EXCLUDED.content,
+                embedding = EXCLUDED.embedding,
+                metadata = EXCLUDED.metadata,
+                updated_at = NOW();
+            """,
+            [(keys[r["document_id"]], r["document_id"], r["content"], vector_literal(r["embedding"]), psycopg2.extras.Json(r.get("metadata") or {})) for r in latest.values()],
+            template="(%s, %s, %s, %s::vector, %s)",
+            page_size=len(latest),
+        )
+
+    def _estimate_selectivity(self, where: str, params: Dict[str, Any]) -> Tuple[float, int]:
+        """Planner estimate (EXPLAIN, not executed) of the fraction and number of rows matching `where`."""
+        key = (where, json.dumps(params, sort_keys=True, default=str))
+        cached = self._filter_estimates.get(key)
+        if cached and time.monotonic() - cached[0] < FILTER_ESTIMATE_TTL_S:
+            return cached[1], cached[2]
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM rag_data WHERE {where}", params)
+            estimated = int(cur.fetchone()[0][0]["Plan"]["Plan Rows"])
+            cur.execute("SELECT GREATEST(reltuples, 1)::bigint FROM pg_class WHERE oid = 'rag_data'::regclass;")
+            total = int(cur.fetchone()[0])
+        selectivity = min(1.0, estimated / max(total, estimated, 1))
+        self._filter_estimates[key] = (time.monotonic(), selectivity, estimated)
+        return selectivity, estimated
+
+    def plan_filter(self, filters: Optional[Dict[str, Any]], top_k: int) -> Dict[str, Any]:
+        """
+        Choose how to combine a metadata filter with vector search:
+          - "prefilter": selective filter -> exact distance scan over the rows
+            the GIN index returns (the ANN index is skipped so top-k stays full)
+          - "postfilter": broad filter -> ANN scan of top_k / selectivity
+            candidates (capped at FILTER_MAX_OVERSAMPLE x), filtered afterwards
+        """
+        where, params = build_metadata_filter(filters)
+        route = partition_route(filters)
+        if where == "TRUE":
+            return filter_plan(where, params, 1.0, 0, top_k, route)
+        selectivity, estimated = self._estimate_selectivity(where, params)
+        return filter_plan(where, params, selectivity, estimated, top_k, route)
+
+    def search_similar_batch(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        top_k: int = 5,
+        probes: Optional[int] = RAG_IVFFLAT_PROBES,
+        ef_search: Optional[int] = RAG_HNSW_EF_SEARCH,
+        filters: Optional[Dict[str, Any]] = None,
+        caller: str = "default",
+        use_cache: bool = True,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Nearest documents for several query vectors in one round trip.
+
+        Queries are unnested WITH ORDINALITY and each one drives a LATERAL
+        top-k scan, so the ANN index is used per query. `probes` (ivfflat) and
+        `ef_search` (hnsw) trade recall for latency and apply to this call only
+        (SET LOCAL). `filters` restrict results by metadata / date, with the
+        strategy picked by `plan_filter`. Queries answered by the retrieval
+        cache are not sent (hit rates are tracked per `caller`). Returns one
+        result list per query, nearest first.
+        """
+        if not embeddings:
+            return []
+        if not use_cache:
+            return self._search_batch(embeddings, top_k, probes, ef_search, filters)
+        generation = self.cache.generation
+        keys = [self.cache.key(e, top_k, filters, probes=probes, ef_search=ef_search) for e in embeddings]
+        results = [self.cache.get(k, caller) for k in keys]
+        missing = [i for i, hits in enumerate(results) if hits is None]
+        if missing:
+            fetched = self._search_batch([embeddings[i] for i in missing], top_k, probes, ef_search, filters)
+            for i, hits in zip(missing, fetched):
+                self.cache.put(keys[i], hits, generation)
+                results[i] = hits
+        return results
+
+    def _search_batch(self, embeddings, top_k, probes, ef_search, filters) -> List[List[Dict[str, Any]]]:
+        plan = self.plan_filter(filters, top_k)
+        scan = search_scan_sql(plan)
+        params = dict(plan["params"], queries=[vector_literal(e) for e in embeddings], top_k=top_k, candidates=plan["candidates"])
+        results: List[List[Dict[str, Any]]] = [[] for _ in embeddings]
+        # the SET LOCAL settings end with the read transaction, which the pool rolls back on release
+        with self.pool.connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            if plan["strategy"] == "prefilter":
+                # an ANN index scan would filter after a fixed-size candidate list
+                cur.execute("SET LOCAL enable_indexscan = off;")
+            if probes:
+                cur.execute("SET LOCAL ivfflat.probes = %s;", (int(probes),))
+            if ef_search:
+                cur.execute("SET LOCAL hnsw.ef_search = %s;", (int(ef_search),))
+            cur.execute(scan, params)
+            for row in cur.fetchall():
+                results[row.pop("query_index")].append(row)
+        return results
+
+    def search_similar(self, embedding: List[float], top_k: int = 5, **kwargs) -> List[Dict[str, Any]]:
+        """Search documents by vector similarity"""
+        return self.search_similar_batch([embedding], top_k=top_k, **kwargs)[0]
+
+    def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Retrieve a single document by ID"""
+        with self.pool.connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute("SELECT * FROM rag_data WHERE document_id = %s;", (document_id,))
+            return cur.fetchone()
+
+    def delete_document(self, document_id: str):
+        """Delete a document by ID"""
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM rag_data WHERE document_id = %s;", (document_id,))
+            conn.commit()
+        self.cache.bump()
+
+    def delete_documents(self, document_ids: List[str]) -> int:
+        """Delete many documents in one statement; returns the number deleted"""
+        if not document_ids:
+            return 0
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM rag_data WHERE document_id = ANY(%s);", (list(document_ids),))
+            deleted = cur.rowcount
+            conn.commit()
+        self.cache.bump()
+        return deleted
+
+    def _partition_table(self, cur, key: str) -> Optional[str]:
+        """Partition of rag_data holding `key` (rag_data_default for keys without their own)."""
+        cur.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT' AS is_default
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'rag_data'::regclass
+              AND (position(quote_literal(%s) IN pg_get_expr(c.relpartbound, c.oid)) > 0
+                   OR pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT')
+            ORDER BY is_default;
+            """,
+            (key,),
+        )
+        rows = cur.fetchall()
+        return rows[0][0] if rows else None
+
+    def ensure_partition(self, key: str) -> str:
+        """
+        Give partition `key` its own table (rows already in rag_data_default
+        are moved into it); returns the table name. Existing partitions are left alone.
+
+        Runs online on a connection of its own (closed afterwards) without a
+        statement timeout, and never holds a strong lock while the work grows
+        with the data:
+          1. rows are moved out of rag_data_default in batches of
+             PARTITION_MOVE_BATCH_SIZE, one commit each (a delete and an
+             upsert in one statement, so a row is always in exactly one table)
+          2. a NOT VALID CHECK (partition_key <> key) on rag_data_default stops
+             new rows for `key` landing there; stragglers are moved, then the
+             CHECK is validated without blocking other writes
+          3. one short transaction (bounded by PARTITION_LOCK_TIMEOUT) attaches
+             the table; both CHECKs let ATTACH skip scanning either table
+        Until the attach, moved rows are missing from searches and writes for
+        `key` fail once the CHECK is in place. If a step fails the CHECK is
+        dropped again, and calling again resumes with the rows already moved.
+        """
+        key = partition_keys([key])[0]
+        table = "rag_data_p_" + re.sub(r"[^a-z0-9_]", "_", key)[:40]
+        ident = sql.Identifier(table)
+        own_check = sql.Identifier(table + "_key")
+        default_check = sql.Identifier("rag_data_default_not_" + table[len("rag_data_p_"):])
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                current = self._partition_table(cur, key)
+            conn.rollback()
+            if current and current != "rag_data_default":
+                return current
+            # session-level settings: the connection is closed instead of returned to the pool
+            self.pool.discard(conn)
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("SET statement_timeout = 0;")
+                cur.execute("SET lock_timeout = %s;", (PARTITION_LOCK_TIMEOUT,))
+                # a table left by an interrupted run is reused and topped up
+                cur.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} (LIKE rag_data INCLUDING DEFAULTS INCLUDING INDEXES);").format(ident))
+                cur.execute(
+                    sql.SQL("ALTER TABLE {} DROP CONSTRAINT IF EXISTS {}, ADD CONSTRAINT {} CHECK (partition_key = %s);").format(
+                        ident, own_check, own_check
+                    ),
+                    (key,),
+                )
+                try:
+                    self._move_partition_rows(cur, ident, key)
+                    cur.execute(
+                        sql.SQL(
+                            "ALTER TABLE rag_data_default DROP CONSTRAINT IF EXISTS {}, "
+                            "ADD CONSTRAINT {} CHECK (partition_key <> %s) NOT VALID;"
+                        ).format(default_check, default_check),
+                        (key,),
+                    )
+                    # rows written between the last batch and the CHECK
+                    self._move_partition_rows(cur, ident, key)
+                    cur.execute(sql.SQL("ALTER TABLE rag_data_default VALIDATE CONSTRAINT {};").format(default_check))
+                    conn.autocommit = False
+                    cur.execute(sql.SQL("ALTER TABLE rag_data ATTACH PARTITION {} FOR VALUES IN (%s);").format(ident), (key,))
+                    cur.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {};").format(ident, own_check))
+                    cur.execute(sql.SQL("ALTER TABLE rag_data_default DROP CONSTRAINT {};").format(default_check))
+                    conn.commit()
+                except Exception:
+                    if not conn.autocommit:
+                        conn.rollback()
+                        conn.autocommit = True
+                    cur.execute(sql.SQL("ALTER TABLE rag_data_default DROP CONSTRAINT IF EXISTS {};").format(default_check))
+                    raise
+        self.cache.bump()
+        logger.info(f"rag_data partition {table} created for {key!r}")
+        return table
+
+    @staticmethod
+    def _move_partition_rows(cur, ident: sql.Identifier, key: str) -> int:
+        """Move `key`'s rows from rag_data_default into `ident` in autocommitted batches; returns how many moved."""
+        moved = 0
+        while True:
+            cur.execute(
+                sql.SQL(
+                    """
+                    WITH batch AS (
+                        DELETE FROM rag_data_default
+                        WHERE partition_key = %s AND document_id IN (
+                            SELECT document_id FROM rag_data_default WHERE partition_key = %s
+                            ORDER BY document_id LIMIT %s
+                        )
+                        RETURNING *
+                    )
+                    INSERT INTO {} SELECT * FROM batch
+                    ON CONFLICT (partition_key, document_id) DO UPDATE
+                    SET id = EXCLUDED.id,
+                        content = EXCLUDED.content,
+                        embedding = EXCLUDED.embedding,
+                        metadata = EXCLUDED.metadata,
+                        created_at = EXCLUDED.created_at,
+                        updated_at = EXCLUDED.updated_at
+                    RETURNING document_id;
+                    """
+                ).format(ident),
+                (key, key, PARTITION_MOVE_BATCH_SIZE),
+            )
+            count = len(cur.fetchall())
+            moved += count
+            if count < PARTITION_MOVE_BATCH_SIZE:
+                return moved
+
+    def rebuild_partition(self, key: str) -> str:
+        """
+        REINDEX the partition holding `key` CONCURRENTLY (its ANN, metadata
+        and id indexes); other partitions keep serving reads and writes.
+        Returns the partition's table name.
+        """
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                table = self._partition_table(cur, partition_keys([key])[0])
+            conn.rollback()
+            if table is None:
+                raise ValueError(f"no rag_data partition for {key!r}")
+            # session-level settings: the connection is closed instead of returned to the pool
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("SET statement_timeout = 0;")
+                cur.execute(sql.SQL("REINDEX TABLE CONCURRENTLY {};").format(sql.Identifier(table)))
+            self.pool.discard(conn)
+        logger.info(f"rag_data partition {table} reindexed")
+        return table
+
+    def partition_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Estimated rows and size per rag_data partition."""
+        with self.pool.connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT c.relname AS partition, pg_get_expr(c.relpartbound, c.oid) AS bound,
+                       GREATEST(c.reltuples, 0)::bigint AS rows, pg_total_relation_size(c.oid) AS bytes
+                FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'rag_data'::regclass
+                ORDER BY c.relname;
+                """
+            )
+            rows = cur.fetchall()
+        return {r.pop("partition"): dict(r) for r in rows}
+
+    def close(self):
+        """Nothing to release: connections go back to the pool after every call"""
+
+
+# -------------------------------
+# Quick test usage (manual run)
+# -------------------------------
+if __name__ == "__main__":
+    import numpy as np
+
+    rag = RAGManager()
+
+    # Insert a demo document with random embedding
+    demo_embedding = np.random.rand(rag.embedder.dim).astype(float).tolist()
+    rag.insert_document(
+        document_id="doc_001",
+        content="This is a sample research document about data intelligence.",
+        embedding=demo_embedding,
+        metadata={"source": "demo", "category": "research"}
+    )
+
+    print("Inserted doc_001 ✅")
+
+    # Search similar
+    results = rag.search_similar(demo_embedding, top_k=3)
+    print("Search results:", results)
+
     rag.close()
\ No newline at end of file
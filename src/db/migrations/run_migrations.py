@@ -1,63 +1,341 @@
-import os
-import psycopg2
-from psycopg2 import sql
-from pathlib import Path
-from src.db.postgresql_connector import get_connection
-
-MIGRATIONS_DIR = Path(__file__).parent
-
-def ensure_migrations_table(conn):
-    """Ensure the schema_migrations table exists."""
-    with conn.cursor() as cur:
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS schema_migrations (
-                id SERIAL PRIMARY KEY,
-                filename VARCHAR(255) NOT NULL UNIQUE,
-                applied_at TIMESTAMP NOT NULL DEFAULT NOW()
-            );
-        """)
-    conn.commit()
-
-def get_applied_migrations(conn):
-    """Fetch list of already applied migrations."""
-    with conn.cursor() as cur:
-        cur.execute("SELECT filename FROM schema_migrations;")
-        rows = cur.fetchall()
-    return {row[0] for row in rows}
-
-def apply_migration(conn, migration_file):
-    """Apply a single migration file."""
-    with open(migration_file, "r", encoding="utf-8") as f:
-        sql_commands = f.read()
-
-    with conn.cursor() as cur:
-        cur.execute(sql_commands)
-        cur.execute(
-            "INSERT INTO schema_migrations (filename) VALUES (%s) ON CONFLICT DO NOTHING;",
-            (os.path.basename(migration_file),),
-        )
-    conn.commit()
-    print(f"✅ Applied migration: {migration_file}")
-
-def run_migrations():
-    """Run all pending migrations in order."""
-    conn = get_connection()
-    try:
-        ensure_migrations_table(conn)
-
-        applied = get_applied_migrations(conn)
-
-        # Run in lexicographic order (e.g. 001_x.sql, 002_y.sql)
-        migration_files = sorted(MIGRATIONS_DIR.glob("*.sql"))
-
-        for migration_file in migration_files:
-            if migration_file.name not in applied:
-                apply_migration(conn, migration_file)
-            else:
-                print(f"⚡ Skipping already applied: {migration_file.name}")
-
-    finally:
-        conn.close()
-
-if __name__ == "__main__":
-    run_migrations()
\ No newline at end of file
+import os
+import random
+import re
+import time
+import psycopg2
+import psycopg2.errors
+from psycopg2 import sql
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from src.db.postgresql_connector import get_connection, get_pool
+from src.rag_pipeline.embeddings import EMBEDDING_DIM
+
+MIGRATIONS_DIR = Path(__file__).parent
+
+# Defaults for every statement; a migration can change them with directives (see parse_migration)
+MIGRATION_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+MIGRATION_STATEMENT_TIMEOUT = os.getenv("MIGRATION_STATEMENT_TIMEOUT", "0")
+# Attempts per statement (no-transaction) or per file (transactional) when a lock is not granted in time
+MIGRATION_RETRIES = int(os.getenv("MIGRATION_RETRIES", "5"))
+MIGRATION_RETRY_BACKOFF_S = float(os.getenv("MIGRATION_RETRY_BACKOFF_S", "1.0"))
+# Backfill defaults: rows per batch (each batch commits) and pause between batches
+MIGRATION_BACKFILL_BATCH_SIZE = int(os.getenv("MIGRATION_BACKFILL_BATCH_SIZE", "5000"))
+MIGRATION_BACKFILL_SLEEP_MS = int(os.getenv("MIGRATION_BACKFILL_SLEEP_MS", "50"))
+# pg_advisory_lock key held while migrating, so only one process runs migrations at a time
+MIGRATION_ADVISORY_LOCK_ID = int(os.getenv("MIGRATION_ADVISORY_LOCK_ID", "7263740048"))
+
+# Configuration-dependent values a migration refers to as :name
+MIGRATION_VARIABLES = {"embedding_dim": EMBEDDING_DIM}
+
+DIRECTIVE_PREFIX = "-- migrate:"
+# Errors worth retrying: the lock was not granted within lock_timeout, or a deadlock victim
+RETRYABLE_ERRORS = (psycopg2.errors.LockNotAvailable, psycopg2.errors.DeadlockDetected)
+
+_TRANSACTION_CONTROL = re.compile(r"^(BEGIN|START\s+TRANSACTION|COMMIT|END)\s*;?$", re.IGNORECASE)
+_CONCURRENT_INDEX = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w.\"]+)", re.IGNORECASE
+)
+_DOLLAR_TAG = re.compile(r"\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$")
+# :name, but not the second colon of a ::type cast
+_VARIABLE = re.compile(r"(?<!:):([A-Za-z_]\w*)")
+
+
+def split_statements(script: str) -> List[str]:
+    """
+    Split a SQL script on top-level semicolons, keeping quoted strings,
+    identifiers, comments and $tag$ bodies intact. Each statement keeps its
+    leading comments (where directives live).
+    """
+    statements, start, i, n = [], 0, 0, len(script)
+    while i < n:
+        ch = script[i]
+        if script.startswith("--", i):
+            end = script.find("\n", i)
+            i = n if end < 0 else end + 1
+            continue
+        if script.startswith("/*", i):
+            end = script.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        if ch in ("'", '"'):
+            end = i + 1
+            while end < n:
+                if script[end] == ch:
+                    if end + 1 < n and script[end + 1] == ch:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            i = end + 1
+            continue
+        if ch == "$":
+            tag = _DOLLAR_TAG.match(script, i)
+            if tag:
+                end = script.find(tag.group(0), tag.end())
+                i = n if end < 0 else end + len(tag.group(0))
+                continue
+        if ch == ";":
+            statements.append(script[start:i + 1].strip())
+            start = i + 1
+        i += 1
+    tail = script[start:].strip()
+    if any(line.strip() and not line.strip().startswith("--") for line in tail.splitlines()):
+        statements.append(tail)
+    return [s for s in statements if s]
+
+
+def _parse_directive(line: str) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for token in line[len(DIRECTIVE_PREFIX):].split():
+        key, sep, value = token.partition("=")
+        out[key.replace("-", "_")] = value if sep else True
+    return out
+
+
+def parse_migration(script: str, variables: Optional[Dict[str, Any]] = None) -> Tuple[bool, List[Dict[str, Any]]]:
+    """
+    Split a migration into steps and read its `-- migrate:` directives.
+
+    Directives are comment lines in front of a statement:
+      -- migrate: no-transaction
+          the whole file runs outside a transaction, one statement at a time
+          (needed for CREATE INDEX CONCURRENTLY); statements should be
+          idempotent, since a failed run is resumed from the top
+      -- migrate: lock_timeout=5s statement_timeout=10min retries=10
+          settings for this statement and every later one in the file
+      -- migrate: backfill batch_size=10000 sleep_ms=100
+          the next statement is repeated, each run in its own transaction,
+          until it affects fewer than batch_size rows; it must use
+          :batch_size (e.g. in a LIMIT) and skip rows already done. A
+          SELECT reports its progress as the number it returns instead,
+          e.g. `SELECT copy_batch(:batch_size);` for a function that keeps
+          its own keyset position
+      -- migrate: gexec
+          the next statement is a query whose rows are statements, each run
+          as a step of its own (like psql's \\gexec), e.g. one CREATE INDEX
+          CONCURRENTLY per partition; no-transaction files only
+    :name placeholders from `variables` (default MIGRATION_VARIABLES, e.g.
+    :embedding_dim) are replaced with their values; other :words are left alone.
+    Explicit BEGIN/COMMIT statements are dropped: the runner owns the transaction.
+    Returns (transactional, steps) with one {"sql", "settings", "backfill", "gexec"} per statement.
+    """
+    variables = MIGRATION_VARIABLES if variables is None else variables
+    transactional = True
+    settings = {"lock_timeout": MIGRATION_LOCK_TIMEOUT, "statement_timeout": MIGRATION_STATEMENT_TIMEOUT, "retries": MIGRATION_RETRIES}
+    steps = []
+    for statement in split_statements(script):
+        backfill = None
+        gexec = False
+        body = []
+        for line in statement.splitlines():
+            if line.strip().startswith(DIRECTIVE_PREFIX):
+                directive = _parse_directive(line.strip())
+                if directive.pop("no_transaction", False):
+                    transactional = False
+                if directive.pop("backfill", False):
+                    backfill = {
+                        "batch_size": int(directive.pop("batch_size", MIGRATION_BACKFILL_BATCH_SIZE)),
+                        "sleep_ms": int(directive.pop("sleep_ms", MIGRATION_BACKFILL_SLEEP_MS)),
+                    }
+                if directive.pop("gexec", False):
+                    gexec = True
+                for key in ("lock_timeout", "statement_timeout", "retries"):
+                    if key in directive:
+                        settings[key] = int(directive[key]) if key == "retries" else directive[key]
+            elif not line.strip().startswith("--"):
+                body.append(line)
+        text = "\n".join(body).strip()
+        if not text or _TRANSACTION_CONTROL.match(text):
+            continue
+        if backfill:
+            if ":batch_size" not in text:
+                raise ValueError(f"backfill statement must use :batch_size: {text[:80]}")
+            text = text.replace(":batch_size", str(backfill["batch_size"]))
+        text = _VARIABLE.sub(lambda m: str(variables[m.group(1)]) if m.group(1) in variables else m.group(0), text)
+        steps.append({"sql": text, "settings": dict(settings), "backfill": backfill, "gexec": gexec})
+    if transactional and any(step["gexec"] for step in steps):
+        raise ValueError("gexec needs a no-transaction migration")
+    return transactional, steps
+
+
+def ensure_migrations_table(conn):
+    """Ensure the schema_migrations table exists."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                id SERIAL PRIMARY KEY,
+                filename VARCHAR(255) NOT NULL UNIQUE,
+                applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+            );
+        """)
+    conn.commit()
+
+def get_applied_migrations(conn):
+    """Fetch list of already applied migrations."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT filename FROM schema_migrations;")
+        rows = cur.fetchall()
+    conn.commit()
+    return {row[0] for row in rows}
+
+def _set_timeouts(cur, settings: Dict[str, Any], local: bool) -> None:
+    scope = "SET LOCAL" if local else "SET"
+    for key in ("lock_timeout", "statement_timeout"):
+        cur.execute(sql.SQL(scope + " {} = %s;").format(sql.Identifier(key)), (str(settings[key]),))
+
+def _with_retries(run, retries: int, what: str):
+    """Run `run()`, retrying lock timeouts and deadlocks with jittered exponential backoff."""
+    for attempt in range(1, max(retries, 1) + 1):
+        try:
+            return run()
+        except RETRYABLE_ERRORS as e:
+            if attempt >= retries:
+                raise
+            delay = MIGRATION_RETRY_BACKOFF_S * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            print(f"🔒 {what}: {e.pgerror.strip() if e.pgerror else e} (attempt {attempt}/{retries}, retrying in {delay:.1f}s)")
+            time.sleep(delay)
+
+def _drop_invalid_index(cur, statement: str) -> None:
+    """A failed CREATE INDEX CONCURRENTLY leaves an INVALID index that IF NOT EXISTS would keep; drop it first."""
+    match = _CONCURRENT_INDEX.search(statement)
+    if not match:
+        return
+    name = match.group(1).replace('"', "")
+    cur.execute(
+        "SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(%s) AND NOT indisvalid;",
+        (name,),
+    )
+    if cur.fetchone():
+        print(f"🧹 Dropping invalid index left by an interrupted build: {name}")
+        cur.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {};").format(sql.Identifier(*name.split("."))))
+
+def _run_backfill(conn, step: Dict[str, Any]) -> int:
+    """Repeat a batched statement, one transaction per batch, until a batch comes up short."""
+    batch_size, sleep_s = step["backfill"]["batch_size"], step["backfill"]["sleep_ms"] / 1000
+    total = 0
+    while True:
+        def batch():
+            with conn.cursor() as cur:
+                _set_timeouts(cur, step["settings"], local=True)
+                cur.execute(step["sql"])
+                count = cur.rowcount
+                if cur.description is not None:
+                    row = cur.fetchone()
+                    count = int(row[0]) if row and row[0] is not None else 0
+            conn.commit()
+            return count
+
+        def attempt():
+            try:
+                return batch()
+            except Exception:
+                conn.rollback()
+                raise
+
+        count = _with_retries(attempt, step["settings"]["retries"], "backfill batch")
+        total += max(count, 0)
+        if count < batch_size:
+            return total
+        time.sleep(sleep_s)
+
+def _run_autocommit(conn, step: Dict[str, Any], what: str) -> None:
+    """Run one statement outside a transaction (retried on its own)."""
+    def run():
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                _set_timeouts(cur, step["settings"], local=False)
+                _drop_invalid_index(cur, step["sql"])
+                cur.execute(step["sql"])
+        finally:
+            conn.autocommit = False
+
+    _with_retries(run, step["settings"]["retries"], what)
+
+def _record(conn, migration_file) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO schema_migrations (filename) VALUES (%s) ON CONFLICT DO NOTHING;",
+            (os.path.basename(migration_file),),
+        )
+
+def apply_migration(conn, migration_file):
+    """
+    Apply a single migration file. Transactional files run as one
+    transaction (retried as a whole when a lock is not granted in time);
+    `no-transaction` files run statement by statement in autocommit mode,
+    with each statement retried on its own. Backfill steps commit per batch.
+    """
+    with open(migration_file, "r", encoding="utf-8") as f:
+        transactional, steps = parse_migration(f.read())
+    name = os.path.basename(migration_file)
+
+    if transactional and not any(step["backfill"] for step in steps):
+        def run_file():
+            try:
+                with conn.cursor() as cur:
+                    for step in steps:
+                        _set_timeouts(cur, step["settings"], local=True)
+                        cur.execute(step["sql"])
+                _record(conn, migration_file)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        retries = min((step["settings"]["retries"] for step in steps), default=MIGRATION_RETRIES)
+        _with_retries(run_file, retries, name)
+    else:
+        # backfills need their own transactions per batch, so their file runs step by step
+        for step in steps:
+            if step["backfill"]:
+                rows = _run_backfill(conn, step)
+                print(f"   backfilled {rows} rows")
+                continue
+            if step["gexec"]:
+                with conn.cursor() as cur:
+                    cur.execute(step["sql"])
+                    generated = [row[0] for row in cur.fetchall()]
+                conn.commit()
+                for statement in generated:
+                    _run_autocommit(conn, dict(step, sql=statement), name)
+                continue
+            _run_autocommit(conn, step, name)
+        _record(conn, migration_file)
+        conn.commit()
+    print(f"✅ Applied migration: {migration_file}")
+
+def run_migrations(migrations_dir: Optional[Path] = None):
+    """
+    Run all pending migrations in order. An advisory lock serializes
+    concurrent runners (e.g. several pods starting at once): the others
+    wait, then find the migrations already applied.
+    """
+    with get_connection() as conn:
+        # session-level settings and the advisory lock must not outlive this run
+        get_pool().discard(conn)
+        with conn.cursor() as cur:
+            cur.execute("SET statement_timeout = 0;")
+            cur.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_ADVISORY_LOCK_ID,))
+        conn.commit()
+        try:
+            ensure_migrations_table(conn)
+
+            applied = get_applied_migrations(conn)
+
+            # Run in lexicographic order (e.g. 001_x.sql, 002_y.sql)
+            migration_files = sorted((migrations_dir or MIGRATIONS_DIR).glob("*.sql"))
+
+            for migration_file in migration_files:
+                if migration_file.name not in applied:
+                    apply_migration(conn, migration_file)
+                else:
+                    print(f"⚡ Skipping already applied: {migration_file.name}")
+        finally:
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_ADVISORY_LOCK_ID,))
+            conn.commit()
+
+if __name__ == "__main__":
+    run_migrations()
@@ -1,36 +1,299 @@
-import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
-
-POSTGRES_URI = os.getenv("POSTGRES_URI")
-
-def get_connection():
-    return psycopg2.connect(POSTGRES_URI, cursor_factory=RealDictCursor)
-
-def init_db():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS agent_logs (
-            id SERIAL PRIMARY KEY,
-            agent_name TEXT,
-            task_name TEXT,
-            input TEXT,
-            output TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-    """)
-    conn.commit()
-    cur.close()
-    conn.close()
-
-def log_agent_output(agent_name: str, task_name: str, input_text: str, output_text: str):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO agent_logs (agent_name, task_name, input, output) VALUES (%s, %s, %s, %s);",
-        (agent_name, task_name, input_text, output_text)
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
\ No newline at end of file
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+logger = logging.getLogger(__name__)
+
+POSTGRES_URI = os.getenv("POSTGRES_URI")
+
+# Connection parameters used when POSTGRES_URI is not set
+DB_CONFIG = {
+    "dbname": os.getenv("POSTGRES_DB", "csa_db"),
+    "user": os.getenv("POSTGRES_USER", "csa_user"),
+    "password": os.getenv("POSTGRES_PASSWORD", "csa_pass"),
+    "host": os.getenv("POSTGRES_HOST", "localhost"),
+    "port": os.getenv("POSTGRES_PORT", "5432"),
+}
+
+# Pool sizing and connection hygiene
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# A connection is closed and replaced after this many checkouts
+DB_POOL_RECYCLE_USES = int(os.getenv("DB_POOL_RECYCLE_USES", "1000"))
+# How long a caller waits for a free connection before PoolTimeout
+DB_POOL_WAIT_TIMEOUT_S = float(os.getenv("DB_POOL_WAIT_TIMEOUT_S", "10"))
+# Connections idle longer than this are pinged (SELECT 1) before being handed out
+DB_POOL_HEALTHCHECK_IDLE_S = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE_S", "30"))
+# Server-side statement_timeout for every pooled connection (0 = none)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool's wait timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 connection pool.
+
+    Callers borrow a connection with `connection()` and must commit their
+    own work; anything left uncommitted is rolled back when it is returned.
+    Connections are opened lazily up to `max_size` (the first checkout
+    opens `min_size`), pinged before reuse when they sat idle for a while,
+    replaced after `recycle_uses` checkouts or after any error, and carry a
+    server-side statement timeout. When all are busy, callers queue for up
+    to `wait_timeout_s`; time spent waiting is reported by `metrics()`.
+    """
+
+    def __init__(
+        self,
+        dsn: Optional[str] = POSTGRES_URI,
+        min_size: int = DB_POOL_MIN_SIZE,
+        max_size: int = DB_POOL_MAX_SIZE,
+        recycle_uses: int = DB_POOL_RECYCLE_USES,
+        wait_timeout_s: float = DB_POOL_WAIT_TIMEOUT_S,
+        healthcheck_idle_s: float = DB_POOL_HEALTHCHECK_IDLE_S,
+        statement_timeout_ms: int = DB_STATEMENT_TIMEOUT_MS,
+        connect=None,
+    ):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError(f"invalid pool sizes: min={min_size} max={max_size}")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.recycle_uses = recycle_uses
+        self.wait_timeout_s = wait_timeout_s
+        self.healthcheck_idle_s = healthcheck_idle_s
+        self.statement_timeout_ms = statement_timeout_ms
+        self._connect_fn = connect or self._connect_psycopg2
+        self._idle: Deque[Any] = deque()
+        # id(conn) -> {"uses": checkouts so far, "returned_at": monotonic time, "discard": close on return}
+        self._meta: Dict[int, Dict[str, Any]] = {}
+        self._size = 0
+        self._closed = False
+        self._prefilled = False
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0, "waits": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0, "timeouts": 0,
+            "created": 0, "recycled": 0, "discarded": 0, "health_check_failures": 0,
+        }
+
+    def _connect_psycopg2(self):
+        options = f"-c statement_timeout={self.statement_timeout_ms}" if self.statement_timeout_ms else None
+        if self.dsn:
+            return psycopg2.connect(self.dsn, options=options)
+        return psycopg2.connect(options=options, **DB_CONFIG)
+
+    def _open(self):
+        conn = self._connect_fn()
+        with self._cond:
+            self._meta[id(conn)] = {"uses": 0, "returned_at": time.monotonic(), "discard": False}
+            self._stats["created"] += 1
+        return conn
+
+    def _healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        idle_s = time.monotonic() - self._meta.get(id(conn), {}).get("returned_at", 0.0)
+        if idle_s < self.healthcheck_idle_s:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _close_quietly(self, conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _prefill(self) -> None:
+        with self._cond:
+            if self._prefilled:
+                return
+            self._prefilled = True
+            missing = max(0, self.min_size - self._size)
+            self._size += missing
+        opened = 0
+        try:
+            for _ in range(missing):
+                conn = self._open()
+                opened += 1
+                with self._cond:
+                    self._idle.append(conn)
+                    self._cond.notify()
+        finally:
+            if opened < missing:
+                with self._cond:
+                    self._size -= missing - opened
+                    self._cond.notify_all()
+
+    def _record_wait(self, start: float) -> None:
+        waited_ms = (time.monotonic() - start) * 1000
+        if waited_ms >= 1.0:
+            self._stats["waits"] += 1
+        self._stats["wait_ms_total"] += waited_ms
+        self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], waited_ms)
+
+    def getconn(self, timeout_s: Optional[float] = None):
+        """Borrow a connection (prefer `connection()`, which always returns it)."""
+        if not self._prefilled:
+            self._prefill()
+        timeout_s = self.wait_timeout_s if timeout_s is None else timeout_s
+        start = time.monotonic()
+        conn = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = timeout_s - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    self._record_wait(start)
+                    raise PoolTimeout(f"no database connection free after {timeout_s:.1f}s (max_size={self.max_size})")
+                self._cond.wait(remaining)
+            self._stats["checkouts"] += 1
+            self._record_wait(start)
+
+        if conn is not None and not self._healthy(conn):
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+                self._meta.pop(id(conn), None)
+            self._close_quietly(conn)
+            conn = None
+        if conn is None:
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+        with self._cond:
+            self._meta[id(conn)]["uses"] += 1
+        return conn
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        """Return a borrowed connection; uncommitted work is rolled back."""
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except Exception:
+                discard = True
+        with self._cond:
+            meta = self._meta.get(id(conn), {"uses": 0})
+            recycle = meta["uses"] >= self.recycle_uses
+            discard = discard or bool(meta.get("discard"))
+            if discard or recycle or conn.closed or self._closed:
+                self._meta.pop(id(conn), None)
+                self._size -= 1
+                self._stats["recycled" if recycle and not discard else "discarded"] += 1
+                close = True
+            else:
+                meta["returned_at"] = time.monotonic()
+                self._idle.append(conn)
+                close = False
+            self._cond.notify()
+        if close:
+            self._close_quietly(conn)
+
+    def discard(self, conn) -> None:
+        """Close a borrowed connection on return instead of reusing it (e.g. after session-level SETs)."""
+        with self._cond:
+            if id(conn) in self._meta:
+                self._meta[id(conn)]["discard"] = True
+
+    @contextmanager
+    def connection(self, timeout_s: Optional[float] = None) -> Iterator[Any]:
+        """Borrow a connection for the duration of a `with` block."""
+        conn = self.getconn(timeout_s)
+        failed = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            failed = True  # broken connection: do not hand it out again
+            raise
+        finally:
+            self.putconn(conn, discard=failed)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(size=self._size, idle=len(self._idle), in_use=self._size - len(self._idle), max_size=self.max_size)
+        requests = stats["checkouts"] + stats["timeouts"]
+        stats["wait_ms_avg"] = round(stats["wait_ms_total"] / requests, 3) if requests else 0.0
+        stats["wait_ms_total"] = round(stats["wait_ms_total"], 3)
+        stats["wait_ms_max"] = round(stats["wait_ms_max"], 3)
+        return stats
+
+    def close(self) -> None:
+        """Close idle connections; borrowed ones are closed when returned."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._meta.pop(id(conn), None)
+            self._close_quietly(conn)
+
+
+_default_pool: Optional[ConnectionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Process-wide pool shared by every synchronous DB caller."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+        return _default_pool
+
+
+def get_connection(timeout_s: Optional[float] = None):
+    """`with get_connection() as conn:` borrows a connection from the shared pool."""
+    return get_pool().connection(timeout_s)
+
+
+def init_db():
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS agent_logs (
+                    id SERIAL PRIMARY KEY,
+                    agent_name TEXT,
+                    task_name TEXT,
+                    input TEXT,
+                    output TEXT,
+                    latency_ms DOUBLE PRECISION,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+        conn.commit()
+
+def log_agent_output(agent_name: str, task_name: str, input_text: str, output_text: str, latency_ms: Optional[float] = None):
+    """Queue an agent_logs row; it is written in the background by the shared AgentLogWriter."""
+    from src.db.log_writer import get_log_writer
+
+    get_log_writer().submit(agent_name, task_name, input_text, output_text, latency_ms)
@@ -0,0 +1,151 @@
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.rag_pipeline.vector_index import top_k_rows
+
+# Words plus compound identifiers such as error codes ("err-1042"), versions
+# ("v0.0.5") and domains ("acmecorp.com").
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_.@][a-z0-9]+)*")
+_PART_RE = re.compile(r"[a-z0-9]+")
+
+
+def lexical_tokens(text: str) -> List[str]:
+    """Lowercased terms; compound identifiers are kept whole and also split into parts."""
+    out: List[str] = []
+    for tok in _TOKEN_RE.findall(text.lower()):
+        out.append(tok)
+        if not tok.isalnum():
+            out.extend(_PART_RE.findall(tok))
+    return out
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an incrementally updated inverted index.
+
+    Postings are two compact typed arrays per term (uint32 row ids in ascending
+    order, uint16 term frequencies) rather than Python lists of tuples, and
+    queries score them with NumPy views over those buffers. Deletes remove the
+    row from its terms' postings immediately, so document frequencies stay exact.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._row_terms: List[Optional[Tuple[str, ...]]] = []
+        self._row_ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._doc_len = array("I")
+        self._total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+
+    def memory_bytes(self) -> int:
+        """Size of the posting and length arrays (excluding dict/str overhead)."""
+        postings = sum(d.itemsize * len(d) + t.itemsize * len(t) for d, t in self._postings.values())
+        return postings + self._doc_len.itemsize * len(self._doc_len)
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Index (or re-index) documents; an id repeated in one call keeps its last text."""
+        latest = dict(zip(ids, texts))
+        with self._lock:
+            self.delete([i for i in latest if i in self._rows])
+            for doc_id, text in latest.items():
+                tokens = lexical_tokens(text)
+                counts = Counter(tokens)
+                row = len(self._row_ids)
+                self._row_ids.append(doc_id)
+                self._row_terms.append(tuple(counts))
+                self._rows[doc_id] = row
+                self._doc_len.append(len(tokens))
+                self._total_len += len(tokens)
+                for term, tf in counts.items():
+                    entry = self._postings.get(term)
+                    if entry is None:
+                        entry = self._postings[term] = (array("I"), array("H"))
+                    entry[0].append(row)
+                    entry[1].append(min(tf, 0xFFFF))
+
+    def delete(self, ids: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            for doc_id in ids:
+                row = self._rows.pop(doc_id, None)
+                if row is None:
+                    continue
+                for term in self._row_terms[row] or ():
+                    docs, tfs = self._postings[term]
+                    pos = bisect_left(docs, row)
+                    del docs[pos]
+                    del tfs[pos]
+                    if not docs:
+                        del self._postings[term]
+                self._total_len -= self._doc_len[row]
+                self._row_terms[row] = None
+                self._row_ids[row] = None
+                removed += 1
+            dead = len(self._row_ids) - len(self._rows)
+            if dead > 1024 and dead > len(self._rows):
+                self._compact()
+        return removed
+
+    def _compact(self) -> None:
+        """Renumber live rows densely once deleted rows outnumber live ones."""
+        live = [row for row, doc_id in enumerate(self._row_ids) if doc_id is not None]
+        remap = np.full(len(self._row_ids), -1, dtype=np.int64)
+        remap[live] = np.arange(len(live))
+        for term, (docs, tfs) in list(self._postings.items()):
+            new_docs = array("I", remap[np.frombuffer(docs, dtype=np.uint32)].astype(np.uint32).tobytes())
+            self._postings[term] = (new_docs, tfs)
+        self._row_ids = [self._row_ids[r] for r in live]
+        self._row_terms = [self._row_terms[r] for r in live]
+        self._doc_len = array("I", (self._doc_len[r] for r in live))
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._row_ids)}
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Top-k (id, BM25 score) for `query`, best first. Only rows in the
+        query terms' postings are scored, so the work and the temporary
+        arrays scale with the matches rather than with the corpus.
+        """
+        terms = set(lexical_tokens(query))
+        with self._lock:
+            n_docs = len(self._rows)
+            if n_docs == 0 or not terms:
+                return []
+            postings = [self._postings[t] for t in terms if t in self._postings]
+            if not postings:
+                return []
+            matches = [np.frombuffer(docs, dtype=np.uint32) for docs, _ in postings]
+            candidates = np.unique(np.concatenate(matches))
+            avgdl = self._total_len / n_docs or 1.0
+            doc_len = np.frombuffer(self._doc_len, dtype=np.uint32)[candidates].astype(np.float32)
+            norm = self.k1 * (1.0 - self.b + self.b * doc_len / avgdl)
+            scores = np.zeros(len(candidates), dtype=np.float32)
+            for docs, (_, tf_buf) in zip(matches, postings):
+                tfs = np.frombuffer(tf_buf, dtype=np.uint16).astype(np.float32)
+                pos = np.searchsorted(candidates, docs)
+                df = len(docs)
+                idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+                scores[pos] += idf * tfs * (self.k1 + 1.0) / (tfs + norm[pos])
+            # views over the posting buffers must not outlive the lock (arrays cannot grow while exported)
+            del matches, docs
+            idx, vals = top_k_rows(scores[None, :], top_k)
+            row_ids = self._row_ids
+            return [(row_ids[int(candidates[i])], float(s)) for i, s in zip(idx[0], vals[0])]
+
+    def search_batch(self, queries: Sequence[str], top_k: int = 10) -> List[List[Tuple[str, float]]]:
+        return [self.search(q, top_k) for q in queries]
@@ -0,0 +1,295 @@
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Field kept in the memory-mapped text file; every other field is a metadata column
+TEXT_FIELD = "content"
+# Rows whose `content` is not a string (stored as a column instead)
+NO_TEXT = -1
+# save() rewrites the text file when at least this fraction of it is dead
+COMPACT_DEAD_FRACTION = 0.5
+
+FILES = ("content.bin", "spans.npy", "ids.json", "columns.json", "columns.npz")
+
+
+def _value_key(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class ContentStore(Mapping):
+    """
+    Append-only document store: doc_id -> document dict.
+
+    `content` strings are appended as UTF-8 to one file (content.bin) that is
+    read through a shared read-only mmap, addressed by an (offset, length)
+    array; `text_view` returns a zero-copy memoryview into it, and processes
+    opening the same directory share the same page-cache pages. All other
+    fields are stored per column as int32 codes into a per-column dictionary
+    of distinct values, so repeated values (source, category, ...) cost four
+    bytes a row.
+
+    Replacing a document appends a new row; replaced and deleted rows stay
+    in the file until `compact()`. The document's `id` field is its key and
+    is not stored separately. One process writes (files are only opened for
+    writing on the first add); `flush()` publishes the row index for readers.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._owned = path is None
+        self.path = path or tempfile.mkdtemp(prefix="content-")
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._writer = None
+        self._map: Optional[mmap.mmap] = None
+        self._mapped = 0
+        self._spans = np.zeros((1024, 2), dtype=np.int64)
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._values: Dict[str, List[Any]] = {}
+        self._lookup: Dict[str, Dict[str, int]] = {}
+        self._codes: Dict[str, np.ndarray] = {}
+        self._size = 0
+        self._dead_bytes = 0
+        if os.path.exists(self._file("spans.npy")):
+            self._load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self) -> None:
+        spans = np.load(self._file("spans.npy"))
+        with open(self._file("ids.json"), "r", encoding="utf-8") as f:
+            self._ids = json.load(f)
+        with open(self._file("columns.json"), "r", encoding="utf-8") as f:
+            self._values = json.load(f)
+        with np.load(self._file("columns.npz")) as codes:
+            self._codes = {key: codes[key] for key in self._values}
+        n = len(self._ids)
+        self._spans = spans if len(spans) else np.zeros((1, 2), dtype=np.int64)
+        self._lookup = {key: {_value_key(v): i for i, v in enumerate(values)} for key, values in self._values.items()}
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids) if doc_id is not None}
+        # bytes past the last published row belong to an unflushed writer and are ignored
+        ends = self._spans[:n, 0] + np.maximum(self._spans[:n, 1], 0)
+        self._size = int(ends.max()) if n else 0
+        live = np.array([doc_id is not None for doc_id in self._ids], dtype=bool)
+        self._dead_bytes = int(np.maximum(self._spans[:n, 1], 0)[~live].sum()) if n else 0
+
+    # -------------------------------
+    # writes
+    # -------------------------------
+    def _ensure(self, rows: int) -> None:
+        capacity = len(self._spans)
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        self._spans = np.concatenate([self._spans, np.zeros((capacity - len(self._spans), 2), dtype=np.int64)])
+        for key, codes in self._codes.items():
+            self._codes[key] = np.concatenate([codes, np.full(capacity - len(codes), -1, dtype=np.int32)])
+
+    def _code(self, key: str, value: Any) -> int:
+        lookup = self._lookup.get(key)
+        if lookup is None:
+            lookup = self._lookup[key] = {}
+            self._values[key] = []
+            self._codes[key] = np.full(len(self._spans), -1, dtype=np.int32)
+        vk = _value_key(value)
+        code = lookup.get(vk)
+        if code is None:
+            code = lookup[vk] = len(self._values[key])
+            self._values[key].append(value)
+        return code
+
+    def _drop_row(self, row: int) -> None:
+        self._ids[row] = None
+        self._dead_bytes += max(int(self._spans[row, 1]), 0)
+
+    def add(self, doc_id: str, doc: Dict[str, Any]) -> None:
+        self.add_many([(doc_id, doc)])
+
+    def add_many(self, docs: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """Append documents (replacing any with the same id)."""
+        with self._lock:
+            if self._writer is None:
+                self._writer = open(self._file("content.bin"), "ab")
+                self._writer.truncate(self._size)
+                self._writer.seek(self._size)
+            for doc_id, doc in docs:
+                row = len(self._ids)
+                self._ensure(row + 1)
+                text = doc.get(TEXT_FIELD)
+                if isinstance(text, str):
+                    data = text.encode("utf-8")
+                    self._writer.write(data)
+                    self._spans[row] = (self._size, len(data))
+                    self._size += len(data)
+                else:
+                    self._spans[row] = (self._size, NO_TEXT)
+                for key, value in doc.items():
+                    if (key == TEXT_FIELD and isinstance(value, str)) or (key == "id" and value == doc_id):
+                        continue
+                    code = self._code(key, value)
+                    self._codes[key][row] = code
+                old = self._rows.get(doc_id)
+                if old is not None:
+                    self._drop_row(old)
+                self._ids.append(doc_id)
+                self._rows[doc_id] = row
+            self._writer.flush()
+
+    def delete(self, ids: Sequence[str]) -> int:
+        with self._lock:
+            deleted = 0
+            for doc_id in ids:
+                row = self._rows.pop(doc_id, None)
+                if row is not None:
+                    self._drop_row(row)
+                    deleted += 1
+            return deleted
+
+    def pop(self, doc_id: str, default: Any = None) -> Any:
+        with self._lock:
+            if doc_id not in self._rows:
+                return default
+            doc = self[doc_id]
+            self.delete([doc_id])
+            return doc
+
+    # -------------------------------
+    # reads
+    # -------------------------------
+    def _buffer(self, end: int) -> mmap.mmap:
+        if self._map is None or end > self._mapped:
+            with open(self._file("content.bin"), "rb") as f:
+                # the previous map stays alive as long as views into it exist
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped = len(self._map)
+        return self._map
+
+    def text_view(self, doc_id: str) -> memoryview:
+        """UTF-8 bytes of the document's content, without copying them out of the mapping."""
+        with self._lock:
+            offset, length = (int(x) for x in self._spans[self._rows[doc_id]])
+            if length <= 0:
+                return memoryview(b"")
+            return memoryview(self._buffer(offset + length))[offset:offset + length]
+
+    def text(self, doc_id: str) -> str:
+        return str(self.text_view(doc_id), "utf-8")
+
+    def metadata(self, doc_id: str) -> Dict[str, Any]:
+        """All stored fields except the memory-mapped content."""
+        with self._lock:
+            row = self._rows[doc_id]
+            out: Dict[str, Any] = {"id": doc_id}
+            for key, codes in self._codes.items():
+                code = int(codes[row])
+                if code >= 0:
+                    out[key] = self._values[key][code]
+            return out
+
+    def __getitem__(self, doc_id: str) -> Dict[str, Any]:
+        with self._lock:
+            if doc_id not in self._rows:
+                raise KeyError(doc_id)
+            doc = self.metadata(doc_id)
+            if self._spans[self._rows[doc_id], 1] != NO_TEXT:
+                doc[TEXT_FIELD] = self.text(doc_id)
+            return doc
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._rows
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._rows))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "documents": len(self._rows),
+                "rows": len(self._ids),
+                "text_bytes": self._size,
+                "dead_bytes": self._dead_bytes,
+                "columns": {key: len(values) for key, values in self._values.items()},
+            }
+
+    # -------------------------------
+    # persistence
+    # -------------------------------
+    def flush(self) -> None:
+        """Publish the row index (spans, ids, columns) next to content.bin."""
+        with self._lock:
+            if self._writer is not None:
+                self._writer.flush()
+                os.fsync(self._writer.fileno())
+            elif not os.path.exists(self._file("content.bin")):
+                open(self._file("content.bin"), "wb").close()
+            n = len(self._ids)
+            self._write_atomic("spans.npy", lambda f: np.save(f, self._spans[:n]))
+            self._write_atomic("ids.json", lambda f: f.write(json.dumps(self._ids).encode("utf-8")))
+            self._write_atomic("columns.json", lambda f: f.write(json.dumps(self._values, default=str).encode("utf-8")))
+            self._write_atomic("columns.npz", lambda f: np.savez(f, **{key: codes[:n] for key, codes in self._codes.items()}))
+
+    def _write_atomic(self, name: str, write) -> None:
+        tmp = self._file(name + ".tmp")
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, self._file(name))
+
+    def compact(self) -> None:
+        """Rewrite content.bin and the row index with live documents only."""
+        with self._lock:
+            live = [(doc_id, self[doc_id]) for doc_id in self._ids if doc_id is not None]
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            self._map = None
+            self._mapped = 0
+            self._spans = np.zeros((max(1024, len(live)), 2), dtype=np.int64)
+            self._ids, self._rows = [], {}
+            self._values, self._lookup, self._codes = {}, {}, {}
+            self._size = self._dead_bytes = 0
+            # unlinking the old file keeps existing views valid (the mapping holds the inode)
+            if os.path.exists(self._file("content.bin")):
+                os.remove(self._file("content.bin"))
+            self.add_many(live)
+            self.flush()
+
+    def save(self, path: str) -> None:
+        """Flush (compacting if mostly dead) and, if `path` is elsewhere, copy the store there."""
+        with self._lock:
+            if self._size and self._dead_bytes / self._size >= COMPACT_DEAD_FRACTION:
+                self.compact()
+            else:
+                self.flush()
+            if os.path.abspath(path) == os.path.abspath(self.path):
+                return
+            os.makedirs(path, exist_ok=True)
+            for name in FILES:
+                shutil.copyfile(self._file(name), os.path.join(path, name))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            self._map = None
+            if self._owned and os.path.isdir(self.path):
+                shutil.rmtree(self.path, ignore_errors=True)
+                self._owned = False
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,342 @@
+import hashlib
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Embedding backend: "sentence-transformers" (local CPU), "remote" (OpenAI-compatible) or "hashing"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Vector size of the configured backend (384 = all-MiniLM-L6-v2); rag_data.embedding
+# is created with this size (_v007) and checked against it when a pgvector client starts
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+# On-disk vector cache shared across runs (empty disables it)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/cache/embeddings.sqlite") or None
+# Longest a caller waits for its batch before giving up (a hung backend or a dead batcher)
+EMBEDDING_RESULT_TIMEOUT_S = float(os.getenv("EMBEDDING_RESULT_TIMEOUT_S", "120"))
+
+
+class HashingEmbedder:
+    """
+    Dependency-free embedder using signed feature hashing of word unigrams and bigrams.
+
+    Deterministic across processes (crc32, not Python's salted hash), so it can
+    back the in-process index in tests and demos when no model is configured.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD_RE.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feat in self._features(text):
+                h = zlib.crc32(feat.encode("utf-8"))
+                out[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        return out
+
+
+class SentenceTransformerBackend:
+    """Local CPU embeddings via sentence-transformers (L2-normalized)."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, device: str = "cpu", batch_size: int = 64):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device=device)
+        self.batch_size = batch_size
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st:{model_name}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class RemoteEmbeddingBackend:
+    """OpenAI-compatible `/embeddings` HTTP endpoint."""
+
+    def __init__(self, dim: int, model_name: str = EMBEDDING_MODEL, base_url: Optional[str] = None, api_key: Optional[str] = None, timeout: float = 30.0):
+        self.dim = dim
+        self.model_name = model_name
+        self.base_url = base_url or os.getenv("EMBEDDING_API_BASE", "https://api.openai.com/v1")
+        self.api_key = api_key or os.getenv("EMBEDDING_API_KEY") or os.getenv("OPENAI_API_KEY")
+        self.timeout = timeout
+        self.name = f"remote:{model_name}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        import requests
+
+        r = requests.post(
+            f"{self.base_url}/embeddings",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json={"model": self.model_name, "input": list(texts)},
+            timeout=self.timeout,
+        )
+        r.raise_for_status()
+        data = sorted(r.json()["data"], key=lambda d: d["index"])
+        return np.asarray([d["embedding"] for d in data], dtype=np.float32)
+
+
+def content_key(model_name: str, text: str) -> bytes:
+    """Cache key: hash of the model name and the exact text."""
+    return hashlib.blake2b(f"{model_name}\0{text}".encode("utf-8"), digest_size=20).digest()
+
+
+class EmbeddingCache:
+    """Two-level vector cache: in-memory LRU in front of an optional SQLite file."""
+
+    def __init__(self, dim: int, max_items: int = 100_000, path: Optional[str] = None):
+        self.dim = dim
+        self.max_items = max_items
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+            self._db.commit()
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: Sequence[bytes]) -> Tuple[Dict[bytes, np.ndarray], int, int]:
+        """Return (found, memory_hits, disk_hits)."""
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vec = self._memory.get(key)
+                if vec is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vec
+            memory_hits = len(found)
+            missing = [k for k in keys if k not in found]
+            if self._db is not None and missing:
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                    for key, blob in rows:
+                        vec = np.frombuffer(blob, dtype=np.float32)
+                        found[bytes(key)] = vec
+                        self._remember(bytes(key), vec)
+        return found, memory_hits, len(found) - memory_hits
+
+    def put_many(self, items: Dict[bytes, np.ndarray]) -> None:
+        with self._lock:
+            for key, vec in items.items():
+                self._remember(key, vec)
+            if self._db is not None and items:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(k, np.ascontiguousarray(v, dtype=np.float32).tobytes()) for k, v in items.items()],
+                )
+                self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class EmbeddingService:
+    """
+    Shared embedding front-end for every ingestion and query path.
+
+    - cache: vectors are keyed by a hash of (model, text) and served from an
+      in-memory LRU, then an on-disk SQLite cache, before touching the model
+    - micro-batching: cache misses from all callers go to one queue; a worker
+      thread drains it into batches of up to `max_batch_size`, waiting at most
+      `max_wait_ms` for a batch to fill
+    - dedupe: identical texts within a batch are embedded once
+
+    Exposes `dim`, `name` and `embed(texts)`, so it drops in wherever an
+    embedder is expected (RAGManager, ingestion).
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        cache_path: Optional[str] = EMBEDDING_CACHE_PATH,
+        memory_cache_size: int = 100_000,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+    ):
+        self.backend = backend or HashingEmbedder()
+        self.dim = self.backend.dim
+        self.name = self.backend.name
+        self.cache = EmbeddingCache(self.dim, max_items=memory_cache_size, path=cache_path)
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Optional[Tuple[bytes, str, Future]]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0, "texts": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0,
+            "deduped": 0, "batches": 0, "embedded": 0, "embed_seconds": 0.0,
+        }
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def _count(self, **deltas: float) -> None:
+        with self._stats_lock:
+            for k, v in deltas.items():
+                self._stats[k] += v
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        texts = list(texts)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if not texts:
+            return out
+        keys = [content_key(self.name, t) for t in texts]
+        found, memory_hits, disk_hits = self.cache.get_many(keys)
+
+        # one future per distinct missing key, shared by repeated texts in this call
+        pending: Dict[bytes, Future] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                fut: Future = Future()
+                pending[key] = fut
+                self._queue.put((key, text, fut))
+        self._count(requests=1, texts=len(texts), memory_hits=memory_hits, disk_hits=disk_hits, misses=len(pending))
+
+        for i, key in enumerate(keys):
+            vec = found.get(key)
+            out[i] = vec if vec is not None else pending[key].result(timeout=EMBEDDING_RESULT_TIMEOUT_S)
+        return out
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    nxt = self._queue.get(timeout=max(0.0, timeout)) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._queue.put(None)  # finish this batch, then stop
+                    break
+                batch.append(nxt)
+            try:
+                self._embed_batch(batch)
+            except Exception as e:  # never let one batch kill the worker
+                logger.exception("embedding batch failed")
+                for _, _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+    def _embed_batch(self, batch: List[Tuple[bytes, str, Future]]) -> None:
+        unique: Dict[bytes, str] = {}
+        for key, text, _ in batch:
+            unique.setdefault(key, text)
+        start = time.perf_counter()
+        try:
+            vectors = self.backend.embed(list(unique.values()))
+            if len(vectors) != len(unique):
+                raise RuntimeError(f"{self.name} returned {len(vectors)} vectors for {len(unique)} texts")
+            by_key = {key: np.asarray(vec, dtype=np.float32) for key, vec in zip(unique, vectors)}
+        except Exception as e:
+            for _, _, fut in batch:
+                fut.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+        try:
+            self.cache.put_many(by_key)
+        except Exception:
+            # e.g. "database is locked"; the vectors are still good, they just are not cached
+            logger.warning("embedding cache write failed", exc_info=True)
+        for key, _, fut in batch:
+            fut.set_result(by_key[key])
+        self._count(batches=1, embedded=len(unique), deduped=len(batch) - len(unique), embed_seconds=elapsed)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Throughput and cache-hit counters."""
+        with self._stats_lock:
+            s = dict(self._stats)
+        hits = s["memory_hits"] + s["disk_hits"]
+        s["hit_rate"] = round(hits / s["texts"], 4) if s["texts"] else 0.0
+        s["avg_batch_size"] = round(s["embedded"] / s["batches"], 2) if s["batches"] else 0.0
+        s["embedded_per_s"] = round(s["embedded"] / s["embed_seconds"], 1) if s["embed_seconds"] else 0.0
+        s["embed_seconds"] = round(s["embed_seconds"], 4)
+        s["model"] = self.name
+        return s
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+        self.cache.close()
+
+
+def create_backend(kind: str = EMBEDDING_BACKEND):
+    """Embedding backend by name: "sentence-transformers", "remote" or "hashing"."""
+    if kind == "sentence-transformers":
+        try:
+            return SentenceTransformerBackend()
+        except ImportError:
+            logger.warning("sentence-transformers not installed; falling back to hashing embeddings")
+            return HashingEmbedder(EMBEDDING_DIM)
+    if kind == "remote":
+        # e.g. EMBEDDING_DIM=1536 for text-embedding-3-small
+        return RemoteEmbeddingBackend(dim=EMBEDDING_DIM)
+    if kind == "hashing":
+        return HashingEmbedder(EMBEDDING_DIM)
+    raise ValueError(f"unknown embedding backend: {kind}")
+
+
+class EmbeddingDimensionError(RuntimeError):
+    """The embedder's vectors do not fit the rag_data.embedding column."""
+
+
+def check_embedding_dim(embedder, column_dim: Optional[int]) -> None:
+    """
+    Fail fast when `embedder` produces vectors of another size than the
+    pgvector column (`column_dim` is its declared size; None or <= 0 when
+    the table is missing or the column is unsized, which is not checked).
+    """
+    if column_dim is None or column_dim <= 0 or embedder.dim == column_dim:
+        return
+    raise EmbeddingDimensionError(
+        f"embedder {embedder.name} produces {embedder.dim}-dim vectors but rag_data.embedding is vector({column_dim}); "
+        f"set EMBEDDING_BACKEND / EMBEDDING_MODEL / EMBEDDING_DIM to match the column, or resize the column "
+        f"(see migrations/_v007_rag_data_embedding_dim.sql)"
+    )
+
+
+_default_service: Optional[EmbeddingService] = None
+_default_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Process-wide service so every caller shares batches and cache."""
+    global _default_service
+    with _default_lock:
+        if _default_service is None:
+            _default_service = EmbeddingService(create_backend())
+        return _default_service
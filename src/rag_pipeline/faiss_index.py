@@ -0,0 +1,436 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from src.rag_pipeline.quantization import DEFAULT_RERANK_FACTORS, FullPrecisionStore, make_codec
+from src.rag_pipeline.vector_index import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+# Optional: FAISS (faiss-cpu) for approximate nearest-neighbour search
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    faiss = None
+    FAISS_AVAILABLE = False
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+DEFAULT_PARAMS: Dict[str, Any] = {
+    "index_type": "flat",
+    "nlist": 100,           # IVF: number of coarse clusters
+    "nprobe": 8,            # IVF: clusters visited per query
+    "hnsw_m": 32,           # HNSW: graph degree
+    "ef_construction": 200, # HNSW: build-time beam width
+    "ef_search": 64,        # HNSW: query-time beam width
+    "quantization": "none", # "float16" / "int8": scalar-quantized codes + exact re-rank
+    "rerank_factor": 0,     # candidates per result for re-ranking (0 = mode default)
+    "train_size": 0,        # IVF / quantized: vectors kept in an exact flat index before
+                            # training (0 = 39 * nlist for IVF, 256 for scalar quantizers)
+}
+
+# FAISS wants about this many training points per IVF cluster
+IVF_POINTS_PER_CLUSTER = 39
+SQ_TRAIN_SIZE = 256
+
+# HNSW deletes are tombstones: a background rebuild drops them once they pass
+# this fraction of the index, and queries over-fetch at most this many extra
+# candidates per result to skip them until then
+TOMBSTONE_REBUILD_FRACTION = 0.2
+TOMBSTONE_OVERFETCH_FACTOR = 4
+
+QUANTIZATIONS = ("none", "float16", "int8")
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class FaissVectorIndex:
+    """
+    FAISS-backed cosine index with the same interface as InMemoryVectorIndex.
+
+    - index types: "flat" (exact), "ivf" (IVFFlat) and "hnsw" (HNSWFlat)
+    - `quantization="float16"/"int8"` stores scalar-quantized codes instead
+      (IndexScalarQuantizer / IVFScalarQuantizer / HNSWSQ) and re-ranks a
+      `rerank_factor` x deeper candidate list with float32 rows kept on a
+      memory-mapped FullPrecisionStore
+    - indexes that need training (IVF, scalar quantizers) start as an exact
+      flat index and are trained on the whole corpus (in the background)
+      once it reaches `train_size`, so nlist and the quantizer ranges are not fixed by
+      whatever the first add() happened to contain
+    - string ids map to int64 labels; HNSW cannot remove vectors, so deletes
+      are tombstoned and filtered at query time until the next rebuild, which
+      starts in the background once they pass TOMBSTONE_REBUILD_FRACTION
+    - `save`/`load` persist the index plus an id sidecar; `load(mmap=True)`
+      memory-maps the file read-only so worker processes share its pages, and
+      the first write swaps in a private in-memory copy
+    - `rebuild` builds a fresh index (optionally with new parameters) in a
+      background thread and swaps it in atomically; writes made meanwhile are
+      recorded and replayed onto the new index before the swap
+    """
+
+    def __init__(self, dim: int, **params: Any):
+        if not FAISS_AVAILABLE:
+            raise ImportError("faiss-cpu is required for FaissVectorIndex")
+        unknown = set(params) - set(DEFAULT_PARAMS)
+        if unknown:
+            raise ValueError(f"unknown FAISS index parameters: {sorted(unknown)}")
+        self.dim = dim
+        self.params = dict(DEFAULT_PARAMS, **params)
+        if self.params["index_type"] not in INDEX_TYPES:
+            raise ValueError(f"index_type must be one of {INDEX_TYPES}")
+        if self.params["quantization"] not in QUANTIZATIONS:
+            # FAISS binary indexes have a separate API; QuantizedVectorIndex covers binary codes
+            raise ValueError(f"quantization must be one of {QUANTIZATIONS}")
+
+        self._index = None  # created on first add
+        self._staged = False  # True while an untrained exact index stands in (see train_size)
+        self._labels: Dict[str, int] = {}
+        self._ids: Dict[int, str] = {}
+        self._next_label = 0
+        self._tombstones: Set[int] = set()
+        self._lock = threading.RLock()
+        self._path: Optional[str] = None
+        self._read_only = False
+        self._pending: Optional[List[Tuple[str, np.ndarray, Optional[np.ndarray]]]] = None
+        # float32 rows by label for exact re-ranking (and rebuilds) of quantized codes
+        self._full: Optional[FullPrecisionStore] = FullPrecisionStore(dim) if self.quantized else None
+
+    @property
+    def quantized(self) -> bool:
+        return self.params["quantization"] != "none"
+
+    # ------------------------------------------------------------------ build
+
+    def _train_size(self, params: Dict[str, Any]) -> int:
+        """Vectors needed before `params` is trained (0 when it needs no training)."""
+        if params["index_type"] == "ivf":
+            return params["train_size"] or IVF_POINTS_PER_CLUSTER * params["nlist"]
+        if params["quantization"] != "none":
+            return params["train_size"] or SQ_TRAIN_SIZE
+        return 0
+
+    def _build_index(self, train_vectors: np.ndarray, params: Dict[str, Any]) -> Tuple[Any, bool]:
+        """(index, staged): an exact flat stand-in while there are too few vectors to train on."""
+        if len(train_vectors) < self._train_size(params):
+            return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim)), True
+        return self._new_index(train_vectors, params), False
+
+    def _new_index(self, train_vectors: np.ndarray, params: Dict[str, Any]):
+        kind = params["index_type"]
+        qtype = {
+            "float16": faiss.ScalarQuantizer.QT_fp16,
+            "int8": faiss.ScalarQuantizer.QT_8bit,
+        }.get(params["quantization"])
+        if kind == "flat":
+            if qtype is None:
+                return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+            base = faiss.IndexScalarQuantizer(self.dim, qtype, faiss.METRIC_INNER_PRODUCT)
+            base.train(train_vectors)
+            return faiss.IndexIDMap2(base)
+        if kind == "hnsw":
+            if qtype is None:
+                base = faiss.IndexHNSWFlat(self.dim, params["hnsw_m"], faiss.METRIC_INNER_PRODUCT)
+            else:
+                base = faiss.IndexHNSWSQ(self.dim, qtype, params["hnsw_m"], faiss.METRIC_INNER_PRODUCT)
+                base.train(train_vectors)
+            base.hnsw.efConstruction = params["ef_construction"]
+            base.hnsw.efSearch = params["ef_search"]
+            return faiss.IndexIDMap2(base)
+        # IVF: cap the cluster count when train_size is set below nlist
+        nlist = max(1, min(params["nlist"], len(train_vectors)))
+        quantizer = faiss.IndexFlatIP(self.dim)
+        if qtype is None:
+            ivf = faiss.IndexIVFFlat(quantizer, self.dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            ivf = faiss.IndexIVFScalarQuantizer(quantizer, self.dim, nlist, qtype, faiss.METRIC_INNER_PRODUCT)
+        ivf.train(train_vectors)
+        ivf.nprobe = params["nprobe"]
+        # hashtable direct map: reconstruct by arbitrary label (needed for rebuilds)
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return ivf
+
+    def _ensure_writable(self) -> None:
+        if self._read_only:
+            # mmap-loaded indexes are read-only: swap in a private in-memory copy
+            self._index = faiss.read_index(self._path)
+            self._read_only = False
+
+    def _remove_labels(self, index, labels: np.ndarray, tombstones: Set[int], index_type: Optional[str] = None) -> None:
+        if len(labels) == 0:
+            return
+        if (index_type or self.params["index_type"]) == "hnsw":
+            tombstones.update(int(l) for l in labels)
+        else:
+            index.remove_ids(labels)
+
+    def _too_many_tombstones(self) -> bool:
+        return self._index is not None and len(self._tombstones) > TOMBSTONE_REBUILD_FRACTION * self._index.ntotal
+
+    def _rebuild_in_background(self) -> None:
+        try:
+            self.rebuild(background=True)
+        except RuntimeError:
+            pass  # another thread started a rebuild in the meantime
+
+    # ------------------------------------------------------------- mutations
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._labels
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._labels)
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        """Insert or overwrite vectors for `ids`."""
+        vectors = normalize_rows(vectors)
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"expected {len(ids)} vectors of dim {self.dim}, got {vectors.shape}")
+        if len(ids) == 0:
+            return
+        with self._lock:
+            self._ensure_writable()
+            if self._index is None:
+                self._index, self._staged = self._build_index(vectors, self.params)
+            stale = np.array([self._labels[i] for i in ids if i in self._labels], dtype=np.int64)
+            self._remove_labels(self._index, stale, self._tombstones)
+            for label in stale.tolist():
+                self._ids.pop(label, None)
+
+            labels = np.arange(self._next_label, self._next_label + len(ids), dtype=np.int64)
+            self._next_label += len(ids)
+            for doc_id, label in zip(ids, labels.tolist()):
+                self._labels[doc_id] = label
+                self._ids[label] = doc_id
+            self._index.add_with_ids(vectors, labels)
+            if self._full is not None:
+                self._full.ensure(self._next_label)
+                self._full[labels] = vectors
+
+            if self._pending is not None:
+                self._pending.append(("remove", stale, None))
+                self._pending.append(("add", labels, vectors))
+            # enough vectors to train on (or too many tombstones): rebuild from all
+            # of them off the caller's thread; searches and writes continue meanwhile
+            train = self._staged and len(self._labels) >= self._train_size(self.params)
+            rebuild = self._pending is None and (train or self._too_many_tombstones())
+        if rebuild:
+            self._rebuild_in_background()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Remove ids (unknown ids are ignored). Returns the number removed."""
+        with self._lock:
+            labels = np.array([self._labels.pop(i) for i in ids if i in self._labels], dtype=np.int64)
+            if len(labels) == 0:
+                return 0
+            self._ensure_writable()
+            for label in labels.tolist():
+                self._ids.pop(label, None)
+            self._remove_labels(self._index, labels, self._tombstones)
+            if self._pending is not None:
+                self._pending.append(("remove", labels, None))
+            rebuild = self._pending is None and self._too_many_tombstones()
+        if rebuild:
+            self._rebuild_in_background()
+        return len(labels)
+
+    def get_vector(self, doc_id: str) -> Optional[np.ndarray]:
+        with self._lock:
+            label = self._labels.get(doc_id)
+            if label is None:
+                return None
+            return np.array(self._full[label]) if self._full is not None else self._index.reconstruct(label)
+
+    # ---------------------------------------------------------------- search
+
+    def _search_params(self, nprobe: Optional[int], ef_search: Optional[int]):
+        if self._staged:
+            return None
+        kind = self.params["index_type"]
+        if kind == "ivf":
+            return faiss.SearchParametersIVF(nprobe=nprobe or self.params["nprobe"])
+        if kind == "hnsw":
+            return faiss.SearchParametersHNSW(efSearch=ef_search or self.params["ef_search"])
+        return None
+
+    def search_batch(
+        self,
+        queries: np.ndarray,
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        rerank: bool = True,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Top-k (id, cosine score) lists per query; `nprobe`/`ef_search` override recall per call.
+        Quantized indexes fetch `rerank_factor` x more candidates and re-score them
+        exactly against the float32 store unless `rerank` is false.
+        """
+        queries = normalize_rows(queries)
+        rerank = rerank and self._full is not None
+        depth = top_k * (self.params["rerank_factor"] or DEFAULT_RERANK_FACTORS[self.params["quantization"]]) if rerank else top_k
+        with self._lock:
+            if self._index is None or not self._labels:
+                return [[] for _ in range(queries.shape[0])]
+            k = min(depth + min(len(self._tombstones), depth * TOMBSTONE_OVERFETCH_FACTOR), self._index.ntotal)
+            scores, labels = self._index.search(queries, k, params=self._search_params(nprobe, ef_search))
+            ids, tombstones = self._ids, self._tombstones
+            results = []
+            for q, row_scores, row_labels in zip(queries, scores.tolist(), labels.tolist()):
+                hits = []
+                for s, label in zip(row_scores, row_labels):
+                    if label < 0 or label in tombstones or label not in ids:
+                        continue
+                    hits.append((label, float(s)))
+                    if len(hits) == depth:
+                        break
+                if rerank and hits:
+                    cand = np.array(sorted(label for label, _ in hits), dtype=np.int64)
+                    exact = self._full[cand] @ q
+                    hits = [(int(cand[j]), float(exact[j])) for j in np.argsort(-exact, kind="stable")]
+                results.append([(ids[label], s) for label, s in hits[:top_k]])
+            return results
+
+    def search(self, query: np.ndarray, top_k: int = 5, **kwargs: Any) -> List[Tuple[str, float]]:
+        return self.search_batch(np.asarray(query).reshape(1, -1), top_k, **kwargs)[0]
+
+    def memory_bytes(self) -> int:
+        """Approximate resident size of vectors, labels and (for HNSW) graph links."""
+        n = self._index.ntotal if self._index is not None else 0
+        quantized = self.quantized and not self._staged
+        code_bytes = make_codec(self.params["quantization"], self.dim).bytes_per_vector() if quantized else self.dim * 4
+        size = n * (code_bytes + 8)
+        if self.params["index_type"] == "hnsw" and not self._staged:
+            size += n * self.params["hnsw_m"] * 2 * 4
+        return size
+
+    # --------------------------------------------------------------- rebuild
+
+    def rebuild(self, background: bool = True, **params: Any) -> Optional[threading.Thread]:
+        """
+        Rebuild from the live vectors (dropping tombstones, retraining IVF and
+        quantizer ranges on all of them) and swap the new index in atomically.
+        Returns the worker thread when `background` is true.
+        """
+        with self._lock:
+            if self._pending is not None:
+                raise RuntimeError("a rebuild is already running")
+            new_params = dict(self.params, **params)
+            labels = np.array(sorted(self._ids), dtype=np.int64)
+            if not len(labels):
+                vectors = np.zeros((0, self.dim), dtype=np.float32)
+            elif self._full is not None:
+                # exact rows, so re-encoding does not compound quantization error
+                vectors = np.ascontiguousarray(self._full[labels])
+            else:
+                vectors = self._index.reconstruct_batch(labels)
+            if new_params["quantization"] != "none" and self._full is None:
+                # switching to quantized codes: start keeping exact rows from here on
+                self._full = FullPrecisionStore(self.dim, capacity=max(1, self._next_label))
+                if len(labels):
+                    self._full[labels] = vectors
+            self._pending = []
+
+        def _build():
+            try:
+                new_index, staged = self._build_index(vectors, new_params) if len(labels) else (None, False)
+                if new_index is not None:
+                    new_index.add_with_ids(vectors, labels)
+                with self._lock:
+                    tombstones: Set[int] = set()
+                    for op, op_labels, op_vectors in self._pending:
+                        if op == "add":
+                            if new_index is None:
+                                new_index, staged = self._build_index(op_vectors, new_params)
+                            new_index.add_with_ids(op_vectors, op_labels)
+                        elif new_index is not None:
+                            self._remove_labels(new_index, op_labels, tombstones, new_params["index_type"])
+                    self._index = new_index
+                    self._staged = staged
+                    self.params = new_params
+                    if not self.quantized and self._full is not None:
+                        self._full.close()
+                        self._full = None
+                    self._tombstones = tombstones
+                    self._read_only = False
+                    self._pending = None
+                logger.info(f"FAISS {new_params['index_type']} index rebuilt with {len(self._labels)} vectors")
+            except Exception:
+                logger.exception("FAISS index rebuild failed; keeping the current index")
+                with self._lock:
+                    self._pending = None
+
+        if not background:
+            _build()
+            return None
+        thread = threading.Thread(target=_build, name="faiss-rebuild", daemon=True)
+        thread.start()
+        return thread
+
+    # ----------------------------------------------------------- persistence
+
+    def save(self, path: str) -> None:
+        """Write the index and its id sidecar (`<path>.meta.json`) atomically."""
+        with self._lock:
+            meta = {
+                "dim": self.dim,
+                "params": self.params,
+                "labels": self._labels,
+                "next_label": self._next_label,
+                "tombstones": sorted(self._tombstones),
+                "empty": self._index is None,
+                "staged": self._staged,
+            }
+            if self._index is not None:
+                tmp = f"{path}.tmp"
+                faiss.write_index(self._index, tmp)
+                os.replace(tmp, path)
+            if self._full is not None:
+                np.save(f"{path}.full.tmp.npy", self._full[: self._next_label])
+                os.replace(f"{path}.full.tmp.npy", f"{path}.full.npy")
+            _write_json_atomic(f"{path}.meta.json", meta)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "FaissVectorIndex":
+        """Open a saved index; with `mmap` the file is mapped read-only and shared between processes."""
+        with open(f"{path}.meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(meta["dim"], **meta["params"])
+        index._labels = {k: int(v) for k, v in meta["labels"].items()}
+        index._ids = {v: k for k, v in index._labels.items()}
+        index._next_label = meta["next_label"]
+        index._tombstones = set(meta["tombstones"])
+        index._staged = meta.get("staged", False)
+        index._path = path
+        if index._full is not None and os.path.exists(f"{path}.full.npy"):
+            full = np.load(f"{path}.full.npy", mmap_mode="r")
+            if mmap and len(full):
+                index._full.close()
+                index._full = FullPrecisionStore.open_saved(f"{path}.full.npy")
+            else:
+                index._full.ensure(max(1, len(full)))
+                index._full[: len(full)] = full
+        if not meta["empty"]:
+            flags = 0
+            if mmap:
+                flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                if index.params["index_type"] != "ivf":
+                    # newer FAISS can also map flat code arrays instead of copying them
+                    # (IVF inverted lists are mapped by IO_FLAG_MMAP itself)
+                    flags |= getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+            index._index = faiss.read_index(path, flags)
+            index._read_only = mmap
+        return index
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.agents.tokenization import get_tokenizer_service
+from src.rag_pipeline.embeddings import get_embedding_service
+from src.rag_pipeline.ingestion import (
+    INGEST_BATCH_SIZE,
+    INGEST_CHUNK_OVERLAP,
+    INGEST_CHUNK_TOKENS,
+    INGEST_TOKENIZER_MODEL,
+    Sink,
+    chunk_document,
+)
+from src.rag_pipeline.rag_manager import document_id, document_text
+
+logger = logging.getLogger(__name__)
+
+Deleter = Callable[[List[str]], Any]
+
+
+def content_hash(record: Dict[str, Any]) -> str:
+    """Stable hash of a document or chunk (all fields, key order independent)."""
+    return hashlib.sha256(json.dumps(record, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class IndexManifest:
+    """
+    SQLite record of what has been indexed: one row per document (hash,
+    scope, last run that saw it, tombstone time) and one per chunk (hash).
+    Lookups are per document, so a sync never loads the whole manifest.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id TEXT PRIMARY KEY, scope TEXT NOT NULL, hash TEXT NOT NULL,
+                seen_run INTEGER NOT NULL, removed_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_scope_run ON documents (scope, seen_run);
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_id TEXT PRIMARY KEY, doc_id TEXT NOT NULL, hash TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks (doc_id);
+            CREATE TABLE IF NOT EXISTS runs (run INTEGER PRIMARY KEY AUTOINCREMENT, started_at REAL NOT NULL);
+            """
+        )
+        self.db.commit()
+
+    def begin_run(self) -> int:
+        cur = self.db.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),))
+        self.db.commit()
+        return cur.lastrowid
+
+    def document(self, doc_id: str) -> Optional[Tuple[str, Optional[float]]]:
+        return self.db.execute("SELECT hash, removed_at FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+
+    def chunks(self, doc_id: str) -> Dict[str, str]:
+        return dict(self.db.execute("SELECT chunk_id, hash FROM chunks WHERE doc_id = ?", (doc_id,)))
+
+    def mark_seen(self, doc_id: str, run: int) -> None:
+        self.db.execute("UPDATE documents SET seen_run = ? WHERE doc_id = ?", (run, doc_id))
+
+    def record(self, doc_id: str, scope: str, doc_hash: str, chunk_hashes: Dict[str, str], run: int) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO documents (doc_id, scope, hash, seen_run, removed_at) VALUES (?, ?, ?, ?, NULL)",
+            (doc_id, scope, doc_hash, run),
+        )
+        self.db.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+        self.db.executemany(
+            "INSERT OR REPLACE INTO chunks (chunk_id, doc_id, hash) VALUES (?, ?, ?)",
+            [(cid, doc_id, h) for cid, h in chunk_hashes.items()],
+        )
+
+    def chunk_ids(self) -> List[str]:
+        """Every chunk of every live document."""
+        return [r[0] for r in self.db.execute("SELECT chunk_id FROM chunks")]
+
+    def unseen(self, scope: str, run: int) -> List[str]:
+        """Live documents in `scope` that the current run did not see."""
+        rows = self.db.execute(
+            "SELECT doc_id FROM documents WHERE scope = ? AND seen_run < ? AND removed_at IS NULL", (scope, run)
+        )
+        return [r[0] for r in rows]
+
+    def tombstone(self, doc_id: str) -> List[str]:
+        """Mark a document removed; returns the chunk ids that must be deleted."""
+        chunk_ids = list(self.chunks(doc_id))
+        self.db.execute("UPDATE documents SET removed_at = ? WHERE doc_id = ?", (time.time(), doc_id))
+        self.db.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+        return chunk_ids
+
+    def commit(self) -> None:
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class IncrementalIndexer:
+    """
+    Sync a document collection into an index, doing work only for what changed.
+
+    Each document and chunk is hashed and compared with the manifest:
+    unchanged documents are skipped without chunking or embedding, changed
+    ones re-embed only the chunks whose hash differs (and drop chunks that no
+    longer exist), and documents of the same `scope` that a run no longer
+    sees are deleted and tombstoned. The manifest is committed after every
+    written batch, so an interrupted sync simply redoes the unfinished part.
+    """
+
+    def __init__(
+        self,
+        manifest_path: str,
+        upsert: Sink,
+        delete: Deleter,
+        embedder=None,
+        max_tokens: int = INGEST_CHUNK_TOKENS,
+        overlap: int = INGEST_CHUNK_OVERLAP,
+        batch_size: int = INGEST_BATCH_SIZE,
+        model: str = INGEST_TOKENIZER_MODEL,
+    ):
+        self.manifest = IndexManifest(manifest_path)
+        self.upsert = upsert
+        self.delete = delete
+        self.embedder = embedder or get_embedding_service()
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self.model = model
+        self.tokens = get_tokenizer_service()
+
+    def sync(self, docs: Iterable[Dict[str, Any]], scope: str = "default", remove_missing: bool = True) -> Dict[str, Any]:
+        """
+        Index `docs` incrementally. Returns counts plus the ids that were
+        added / changed / removed:
+          {"added", "changed", "unchanged", "removed", "chunks_embedded",
+           "chunks_deleted", "seconds", "added_ids", "changed_ids", "removed_ids"}
+        """
+        start = time.perf_counter()
+        run = self.manifest.begin_run()
+        summary: Dict[str, Any] = {
+            "added": 0, "changed": 0, "unchanged": 0, "removed": 0,
+            "chunks_embedded": 0, "chunks_deleted": 0,
+            "added_ids": [], "changed_ids": [], "removed_ids": [],
+        }
+        pending: List[Tuple[str, str, Dict[str, str]]] = []
+        upserts: List[Dict[str, Any]] = []
+        deletes: List[str] = []
+
+        def flush() -> None:
+            if deletes:
+                self.delete(list(deletes))
+                summary["chunks_deleted"] += len(deletes)
+            if upserts:
+                self.upsert(upserts, self.embedder.embed([document_text(c) for c in upserts]))
+                summary["chunks_embedded"] += len(upserts)
+            for doc_id, doc_hash, chunk_hashes in pending:
+                self.manifest.record(doc_id, scope, doc_hash, chunk_hashes, run)
+            self.manifest.commit()
+            pending.clear()
+            upserts.clear()
+            deletes.clear()
+
+        for doc in docs:
+            doc_id = document_id(doc)
+            doc_hash = content_hash(doc)
+            known = self.manifest.document(doc_id)
+            if known and known[0] == doc_hash and known[1] is None:
+                self.manifest.mark_seen(doc_id, run)
+                summary["unchanged"] += 1
+                continue
+
+            is_new = known is None or known[1] is not None
+            old_chunks = {} if is_new else self.manifest.chunks(doc_id)
+            chunks = chunk_document(doc, self.max_tokens, self.overlap, self.tokens, self.model)
+            chunk_hashes = {c["id"]: content_hash(c) for c in chunks}
+            upserts.extend(c for c in chunks if old_chunks.get(c["id"]) != chunk_hashes[c["id"]])
+            deletes.extend(cid for cid in old_chunks if cid not in chunk_hashes)
+            pending.append((doc_id, doc_hash, chunk_hashes))
+            kind = "added" if is_new else "changed"
+            summary[kind] += 1
+            summary[f"{kind}_ids"].append(doc_id)
+            if len(upserts) >= self.batch_size:
+                flush()
+        flush()
+        self.manifest.commit()
+
+        if remove_missing:
+            for doc_id in self.manifest.unseen(scope, run):
+                deletes.extend(self.manifest.tombstone(doc_id))
+                summary["removed"] += 1
+                summary["removed_ids"].append(doc_id)
+            flush()
+
+        summary["seconds"] = round(time.perf_counter() - start, 3)
+        logger.info(
+            f"Incremental sync [{scope}]: {summary['added']} added, {summary['changed']} changed, "
+            f"{summary['removed']} removed, {summary['unchanged']} unchanged "
+            f"({summary['chunks_embedded']} chunks embedded)"
+        )
+        return summary
+
+    def close(self) -> None:
+        self.manifest.close()
@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from src.agents.tokenization import TokenizerService, get_tokenizer_service
+from src.rag_pipeline.rag_manager import document_id
+
+logger = logging.getLogger(__name__)
+
+# Chunking and batching defaults for ingestion (see incremental.IncrementalIndexer)
+INGEST_CHUNK_TOKENS = int(os.getenv("INGEST_CHUNK_TOKENS", "256"))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "32"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+INGEST_TOKENIZER_MODEL = os.getenv("INGEST_TOKENIZER_MODEL", "gpt5")
+
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+
+# A sink receives one batch of chunks and their embeddings (rows aligned)
+Sink = Callable[[List[Dict[str, Any]], np.ndarray], None]
+
+
+# ------------------------------------------------------------------ parsing
+
+def _iter_json_array(f, read_size: int) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        block = f.read(read_size)
+        if not block:
+            eof = True
+            return False
+        buf = buf[pos:] + block
+        pos = 0
+        return True
+
+    # opening bracket
+    while True:
+        stripped = buf[pos:].lstrip()
+        if stripped:
+            if stripped[0] != "[":
+                raise ValueError("expected a JSON array")
+            pos = len(buf) - len(stripped) + 1
+            break
+        if not fill():
+            return
+
+    while True:
+        # skip separators
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf):
+            if not fill():
+                raise ValueError("unterminated JSON array")
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof or not fill():
+                raise
+            continue
+        if end == len(buf) and not eof:
+            # a scalar may continue in the next block; re-decode with more data
+            if fill():
+                continue
+        pos = end
+        yield item
+
+
+def iter_records(path: str, read_size: int = 1 << 20) -> Iterator[Dict[str, Any]]:
+    """
+    Stream documents from a JSON array file or an NDJSON/JSONL file
+    (one object per line), holding at most one read block in memory.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if str(path).endswith(NDJSON_SUFFIXES):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+            return
+        yield from _iter_json_array(f, read_size)
+
+
+# ----------------------------------------------------------------- chunking
+
+def chunk_document(
+    doc: Dict[str, Any],
+    max_tokens: int = INGEST_CHUNK_TOKENS,
+    overlap: int = INGEST_CHUNK_OVERLAP,
+    tokens: Optional[TokenizerService] = None,
+    model: str = INGEST_TOKENIZER_MODEL,
+) -> List[Dict[str, Any]]:
+    """
+    Split a document into token-bounded chunks with overlap. Each chunk keeps
+    the document's other fields and gets `id` "<document_id>#<n>",
+    `document_id` and `chunk_index`.
+    """
+    tokens = tokens or get_tokenizer_service()
+    doc_id = document_id(doc)
+    content = doc.get("content", "")
+    if not isinstance(content, str):
+        content = json.dumps(content)
+    pieces = tokens.split(content, max_tokens, overlap, model) or [""]
+    return [
+        dict(doc, id=f"{doc_id}#{i}", document_id=doc_id, chunk_index=i, content=piece)
+        for i, piece in enumerate(pieces)
+    ]
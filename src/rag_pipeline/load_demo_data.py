@@ -1,62 +1,140 @@
-import json
-from pathlib import Path
-from src.db.postgresql_connector import get_connection
-
-DATA_PATH = Path(__file__).resolve().parents[2] / "data" / "research_docs" / "demo_docs.json"
-
-def ensure_research_docs_table(conn):
-    """Create research_docs table if it doesn't exist."""
-    with conn.cursor() as cur:
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS research_docs (
-                id SERIAL PRIMARY KEY,
-                title TEXT NOT NULL,
-                content TEXT NOT NULL,
-                source VARCHAR(255),
-                created_at TIMESTAMP DEFAULT NOW()
-            );
-        """)
-    conn.commit()
-
-def load_demo_docs():
-    """Load demo docs JSON from the data directory."""
-    if not DATA_PATH.exists():
-        raise FileNotFoundError(f"❌ Demo docs file not found: {DATA_PATH}")
-    with open(DATA_PATH, "r", encoding="utf-8") as f:
-        docs = json.load(f)
-    return docs
-
-def insert_docs(conn, docs):
-    """Insert documents into research_docs table."""
-    with conn.cursor() as cur:
-        for doc in docs:
-            cur.execute("""
-                INSERT INTO research_docs (title, content, source)
-                VALUES (%s, %s, %s)
-                ON CONFLICT DO NOTHING;
-            """, (
-                doc.get("title", "Untitled"),
-                doc.get("content", ""),
-                doc.get("source", "demo"),
-            ))
-    conn.commit()
-
-def reset_and_load_demo():
-    """Clear table and reload demo docs."""
-    conn = get_connection()
-    try:
-        ensure_research_docs_table(conn)
-
-        with conn.cursor() as cur:
-            cur.execute("DELETE FROM research_docs;")
-        conn.commit()
-
-        docs = load_demo_docs()
-        insert_docs(conn, docs)
-        print(f"✅ Loaded {len(docs)} demo docs into research_docs table.")
-
-    finally:
-        conn.close()
-
-if __name__ == "__main__":
-    reset_and_load_demo()
+from pathlib import Path
+import psycopg2.extras
+from src.db.postgresql_connector import get_connection
+from src.rag_pipeline.incremental import IncrementalIndexer, IndexManifest
+from src.rag_pipeline.ingestion import iter_records
+from src.rag_pipeline.rag_manager import document_id
+
+DATA_PATH = Path(__file__).resolve().parents[2] / "data" / "research_docs" / "demo_docs.json"
+MANIFEST_PATH = Path(__file__).resolve().parents[2] / "data" / "cache" / "demo_docs.manifest.sqlite"
+
+def ensure_research_docs_table(conn):
+    """Create research_docs table if it doesn't exist."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS research_docs (
+                id SERIAL PRIMARY KEY,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                source VARCHAR(255),
+                created_at TIMESTAMP DEFAULT NOW()
+            );
+            ALTER TABLE research_docs ADD COLUMN IF NOT EXISTS document_id VARCHAR(255);
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_research_docs_document_id ON research_docs (document_id);
+        """)
+    conn.commit()
+
+def load_demo_docs():
+    """Stream demo docs from the data directory (one document at a time)."""
+    if not DATA_PATH.exists():
+        raise FileNotFoundError(f"❌ Demo docs file not found: {DATA_PATH}")
+    return iter_records(str(DATA_PATH))
+
+def insert_docs(conn, docs):
+    """Upsert documents (or chunks) into research_docs in one round trip per page."""
+    rows = {
+        document_id(doc): (document_id(doc), doc.get("title", "Untitled"), doc.get("content", ""), doc.get("source", "demo"))
+        for doc in docs
+    }
+    with conn.cursor() as cur:
+        psycopg2.extras.execute_values(
+            cur,
+            """
+            INSERT INTO research_docs (document_id, title, content, source) VALUES %s
+            ON CONFLICT (document_id) DO UPDATE
+            SET title = EXCLUDED.title, content = EXCLUDED.content, source = EXCLUDED.source
+            """,
+            list(rows.values()),
+            page_size=1000,
+        )
+    conn.commit()
+
+def delete_docs(conn, ids):
+    """Delete documents (or chunks) by id from research_docs."""
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM research_docs WHERE document_id = ANY(%s);", (list(ids),))
+    conn.commit()
+
+def index_docs(docs, embeddings=None, rag=None):
+    """Bulk-upsert docs (or chunks) into rag_data; missing embeddings are computed per batch."""
+    from src.db.migrations.rag_manager import RAGManager as PgRAGManager
+
+    owned = rag is None
+    rag = rag or PgRAGManager()
+    vectors = iter(embeddings) if embeddings is not None else None
+    rows = (
+        {
+            "document_id": document_id(doc),
+            "content": doc.get("content", ""),
+            "embedding": next(vectors) if vectors is not None else None,
+            "metadata": {k: doc[k] for k in ("title", "source", "document_id", "chunk_index") if k in doc},
+        }
+        for doc in docs
+    )
+    try:
+        return rag.bulk_upsert(rows)
+    finally:
+        if owned:
+            rag.close()
+
+def demo_sink(conn, rag):
+    """Ingestion sink writing each batch to research_docs and rag_data."""
+    def write(chunks, embeddings):
+        insert_docs(conn, chunks)
+        index_docs(chunks, embeddings=embeddings, rag=rag)
+    return write
+
+def reset_and_load_demo(path=DATA_PATH, reset=False):
+    """
+    Sync demo docs into research_docs/rag_data as overlapping chunks.
+    Unchanged docs are skipped, changed ones re-embed only their changed
+    chunks, and docs missing from the file are removed. The manifest is
+    committed after every written batch, so rerunning an interrupted load
+    resumes it without re-embedding what was written. `reset` deletes
+    everything the loader wrote (research_docs, the matching rag_data rows)
+    and the manifest first for a full reload.
+    """
+    from src.db.migrations.rag_manager import RAGManager as PgRAGManager
+
+    if not Path(path).exists():
+        raise FileNotFoundError(f"❌ Demo docs file not found: {path}")
+    rag = PgRAGManager()
+    with get_connection() as conn:
+        ensure_research_docs_table(conn)
+
+        if reset:
+            # the loader writes the same chunk ids to both tables; the manifest covers rows
+            # whose research_docs copy is already gone
+            stale = set()
+            if MANIFEST_PATH.exists():
+                manifest = IndexManifest(str(MANIFEST_PATH))
+                try:
+                    stale.update(manifest.chunk_ids())
+                finally:
+                    manifest.close()
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM research_docs RETURNING document_id;")
+                stale.update(row[0] for row in cur.fetchall() if row[0])
+            conn.commit()
+            rag.delete_documents(sorted(stale))
+            if MANIFEST_PATH.exists():
+                MANIFEST_PATH.unlink()
+
+        def delete(ids):
+            delete_docs(conn, ids)
+            rag.delete_documents(ids)
+
+        indexer = IncrementalIndexer(str(MANIFEST_PATH), demo_sink(conn, rag), delete, embedder=rag.embedder)
+        try:
+            summary = indexer.sync(iter_records(str(path)), scope="demo")
+        finally:
+            indexer.close()
+        print(
+            f"✅ Demo docs synced: {summary['added']} added, {summary['changed']} changed, "
+            f"{summary['removed']} removed, {summary['unchanged']} unchanged."
+        )
+        return summary
+
+if __name__ == "__main__":
+    import sys
+    reset_and_load_demo(reset="--reset" in sys.argv)
@@ -0,0 +1,191 @@
+import heapq
+import json
+import os
+import threading
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Document field that picks a partition (source tool, or e.g. "tenant")
+RAG_PARTITION_FIELD = os.getenv("RAG_PARTITION_FIELD", "source")
+# Index backend used inside each partition ("memory", "quantized" or "faiss")
+RAG_PARTITION_BACKEND = os.getenv("RAG_PARTITION_BACKEND", "memory")
+DEFAULT_PARTITION = "default"
+
+
+def partition_key(record: Dict[str, Any], field: str = RAG_PARTITION_FIELD) -> str:
+    """Normalized partition of a document (or metadata dict): lower-cased `field`, else "default"."""
+    value = record.get(field)
+    key = str(value).strip().lower() if value is not None else ""
+    return key or DEFAULT_PARTITION
+
+
+def partition_keys(values: Iterable[Any]) -> List[str]:
+    """Normalize requested partitions the same way documents are keyed."""
+    return sorted({partition_key({"p": v}, "p") for v in values})
+
+
+class PartitionedVectorIndex:
+    """
+    One vector index per partition (source or tenant), searched selectively.
+
+    Queries name the partitions they need; only those are scanned and their
+    per-partition top-k lists are merged by score (all backends return
+    cosine scores, so they compare directly). Without `partitions` every
+    partition is searched. A partition can be rebuilt on its own: writes to
+    it wait while the replacement is built, searches keep using the old one
+    until it is swapped in, and other partitions are untouched.
+    """
+
+    def __init__(self, dim: int, backend: str = RAG_PARTITION_BACKEND, field: str = RAG_PARTITION_FIELD, **index_params: Any):
+        self.dim = dim
+        self.backend = backend
+        self.field = field
+        self.index_params = index_params
+        self.partitions: Dict[str, Any] = {}
+        self._where: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._partition_locks: Dict[str, threading.RLock] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._where
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._where)
+
+    def partition_of(self, doc_id: str) -> Optional[str]:
+        return self._where.get(doc_id)
+
+    def memory_bytes(self) -> int:
+        return sum(p.memory_bytes() for p in list(self.partitions.values()))
+
+    def _partition(self, key: str) -> Tuple[Any, threading.RLock]:
+        from src.rag_pipeline.rag_manager import make_index
+
+        with self._lock:
+            if key not in self.partitions:
+                self.partitions[key] = make_index(self.backend, self.dim, **self.index_params)
+                self._partition_locks[key] = threading.RLock()
+            return self.partitions[key], self._partition_locks[key]
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray, partitions: Optional[Sequence[str]] = None) -> None:
+        """
+        Insert or overwrite vectors; `partitions` gives each id's partition
+        (default: where the id already is, else "default"). An id whose
+        partition changes is removed from the old one.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"expected {len(ids)} vectors of dim {self.dim}, got {vectors.shape}")
+        if partitions is None:
+            partitions = [self._where.get(doc_id, DEFAULT_PARTITION) for doc_id in ids]
+        groups: Dict[str, List[int]] = {}
+        moved: List[str] = []
+        for i, (doc_id, key) in enumerate(zip(ids, partitions)):
+            key = key or DEFAULT_PARTITION
+            groups.setdefault(key, []).append(i)
+            if self._where.get(doc_id, key) != key:
+                moved.append(doc_id)
+        if moved:
+            self.delete(moved)
+        for key, rows in groups.items():
+            _, lock = self._partition(key)
+            with lock:
+                self.partitions[key].add([ids[i] for i in rows], vectors[rows])
+            with self._lock:
+                for i in rows:
+                    self._where[ids[i]] = key
+
+    def delete(self, ids: Iterable[str]) -> int:
+        groups: Dict[str, List[str]] = {}
+        with self._lock:
+            for doc_id in ids:
+                key = self._where.pop(doc_id, None)
+                if key is not None:
+                    groups.setdefault(key, []).append(doc_id)
+        removed = 0
+        for key, doc_ids in groups.items():
+            _, lock = self._partition(key)
+            with lock:
+                removed += self.partitions[key].delete(doc_ids)
+        return removed
+
+    def get_vector(self, doc_id: str) -> Optional[np.ndarray]:
+        key = self._where.get(doc_id)
+        return None if key is None else self.partitions[key].get_vector(doc_id)
+
+    def search_batch(self, queries: np.ndarray, top_k: int = 5, partitions: Optional[Sequence[str]] = None, **kwargs: Any) -> List[List[Tuple[str, float]]]:
+        """Top-k (id, score) per query over `partitions` (default: all), best first."""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            if partitions is None:
+                targets = list(self.partitions.values())
+            else:
+                targets = [self.partitions[k] for k in partition_keys(partitions) if k in self.partitions]
+        per_partition = [index.search_batch(queries, top_k, **kwargs) for index in targets if len(index)]
+        if len(per_partition) == 1:
+            return per_partition[0]
+        return [
+            heapq.nlargest(top_k, chain.from_iterable(hits[i] for hits in per_partition), key=lambda hit: hit[1])
+            for i in range(len(queries))
+        ]
+
+    def search(self, query: np.ndarray, top_k: int = 5, **kwargs: Any) -> List[Tuple[str, float]]:
+        return self.search_batch(np.asarray(query).reshape(1, -1), top_k, **kwargs)[0]
+
+    def stats(self) -> Dict[str, int]:
+        """Documents per partition."""
+        with self._lock:
+            return {key: len(index) for key, index in sorted(self.partitions.items())}
+
+    def rebuild_partition(self, key: str, **params: Any) -> None:
+        """Rebuild one partition from its stored vectors (optionally with new index params)."""
+        from src.rag_pipeline.rag_manager import make_index
+
+        _, lock = self._partition(key)
+        with lock:
+            old = self.partitions[key]
+            fresh = make_index(self.backend, self.dim, **dict(self.index_params, **params))
+            ids = old.ids
+            if ids:
+                fresh.add(ids, np.vstack([old.get_vector(doc_id) for doc_id in ids]))
+            # in-flight searches may still hold the old index; it is released with them
+            with self._lock:
+                self.partitions[key] = fresh
+
+    def save(self, path: str) -> None:
+        """Write every partition into directory `path` plus a partitions.json manifest."""
+        from src.rag_pipeline.rag_manager import INDEX_FILES
+
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            files = {}
+            for n, (key, index) in enumerate(sorted(self.partitions.items())):
+                files[key] = f"{n:04d}-{INDEX_FILES[self.backend]}"
+                with self._partition_locks[key]:
+                    index.save(os.path.join(path, files[key]))
+            manifest = {"dim": self.dim, "backend": self.backend, "field": self.field, "index_params": self.index_params, "partitions": files}
+        tmp = os.path.join(path, "partitions.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(path, "partitions.json"))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "PartitionedVectorIndex":
+        from src.rag_pipeline.rag_manager import load_index
+
+        with open(os.path.join(path, "partitions.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        index = cls(manifest["dim"], backend=manifest["backend"], field=manifest["field"], **manifest["index_params"])
+        for key, filename in manifest["partitions"].items():
+            part = load_index(manifest["backend"], os.path.join(path, filename), mmap=mmap)
+            index.partitions[key] = part
+            index._partition_locks[key] = threading.RLock()
+            for doc_id in part.ids:
+                index._where[doc_id] = key
+        return index
@@ -0,0 +1,405 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.rag_pipeline.vector_index import normalize_rows, top_k_rows
+
+QUANTIZATION_MODES = ("float16", "int8", "binary")
+
+# Rows scored per block when decoding codes, bounding temporary float32 copies
+_SCORE_BLOCK = 65536
+
+# Candidates re-ranked per result, by mode: coarser codes need a deeper pool
+DEFAULT_RERANK_FACTORS = {"float16": 2, "int8": 4, "binary": 16}
+
+# popcount of every byte value, for Hamming distance over packed sign bits
+# (NumPy >= 2.0 has a native bitwise_count)
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.int32)
+
+
+def _popcount_rows(bits: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[bits].sum(axis=1)
+
+
+class Float16Codec:
+    """Half-precision copy of each vector (2x smaller than float32)."""
+
+    name = "float16"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.code_shape = (dim,)
+        self.dtype = np.float16
+
+    def bytes_per_vector(self) -> int:
+        return self.dim * 2
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return vectors.astype(np.float16)
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        out = np.empty((queries.shape[0], codes.shape[0]), dtype=np.float32)
+        for start in range(0, codes.shape[0], _SCORE_BLOCK):
+            block = codes[start:start + _SCORE_BLOCK].astype(np.float32)
+            out[:, start:start + len(block)] = queries @ block.T
+        return out
+
+
+class Int8Codec:
+    """
+    Scalar int8 codes with one float32 scale per vector (about 4x smaller).
+    The scale is stored in the last four bytes of each code row.
+    """
+
+    name = "int8"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.code_shape = (dim + 4,)
+        self.dtype = np.int8
+
+    def bytes_per_vector(self) -> int:
+        return self.dim + 4
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        peak = np.abs(vectors).max(axis=1, keepdims=True)
+        peak[peak == 0] = 1.0
+        scale = (peak / 127.0).astype(np.float32)
+        codes = np.empty((len(vectors), self.dim + 4), dtype=np.int8)
+        codes[:, : self.dim] = np.clip(np.rint(vectors / scale), -127, 127)
+        codes[:, self.dim:] = scale.view(np.int8)
+        return codes
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        out = np.empty((queries.shape[0], codes.shape[0]), dtype=np.float32)
+        for start in range(0, codes.shape[0], _SCORE_BLOCK):
+            block = codes[start:start + _SCORE_BLOCK]
+            scale = np.ascontiguousarray(block[:, self.dim:]).view(np.float32)[:, 0]
+            out[:, start:start + len(block)] = (queries @ block[:, : self.dim].astype(np.float32).T) * scale
+        return out
+
+
+class BinaryCodec:
+    """
+    One sign bit per dimension, packed (32x smaller than float32).
+    Scores are negated Hamming distances, computed by XOR + byte popcount.
+    """
+
+    name = "binary"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.code_shape = ((dim + 7) // 8,)
+        self.dtype = np.uint8
+
+    def bytes_per_vector(self) -> int:
+        return (self.dim + 7) // 8
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(vectors > 0, axis=1)
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        q = self.encode(queries)
+        out = np.empty((q.shape[0], codes.shape[0]), dtype=np.float32)
+        for i, row in enumerate(q):
+            for start in range(0, codes.shape[0], _SCORE_BLOCK):
+                block = codes[start:start + _SCORE_BLOCK]
+                out[i, start:start + len(block)] = -_popcount_rows(np.bitwise_xor(block, row))
+        return out
+
+
+CODECS = {"float16": Float16Codec, "int8": Int8Codec, "binary": BinaryCodec}
+
+
+def make_codec(mode: str, dim: int):
+    if mode not in CODECS:
+        raise ValueError(f"quantization mode must be one of {QUANTIZATION_MODES}")
+    return CODECS[mode](dim)
+
+
+class FullPrecisionStore:
+    """
+    float32 vectors on a memory-mapped file, addressed by row.
+
+    Used only to re-rank small candidate sets, so the rows a query touches
+    are paged in on demand and the rest stay on disk rather than in the
+    process heap. Capacity grows by doubling (the file is extended and
+    re-mapped). `open_saved()` maps a saved .npy file copy-on-write instead:
+    overwritten rows become private pages, and the rows move to a file of
+    the store's own only when it has to grow.
+    """
+
+    def __init__(self, dim: int, path: Optional[str] = None, capacity: int = 1024):
+        self.dim = dim
+        self._owned = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="vectors-", suffix=".f32")
+            os.close(fd)
+        self.path = path
+        self._saved = False
+        self._capacity = 0
+        self._map: Optional[np.memmap] = None
+        self._grow(max(1, capacity))
+
+    @classmethod
+    def open_saved(cls, path: str) -> "FullPrecisionStore":
+        """Map an (n, dim) float32 .npy file (n >= 1) without copying it; the file is never written."""
+        rows = np.load(path, mmap_mode="c")
+        store = cls.__new__(cls)
+        store.dim = rows.shape[1]
+        store._owned = False
+        store.path = path
+        store._saved = True
+        store._capacity = rows.shape[0]
+        store._map = rows
+        return store
+
+    def _grow(self, capacity: int) -> None:
+        if self._saved:
+            # never extend a saved file: copy its rows into a file of our own
+            saved, self._map = self._map, None
+            fd, self.path = tempfile.mkstemp(prefix="vectors-", suffix=".f32")
+            os.close(fd)
+            self._owned, self._saved = True, False
+            self._grow(capacity)
+            self._map[: len(saved)] = saved
+            del saved
+            return
+        if self._map is not None:
+            self._map.flush()
+            del self._map
+        with open(self.path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._map = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def ensure(self, rows: int) -> None:
+        if rows > self._capacity:
+            capacity = self._capacity
+            while capacity < rows:
+                capacity *= 2
+            self._grow(capacity)
+
+    def __getitem__(self, rows) -> np.ndarray:
+        return self._map[rows]
+
+    def __setitem__(self, rows, values) -> None:
+        self._map[rows] = values
+
+    def flush(self) -> None:
+        self._map.flush()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+        if self._owned and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class QuantizedVectorIndex:
+    """
+    Cosine index that keeps only compressed codes in memory.
+
+    Queries are scored against the codes (float16 / int8 dot products or
+    binary Hamming distance), the best `top_k * rerank_factor` candidates
+    are re-scored exactly with float32 vectors from a memory-mapped
+    FullPrecisionStore, and the top_k of those are returned. Same interface
+    as InMemoryVectorIndex (add/delete/search_batch/save/load).
+    """
+
+    def __init__(self, dim: int, mode: str = "int8", rerank_factor: Optional[int] = None, initial_capacity: int = 1024, full_path: Optional[str] = None):
+        self.dim = dim
+        self.mode = mode
+        self.codec = make_codec(mode, dim)
+        self.rerank_factor = rerank_factor or DEFAULT_RERANK_FACTORS[mode]
+        capacity = max(1, initial_capacity)
+        self._codes = np.zeros((capacity,) + self.codec.code_shape, dtype=self.codec.dtype)
+        self._full = FullPrecisionStore(dim, full_path, capacity)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._ids)
+
+    def memory_bytes(self) -> int:
+        """Resident size of the codes (the float32 store is file-backed)."""
+        return self._codes.nbytes
+
+    def _ensure_capacity(self, needed: int) -> None:
+        capacity = self._codes.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros((capacity,) + self.codec.code_shape, dtype=self.codec.dtype)
+        grown[: len(self._ids)] = self._codes[: len(self._ids)]
+        self._codes = grown
+        self._full.ensure(capacity)
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        """Insert or overwrite vectors for `ids`."""
+        vectors = normalize_rows(vectors)
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"expected {len(ids)} vectors of dim {self.dim}, got {vectors.shape}")
+        codes = self.codec.encode(vectors)
+        with self._lock:
+            new = [doc_id for doc_id in ids if doc_id not in self._rows]
+            self._ensure_capacity(len(self._ids) + len(new))
+            for i, doc_id in enumerate(ids):
+                row = self._rows.get(doc_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._rows[doc_id] = row
+                    self._ids.append(doc_id)
+                self._codes[row] = codes[i]
+                self._full[row] = vectors[i]
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Remove ids (unknown ids are ignored). Returns the number removed."""
+        removed = 0
+        with self._lock:
+            for doc_id in ids:
+                row = self._rows.pop(doc_id, None)
+                if row is None:
+                    continue
+                last = len(self._ids) - 1
+                if row != last:
+                    moved = self._ids[last]
+                    self._codes[row] = self._codes[last]
+                    self._full[row] = self._full[last]
+                    self._ids[row] = moved
+                    self._rows[moved] = row
+                self._ids.pop()
+                removed += 1
+        return removed
+
+    def get_vector(self, doc_id: str) -> Optional[np.ndarray]:
+        row = self._rows.get(doc_id)
+        return None if row is None else np.array(self._full[row])
+
+    def search_batch(self, queries: np.ndarray, top_k: int = 5, rerank: bool = True) -> List[List[Tuple[str, float]]]:
+        """
+        Top-k (id, cosine score) lists for each query row, best first.
+        With `rerank=False` the approximate code scores are returned as-is.
+        """
+        queries = normalize_rows(queries)
+        with self._lock:
+            n = len(self._ids)
+            if n == 0:
+                return [[] for _ in range(queries.shape[0])]
+            approx = self.codec.scores(queries, self._codes[:n])
+            depth = top_k * self.rerank_factor if rerank else top_k
+            cand_idx, cand_scores = top_k_rows(approx, depth)
+            results = []
+            for q, rows, scores in zip(queries, cand_idx, cand_scores):
+                if rerank:
+                    order = np.sort(rows)  # ascending rows read the memmap sequentially
+                    exact = self._full[order] @ q
+                    best = np.argsort(-exact, kind="stable")[:top_k]
+                    hits = [(self._ids[int(order[j])], float(exact[j])) for j in best]
+                else:
+                    hits = [(self._ids[int(r)], float(s)) for r, s in zip(rows, scores)]
+                results.append(hits)
+            return results
+
+    def search(self, query: np.ndarray, top_k: int = 5, **kwargs: Any) -> List[Tuple[str, float]]:
+        return self.search_batch(np.asarray(query).reshape(1, -1), top_k, **kwargs)[0]
+
+    def save(self, path: str) -> None:
+        """Write codes to `<path>` (.npy), float32 rows to `<path>.full.npy` and ids/settings to `<path>.meta.json`."""
+        with self._lock:
+            n = len(self._ids)
+            for target, data in ((path, self._codes[:n]), (f"{path}.full.npy", self._full[:n])):
+                tmp = f"{target}.tmp.npy"
+                np.save(tmp, data)
+                os.replace(tmp, target)
+            meta = {"dim": self.dim, "mode": self.mode, "rerank_factor": self.rerank_factor, "ids": self._ids}
+            with open(f"{path}.meta.json.tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(f"{path}.meta.json.tmp", f"{path}.meta.json")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "QuantizedVectorIndex":
+        """
+        Open a saved index. With `mmap` the codes and float32 rows are mapped
+        from the saved files copy-on-write: nothing is copied up front, and
+        the files are left untouched when the index is modified or grows.
+        Without it both are read into memory / a private temporary file.
+        """
+        with open(f"{path}.meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        n = len(meta["ids"])
+        index = cls(meta["dim"], meta["mode"], meta["rerank_factor"], initial_capacity=1 if mmap else max(1, n))
+        if mmap and n:
+            index._codes = np.load(path, mmap_mode="c")
+            index._full.close()
+            index._full = FullPrecisionStore.open_saved(f"{path}.full.npy")
+        elif n:
+            index._codes[:n] = np.load(path)
+            index._full[:n] = np.load(f"{path}.full.npy", mmap_mode="r")
+        index._ids = list(meta["ids"])
+        index._rows = {doc_id: row for row, doc_id in enumerate(index._ids)}
+        return index
+
+    def close(self) -> None:
+        self._full.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def evaluate_quantization(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    top_k: int = 10,
+    modes: Sequence[str] = QUANTIZATION_MODES,
+    rerank_factor: Optional[int] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Memory footprint and recall@k of each quantization mode against exact
+    float32 search, with and without re-ranking.
+    """
+    ids = [str(i) for i in range(len(vectors))]
+    full = normalize_rows(vectors)
+    truth_idx, _ = top_k_rows(normalize_rows(queries) @ full.T, top_k)
+    truth = [set(map(str, row)) for row in truth_idx.tolist()]
+
+    report: Dict[str, Dict[str, Any]] = {
+        "float32": {"bytes_per_vector": vectors.shape[1] * 4, "memory_bytes": full.nbytes, "compression": 1.0, "recall": 1.0}
+    }
+    for mode in modes:
+        index = QuantizedVectorIndex(vectors.shape[1], mode, rerank_factor, initial_capacity=len(vectors))
+        index.add(ids, vectors)
+        entry: Dict[str, Any] = {
+            "bytes_per_vector": index.codec.bytes_per_vector(),
+            "memory_bytes": index.memory_bytes(),
+            "compression": round(vectors.shape[1] * 4 / index.codec.bytes_per_vector(), 2),
+        }
+        for label, rerank in (("recall_raw", False), ("recall", True)):
+            start = time.perf_counter()
+            hits = index.search_batch(queries, top_k, rerank=rerank)
+            entry[f"{label}_ms_per_query"] = round((time.perf_counter() - start) * 1000 / len(queries), 3)
+            found = sum(len(truth[i] & {h[0] for h in row}) for i, row in enumerate(hits))
+            entry[label] = round(found / (len(queries) * top_k), 4)
+        index.close()
+        report[mode] = entry
+    return report
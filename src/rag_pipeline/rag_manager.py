@@ -1,14 +1,390 @@
-from typing import List, Dict
-
-class RAGManager:
-    def __init__(self):
-        # Initialize vector stores, retrievers, etc.
-        self.documents = []
-
-    def add_documents(self, docs: List[Dict]):
-        self.documents.extend(docs)
-
-    def query(self, query_text: str) -> str:
-        # Retrieve and rank relevant documents
-        # Placeholder logic
-        return f"Retrieved relevant documents for query: {query_text}"
\ No newline at end of file
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.rag_pipeline.bm25 import BM25Index
+from src.rag_pipeline.content_store import ContentStore
+from src.rag_pipeline.embeddings import HashingEmbedder
+from src.rag_pipeline.partitioned_index import PartitionedVectorIndex, partition_key, partition_keys
+from src.rag_pipeline.quantization import QuantizedVectorIndex
+from src.rag_pipeline.vector_index import InMemoryVectorIndex
+from src.state.deadline import Deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# Index backend selection: "memory" (exact NumPy), "quantized" (compressed
+# codes + exact re-rank), "faiss" (flat / ivf / hnsw) or "partitioned" (one
+# index per source / tenant, see partitioned_index.py)
+RAG_INDEX_BACKEND = os.getenv("RAG_INDEX_BACKEND", "memory")
+RAG_FAISS_INDEX_TYPE = os.getenv("RAG_FAISS_INDEX_TYPE", "flat")
+# Code format for the "quantized" backend ("float16", "int8", "binary") and
+# for FAISS ("none", "float16", "int8")
+RAG_QUANTIZATION = os.getenv("RAG_QUANTIZATION", "")
+
+INDEX_FILES = {"memory": "vectors.npy", "quantized": "codes.npy", "faiss": "index.faiss", "partitioned": "partitions"}
+
+# Query mode: "vector", "lexical" (BM25) or "hybrid" (both, fused)
+RAG_QUERY_MODE = os.getenv("RAG_QUERY_MODE", "hybrid")
+# Per-source latency budgets for hybrid queries; a source that misses its
+# budget is dropped and the other one answers alone.
+RAG_VECTOR_BUDGET_MS = float(os.getenv("RAG_VECTOR_BUDGET_MS", "200"))
+RAG_LEXICAL_BUDGET_MS = float(os.getenv("RAG_LEXICAL_BUDGET_MS", "100"))
+RRF_K = 60
+
+# Optional cross-encoder re-ranking: enabled by default for these task types
+# when RAG_RERANK is set (or a reranker is passed to RAGManager)
+RAG_RERANK = os.getenv("RAG_RERANK", "").lower() in ("1", "true", "yes")
+RAG_RERANK_TASK_TYPES = set(filter(None, os.getenv("RAG_RERANK_TASK_TYPES", "research_query").split(",")))
+# Candidates retrieved per returned document when re-ranking
+RAG_RERANK_DEPTH = int(os.getenv("RAG_RERANK_DEPTH", "4"))
+
+Hits = List[Tuple[str, float]]
+
+# Shared pool so vector and lexical retrieval run side by side
+_RETRIEVAL_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag-retrieval")
+# Retrievals still running past their budget, allowed per source; beyond
+# that the source is skipped until some finish, so one slow source cannot
+# take over the shared pool
+RAG_MAX_OVERDUE_PER_SOURCE = int(os.getenv("RAG_MAX_OVERDUE_PER_SOURCE", "2"))
+_overdue: Dict[str, int] = {}
+_overdue_lock = threading.Lock()
+
+
+def _track_overdue(name: str, fut) -> None:
+    """Count `fut` against its source until it finishes."""
+    with _overdue_lock:
+        _overdue[name] = _overdue.get(name, 0) + 1
+
+    def _done(_):
+        with _overdue_lock:
+            _overdue[name] -= 1
+
+    fut.add_done_callback(_done)
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, Hits], k: int = RRF_K) -> Hits:
+    """RRF: sum of 1 / (k + rank) over every ranking a document appears in."""
+    fused: Dict[str, float] = {}
+    for hits in rankings.values():
+        for rank, (doc_id, _) in enumerate(hits, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def weighted_fusion(rankings: Dict[str, Hits], weights: Dict[str, float]) -> Hits:
+    """Weighted sum of per-source scores after min-max normalization."""
+    fused: Dict[str, float] = {}
+    for source, hits in rankings.items():
+        if not hits:
+            continue
+        scores = [s for _, s in hits]
+        lo, hi = min(scores), max(scores)
+        span = (hi - lo) or 1.0
+        w = weights.get(source, 1.0)
+        for doc_id, s in hits:
+            fused[doc_id] = fused.get(doc_id, 0.0) + w * ((s - lo) / span if hi > lo else 1.0)
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def make_index(backend: str, dim: int, **params: Any):
+    """Create an empty vector index for `backend` ("memory", "quantized", "faiss" or "partitioned")."""
+    if backend == "memory":
+        return InMemoryVectorIndex(dim, **params)
+    if backend == "quantized":
+        params.setdefault("mode", RAG_QUANTIZATION or "int8")
+        return QuantizedVectorIndex(dim, **params)
+    if backend == "faiss":
+        from src.rag_pipeline.faiss_index import FaissVectorIndex
+        params.setdefault("index_type", RAG_FAISS_INDEX_TYPE)
+        if RAG_QUANTIZATION:
+            params.setdefault("quantization", RAG_QUANTIZATION)
+        return FaissVectorIndex(dim, **params)
+    if backend == "partitioned":
+        from src.rag_pipeline.partitioned_index import PartitionedVectorIndex
+        return PartitionedVectorIndex(dim, **params)
+    raise ValueError(f"unknown index backend: {backend}")
+
+
+def load_index(backend: str, path: str, mmap: bool = True):
+    """Open an index saved by `backend`'s save()."""
+    if backend == "faiss":
+        from src.rag_pipeline.faiss_index import FaissVectorIndex
+        return FaissVectorIndex.load(path, mmap=mmap)
+    if backend == "quantized":
+        return QuantizedVectorIndex.load(path, mmap=mmap)
+    if backend == "partitioned":
+        from src.rag_pipeline.partitioned_index import PartitionedVectorIndex
+        return PartitionedVectorIndex.load(path, mmap=mmap)
+    return InMemoryVectorIndex.load(path, mmap=mmap)
+
+
+def document_id(doc: Dict[str, Any]) -> str:
+    """Stable id for a document: its own id if present, else a hash of title + content."""
+    explicit = doc.get("id") or doc.get("document_id")
+    if explicit:
+        return str(explicit)
+    digest = hashlib.sha1(f"{doc.get('title', '')}\n{doc.get('content', '')}".encode("utf-8")).hexdigest()
+    return f"doc_{digest[:16]}"
+
+
+def document_text(doc: Dict[str, Any]) -> str:
+    """Text that gets embedded for a document."""
+    content = doc.get("content", "")
+    if not isinstance(content, str):
+        content = json.dumps(content)
+    title = doc.get("title")
+    return f"{title}\n{content}" if title else content
+
+
+class RAGManager:
+    """
+    In-process retrieval: documents are embedded once on insert and served from
+    a vector index (NumPy or FAISS), so queries need no database round trip.
+    Document text lives in a memory-mapped ContentStore rather than the heap.
+    `save`/`load` persist index and documents so a restart does not re-embed.
+    """
+
+    def __init__(self, embedder=None, backend: str = RAG_INDEX_BACKEND, index=None, reranker=None, documents: Optional[ContentStore] = None, **index_params: Any):
+        # Any object with `dim` and `embed(texts) -> np.ndarray` works as embedder
+        self.embedder = embedder or HashingEmbedder()
+        if reranker is None and RAG_RERANK:
+            from src.rag_pipeline.reranker import get_reranker
+            reranker = get_reranker()
+        self.reranker = reranker
+        self.backend = backend
+        self.index = index if index is not None else make_index(backend, self.embedder.dim, **index_params)
+        self.lexical = BM25Index()
+        self.documents = documents if documents is not None else ContentStore()
+        self.query_mode = RAG_QUERY_MODE
+        self.budgets_ms = {"vector": RAG_VECTOR_BUDGET_MS, "lexical": RAG_LEXICAL_BUDGET_MS}
+
+    @property
+    def partitioned(self) -> bool:
+        return isinstance(self.index, PartitionedVectorIndex)
+
+    def add_documents(self, docs: List[Dict], embeddings: Optional[np.ndarray] = None) -> List[str]:
+        """Add or replace documents; embeddings are computed in one batch unless supplied."""
+        if not docs:
+            return []
+        ids = [document_id(d) for d in docs]
+        texts = [document_text(d) for d in docs]
+        if embeddings is None:
+            embeddings = self.embedder.embed(texts)
+        if self.partitioned:
+            self.index.add(ids, embeddings, partitions=[partition_key(d, self.index.field) for d in docs])
+        else:
+            self.index.add(ids, embeddings)
+        self.lexical.add(ids, texts)
+        self.documents.add_many(zip(ids, docs))
+        return ids
+
+    def delete_documents(self, ids: Sequence[str]) -> int:
+        self.documents.delete(ids)
+        self.lexical.delete(ids)
+        return self.index.delete(ids)
+
+    def load_documents(self, path: str) -> List[str]:
+        """Load a JSON array of documents from disk into the index."""
+        with open(path, "r", encoding="utf-8") as f:
+            return self.add_documents(json.load(f))
+
+    def save(self, path: str) -> None:
+        """Persist index, documents and a manifest into directory `path`."""
+        root = Path(path)
+        root.mkdir(parents=True, exist_ok=True)
+        self.index.save(str(root / INDEX_FILES[self.backend]))
+        self.documents.save(str(root / "content"))
+        with open(root / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump({"backend": self.backend, "embedder": getattr(self.embedder, "name", None), "dim": self.embedder.dim}, f)
+
+    @classmethod
+    def load(cls, path: str, embedder=None, mmap: bool = True) -> "RAGManager":
+        """
+        Open a saved RAGManager; the index file is memory-mapped when `mmap`
+        is set (document text always is, so worker processes loading the same
+        directory share its pages).
+        """
+        root = Path(path)
+        with open(root / "manifest.json", "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        embedder = embedder or HashingEmbedder(manifest["dim"])
+        if embedder.dim != manifest["dim"]:
+            raise ValueError(f"embedder dim {embedder.dim} does not match saved index dim {manifest['dim']}")
+        backend = manifest["backend"]
+        index = load_index(backend, str(root / INDEX_FILES[backend]), mmap=mmap)
+        if (root / "content").is_dir():
+            documents = ContentStore(str(root / "content"))
+        else:
+            # saved before the content store existed
+            documents = ContentStore()
+            with open(root / "documents.json", "r", encoding="utf-8") as f:
+                documents.add_many(json.load(f).items())
+        rag = cls(embedder=embedder, backend=backend, index=index, documents=documents)
+        # BM25 postings are cheap to rebuild from text; only embeddings are persisted
+        rag.lexical.add(list(rag.documents), [document_text(d) for d in rag.documents.values()])
+        return rag
+
+    def _results(self, hits: Hits, sources: Optional[Dict[str, set]] = None) -> List[Dict[str, Any]]:
+        out = []
+        for rank, (doc_id, score) in enumerate(hits, start=1):
+            doc = dict(self.documents[doc_id], score=score, rank=rank)
+            if sources is not None:
+                doc["sources"] = sorted(sources.get(doc_id, ()))
+            out.append(doc)
+        return out
+
+    def _run_sources(
+        self,
+        sources: Dict[str, Callable[[threading.Event], List[Hits]]],
+        budgets_ms: Dict[str, float],
+        deadline: Optional[Deadline] = None,
+    ) -> Dict[str, List[Hits]]:
+        """
+        Run retrieval sources concurrently, each against its own latency budget.
+        Sources that miss their budget (or fail) are dropped; if all of them
+        miss, the first one to finish within `deadline` is used (DeadlineExceeded
+        when none does). Dropped work is cancelled if it
+        has not started, and otherwise told to stop through the event each
+        source receives; sources with RAG_MAX_OVERDUE_PER_SOURCE retrievals
+        still running late are skipped (unless every source is).
+        """
+        start = time.monotonic()
+        with _overdue_lock:
+            saturated = {name for name in sources if _overdue.get(name, 0) >= RAG_MAX_OVERDUE_PER_SOURCE}
+        if saturated and len(saturated) < len(sources):
+            logger.info(f"skipping retrieval sources with too much overdue work: {sorted(saturated)}")
+            sources = {name: fn for name, fn in sources.items() if name not in saturated}
+        stops = {name: threading.Event() for name in sources}
+        futures = {name: _RETRIEVAL_POOL.submit(fn, stops[name]) for name, fn in sources.items()}
+        results: Dict[str, List[Hits]] = {}
+        late: List[str] = []
+        for name, fut in futures.items():
+            remaining = budgets_ms[name] / 1000.0 - (time.monotonic() - start)
+            try:
+                results[name] = fut.result(timeout=max(0.0, remaining))
+            except FuturesTimeout:
+                logger.info(f"{name} retrieval missed its {budgets_ms[name]:.0f}ms budget")
+                late.append(name)
+            except Exception:
+                logger.exception(f"{name} retrieval failed")
+        if not results:
+            try:
+                for fut in as_completed(futures.values(), timeout=deadline.remaining() if deadline is not None else None):
+                    if fut.exception() is None:
+                        name = next(n for n, f in futures.items() if f is fut)
+                        results[name] = fut.result()
+                        break
+            except FuturesTimeout:
+                logger.info("no retrieval source finished before the request deadline")
+        for name in late:
+            fut = futures[name]
+            if name in results or fut.cancel() or fut.done():
+                continue
+            stops[name].set()
+            _track_overdue(name, fut)
+        if not results:
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceeded(f"retrieval exceeded its {deadline.timeout_s:.1f}s deadline")
+            raise RuntimeError("all retrieval sources failed")
+        return results
+
+    def query_batch(
+        self,
+        query_texts: Sequence[str],
+        top_k: int = 5,
+        mode: Optional[str] = None,
+        fusion: str = "rrf",
+        weights: Optional[Dict[str, float]] = None,
+        budgets_ms: Optional[Dict[str, float]] = None,
+        deadline: Optional[Deadline] = None,
+        task_type: Optional[str] = None,
+        rerank: Optional[bool] = None,
+        partitions: Optional[Sequence[str]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search several queries at once.
+          - mode: "vector", "lexical" or "hybrid" (default: RAG_QUERY_MODE)
+          - fusion: "rrf" or "weighted" (with per-source `weights`) for hybrid mode
+          - budgets_ms: per-source latency budgets, capped by the request deadline
+          - rerank: re-score top_k * RAG_RERANK_DEPTH candidates with the
+            cross-encoder and keep the top_k (default: on for
+            RAG_RERANK_TASK_TYPES when a reranker is configured)
+          - partitions: only search these partitions (sources / tenants);
+            needs the "partitioned" backend
+        """
+        if not query_texts:
+            return []
+        query_texts = list(query_texts)
+        if partitions is not None and not self.partitioned:
+            raise ValueError("partitions require the partitioned index backend")
+        if rerank is None:
+            rerank = task_type in RAG_RERANK_TASK_TYPES
+        if rerank and self.reranker is not None:
+            pools = self.query_batch(query_texts, top_k * RAG_RERANK_DEPTH, mode, fusion, weights, budgets_ms, deadline, rerank=False, partitions=partitions)
+            return [self.reranker.rerank(q, pool, top_k, deadline=deadline) for q, pool in zip(query_texts, pools)]
+        mode = mode or self.query_mode
+        if mode == "vector":
+            return [self._results(h) for h in self._vector_search(query_texts, top_k, partitions)]
+        if mode == "lexical":
+            return [self._results(h[:top_k]) for h in self._lexical_search(query_texts, top_k, partitions)]
+        if mode != "hybrid":
+            raise ValueError(f"unknown query mode: {mode}")
+
+        depth = max(top_k * 4, 20)
+        budgets = dict(self.budgets_ms, **(budgets_ms or {}))
+        if deadline is not None:
+            budgets = {name: min(ms, deadline.remaining_ms()) for name, ms in budgets.items()}
+        per_source = self._run_sources(
+            {
+                "vector": lambda stop: self._vector_search(query_texts, depth, partitions),
+                "lexical": lambda stop: self._lexical_search(query_texts, depth, partitions, stop),
+            },
+            budgets,
+            deadline,
+        )
+
+        out = []
+        for i in range(len(query_texts)):
+            rankings = {name: hits[i] for name, hits in per_source.items()}
+            if fusion == "weighted":
+                fused = weighted_fusion(rankings, weights or {})
+            else:
+                fused = reciprocal_rank_fusion(rankings)
+            seen: Dict[str, set] = {}
+            for name, hits in rankings.items():
+                for doc_id, _ in hits:
+                    seen.setdefault(doc_id, set()).add(name)
+            out.append(self._results(fused[:top_k], seen))
+        return out
+
+    def _vector_search(self, query_texts: List[str], top_k: int, partitions: Optional[Sequence[str]] = None) -> List[Hits]:
+        if partitions is not None:
+            return self.index.search_batch(self.embedder.embed(query_texts), top_k=top_k, partitions=partitions)
+        return self.index.search_batch(self.embedder.embed(query_texts), top_k=top_k)
+
+    def _lexical_search(
+        self, query_texts: List[str], top_k: int, partitions: Optional[Sequence[str]] = None, stop: Optional[threading.Event] = None
+    ) -> List[Hits]:
+        # BM25 spans every partition: with partitions, search deeper and keep hits from the requested ones
+        keys = set(partition_keys(partitions)) if partitions is not None else None
+        out = []
+        for text in query_texts:
+            if stop is not None and stop.is_set():
+                raise DeadlineExceeded("lexical retrieval stopped after missing its budget")
+            if keys is None:
+                out.append(self.lexical.search(text, top_k))
+            else:
+                out.append([h for h in self.lexical.search(text, top_k * 4) if self.index.partition_of(h[0]) in keys][:top_k])
+        return out
+
+    def query(self, query_text: str, top_k: int = 5, **kwargs: Any) -> List[Dict[str, Any]]:
+        """Ranked documents (best first) with `score` and 1-based `rank`; see `query_batch` for options."""
+        return self.query_batch([query_text], top_k=top_k, **kwargs)[0]
@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.state.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+# Local CPU cross-encoder used to re-score (query, document) pairs
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+# Characters of each document passed to the cross-encoder (it truncates to ~512 tokens anyway)
+RERANK_MAX_CHARS = int(os.getenv("RERANK_MAX_CHARS", "2000"))
+
+
+class CrossEncoderScorer:
+    """sentence-transformers CrossEncoder on CPU; higher score = more relevant."""
+
+    def __init__(self, model_name: str = RERANKER_MODEL, device: str = "cpu"):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name, device=device)
+        self.name = model_name
+
+    def __call__(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        return np.asarray(self.model.predict(list(pairs), batch_size=len(pairs), show_progress_bar=False), dtype=np.float32)
+
+
+def _doc_text(doc: Dict[str, Any]) -> str:
+    title = doc.get("title")
+    content = doc.get("content", "")
+    if not isinstance(content, str):
+        content = str(content)
+    return (f"{title}\n{content}" if title else content)[:RERANK_MAX_CHARS]
+
+
+class Reranker:
+    """
+    Second-stage re-ranking of retrieved documents under a latency budget.
+
+    Candidates are scored in retrieval order, one batch at a time; before
+    each batch the time it is expected to take (from the previous batch) is
+    compared with what is left of the budget, and scoring stops early when it
+    would not fit. Scores are cached per (query, document text) pair, so
+    repeated questions are re-ranked without running the model. Only the
+    `top_n` best scored documents are returned.
+    """
+
+    def __init__(
+        self,
+        scorer: Optional[Callable[[Sequence[Tuple[str, str]]], np.ndarray]] = None,
+        batch_size: int = RERANK_BATCH_SIZE,
+        budget_ms: float = RERANK_BUDGET_MS,
+        cache_size: int = 50_000,
+    ):
+        self.scorer = scorer or CrossEncoderScorer()
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "pairs_scored": 0, "cache_hits": 0, "cutoffs": 0, "unscored": 0}
+
+    def _key(self, query: str, text: str) -> bytes:
+        return hashlib.blake2b(f"{query}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+    def rerank(
+        self,
+        query: str,
+        docs: List[Dict[str, Any]],
+        top_n: int,
+        budget_ms: Optional[float] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Return at most `top_n` documents ordered by cross-encoder score (each
+        gets `rerank_score`). If the budget runs out, unscored candidates are
+        only used to fill up to `top_n`, in their original order.
+        """
+        if not docs:
+            return []
+        budget_s = (self.budget_ms if budget_ms is None else budget_ms) / 1000.0
+        if deadline is not None:
+            budget_s = min(budget_s, deadline.remaining())
+        start = time.monotonic()
+
+        texts = [_doc_text(d) for d in docs]
+        keys = [self._key(query, t) for t in texts]
+        scores: Dict[int, float] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+        cache_hits = len(scores)
+
+        todo = [i for i in range(len(docs)) if i not in scores]
+        batch_s = 0.0
+        cut = False
+        for b in range(0, len(todo), self.batch_size):
+            if time.monotonic() - start + batch_s > budget_s:
+                cut = True
+                break
+            batch = todo[b:b + self.batch_size]
+            t0 = time.monotonic()
+            batch_scores = self.scorer([(query, texts[i]) for i in batch])
+            batch_s = time.monotonic() - t0
+            with self._lock:
+                for i, s in zip(batch, batch_scores.tolist()):
+                    scores[i] = s
+                    self._cache[keys[i]] = s
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        ranked = sorted(scores, key=lambda i: scores[i], reverse=True)
+        unscored = [i for i in range(len(docs)) if i not in scores]
+        chosen = (ranked + unscored)[:top_n]
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["pairs_scored"] += len(scores) - cache_hits
+            self._stats["cache_hits"] += cache_hits
+            self._stats["cutoffs"] += int(cut)
+            self._stats["unscored"] += len(unscored)
+        if cut:
+            logger.info(f"Re-ranking stopped at its {budget_s * 1000:.0f}ms budget ({len(unscored)} candidates unscored)")
+        return [dict(docs[i], rerank_score=scores.get(i)) for i in chosen]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, cached_pairs=len(self._cache))
+
+
+_default_reranker: Optional[Reranker] = None
+
+
+def get_reranker() -> Reranker:
+    """Process-wide reranker (the cross-encoder model is loaded once)."""
+    global _default_reranker
+    if _default_reranker is None:
+        _default_reranker = Reranker()
+    return _default_reranker
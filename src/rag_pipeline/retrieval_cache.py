@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Retrieval result cache limits
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "10000"))
+RETRIEVAL_CACHE_TTL_S = float(os.getenv("RETRIEVAL_CACHE_TTL_S", "300"))
+# Query vectors are normalized and rounded to this step before hashing, so
+# numerically identical-in-practice queries share an entry
+RETRIEVAL_CACHE_QUANTUM = float(os.getenv("RETRIEVAL_CACHE_QUANTUM", "0.001"))
+
+
+class RetrievalCache:
+    """
+    LRU + TTL cache of search results keyed by (quantized query vector,
+    filters, top_k, extra options).
+
+    Every entry records the index generation it was computed at; writers call
+    `bump()` after changing the corpus, which invalidates all earlier entries,
+    so a hit is never older than the last write made through this process.
+    """
+
+    def __init__(self, max_entries: int = RETRIEVAL_CACHE_MAX_ENTRIES, ttl_s: float = RETRIEVAL_CACHE_TTL_S, quantum: float = RETRIEVAL_CACHE_QUANTUM):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.quantum = quantum
+        self.generation = 0
+        self._entries: "OrderedDict[bytes, Tuple[int, float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def key(self, vector: Sequence[float], top_k: int, filters: Optional[Dict[str, Any]] = None, **options: Any) -> bytes:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(v)) or 1.0
+        codes = np.round(v / norm / self.quantum).astype(np.int32)
+        h = hashlib.blake2b(codes.tobytes(), digest_size=20)
+        h.update(json.dumps([top_k, filters or {}, options], sort_keys=True, default=str).encode("utf-8"))
+        return h.digest()
+
+    def _caller(self, caller: str) -> Dict[str, int]:
+        return self._stats.setdefault(caller, {"hits": 0, "misses": 0, "stale": 0})
+
+    def get(self, key: bytes, caller: str = "default") -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            stats = self._caller(caller)
+            entry = self._entries.get(key)
+            if entry is None:
+                stats["misses"] += 1
+                return None
+            generation, stored_at, results = entry
+            if generation != self.generation or time.monotonic() - stored_at > self.ttl_s:
+                del self._entries[key]
+                stats["stale"] += 1
+                stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            stats["hits"] += 1
+        return [dict(r) for r in results]
+
+    def put(self, key: bytes, results: List[Dict[str, Any]], generation: Optional[int] = None) -> None:
+        """Store results computed at `generation` (pass the value read before querying)."""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return  # a write landed while the query ran
+            self._entries[key] = (self.generation, time.monotonic(), [dict(r) for r in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def bump(self) -> int:
+        """Invalidate every cached result (call after any corpus write)."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            return self.generation
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            callers = {}
+            for caller, s in self._stats.items():
+                lookups = s["hits"] + s["misses"]
+                callers[caller] = dict(s, hit_rate=round(s["hits"] / lookups, 4) if lookups else 0.0)
+            return {"generation": self.generation, "entries": len(self._entries), "callers": callers}
+
+
+_default_cache: Optional[RetrievalCache] = None
+
+
+def get_retrieval_cache() -> RetrievalCache:
+    """Process-wide cache shared by every retrieval caller."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = RetrievalCache()
+    return _default_cache
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows as contiguous float32; all-zero rows stay zero."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices and values of the k largest scores per row, best first.
+    Uses argpartition (O(n)) and only sorts the k survivors.
+    """
+    n = scores.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0), dtype=np.int64)
+        return empty, empty.astype(np.float32)
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(n), (scores.shape[0], n))
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    idx = np.take_along_axis(part, order, axis=1)
+    return idx, np.take_along_axis(part_scores, order, axis=1)
+
+
+class InMemoryVectorIndex:
+    """
+    Exact cosine-similarity index over one contiguous float32 matrix.
+
+    Vectors are normalized on insert, so a search is a single matrix product
+    followed by argpartition. Rows live in a preallocated buffer that grows by
+    doubling; deletes move the last row into the freed slot, so the matrix
+    stays dense and no operation needs a full rebuild.
+    """
+
+    def __init__(self, dim: int, initial_capacity: int = 1024):
+        self.dim = dim
+        self._vectors = np.zeros((max(1, initial_capacity), dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._ids)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """View of the live rows (normalized)."""
+        return self._vectors[: len(self._ids)]
+
+    def memory_bytes(self) -> int:
+        return self._vectors.nbytes
+
+    def _ensure_capacity(self, needed: int) -> None:
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        grown[: len(self._ids)] = self._vectors[: len(self._ids)]
+        self._vectors = grown
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        """Insert or overwrite vectors for `ids`."""
+        vectors = normalize_rows(vectors)
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"expected {len(ids)} vectors of dim {self.dim}, got {vectors.shape}")
+        with self._lock:
+            new = [i for i, doc_id in enumerate(ids) if doc_id not in self._rows]
+            self._ensure_capacity(len(self._ids) + len(new))
+            for i, doc_id in enumerate(ids):
+                row = self._rows.get(doc_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._rows[doc_id] = row
+                    self._ids.append(doc_id)
+                self._vectors[row] = vectors[i]
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Remove ids (unknown ids are ignored). Returns the number removed."""
+        removed = 0
+        with self._lock:
+            for doc_id in ids:
+                row = self._rows.pop(doc_id, None)
+                if row is None:
+                    continue
+                last = len(self._ids) - 1
+                if row != last:
+                    moved = self._ids[last]
+                    self._vectors[row] = self._vectors[last]
+                    self._ids[row] = moved
+                    self._rows[moved] = row
+                self._ids.pop()
+                self._vectors[last] = 0.0
+                removed += 1
+        return removed
+
+    def get_vector(self, doc_id: str) -> Optional[np.ndarray]:
+        row = self._rows.get(doc_id)
+        return None if row is None else self._vectors[row].copy()
+
+    def search_batch(self, queries: np.ndarray, top_k: int = 5) -> List[List[Tuple[str, float]]]:
+        """Top-k (id, cosine score) lists for each query row, best first."""
+        queries = normalize_rows(queries)
+        with self._lock:
+            n = len(self._ids)
+            if n == 0:
+                return [[] for _ in range(queries.shape[0])]
+            scores = queries @ self._vectors[:n].T
+            idx, vals = top_k_rows(scores, top_k)
+            ids = self._ids
+            return [
+                [(ids[j], float(s)) for j, s in zip(row_idx, row_vals)]
+                for row_idx, row_vals in zip(idx.tolist(), vals.tolist())
+            ]
+
+    def search(self, query: np.ndarray, top_k: int = 5) -> List[Tuple[str, float]]:
+        return self.search_batch(np.asarray(query).reshape(1, -1), top_k)[0]
+
+    def save(self, path: str) -> None:
+        """Write live rows to `<path>` (.npy) and ids to `<path>.ids.json`."""
+        with self._lock:
+            tmp = f"{path}.tmp.npy"
+            np.save(tmp, self.vectors)
+            os.replace(tmp, path)
+            with open(f"{path}.ids.json.tmp", "w", encoding="utf-8") as f:
+                json.dump(self._ids, f)
+            os.replace(f"{path}.ids.json.tmp", f"{path}.ids.json")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "InMemoryVectorIndex":
+        """
+        Open a saved index. With `mmap` the matrix is mapped copy-on-write, so
+        processes share clean pages until they modify or grow the index.
+        """
+        vectors = np.load(path, mmap_mode="c" if mmap else None)
+        with open(f"{path}.ids.json", "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        index = cls(vectors.shape[1], initial_capacity=1)
+        index._vectors = vectors if len(ids) else np.zeros((1, vectors.shape[1]), dtype=np.float32)
+        index._ids = ids
+        index._rows = {doc_id: row for row, doc_id in enumerate(ids)}
+        return index
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Header clients use to announce how long they are willing to wait (seconds).
+DEADLINE_HEADER = "X-Request-Timeout"
+
+DEFAULT_TIMEOUT_S = float(os.getenv("REQUEST_TIMEOUT_S", "60"))
+MAX_TIMEOUT_S = float(os.getenv("REQUEST_TIMEOUT_MAX_S", "300"))
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request-scoped deadline runs out."""
+
+
+class Deadline:
+    """
+    Request-scoped time budget.
+
+    Created once at the API edge and passed down through the orchestrator,
+    model clients, retries and tools so every layer sizes its own timeouts
+    from the time that is actually left instead of a hard-coded constant.
+    """
+
+    def __init__(self, timeout_s: float, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.timeout_s = max(0.0, float(timeout_s))
+        self.started_at = clock()
+        self.expires_at = self.started_at + self.timeout_s
+
+    @classmethod
+    def from_header(
+        cls,
+        value: Optional[str],
+        default_s: float = DEFAULT_TIMEOUT_S,
+        max_s: float = MAX_TIMEOUT_S,
+    ) -> "Deadline":
+        """Build a deadline from the `X-Request-Timeout` header, clamped to `max_s`."""
+        timeout_s = default_s
+        if value:
+            try:
+                timeout_s = float(value)
+            except ValueError:
+                timeout_s = default_s
+            if timeout_s <= 0:
+                timeout_s = default_s
+        return cls(min(timeout_s, max_s))
+
+    def elapsed(self) -> float:
+        return self._clock() - self.started_at
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)."""
+        return max(0.0, self.expires_at - self._clock())
+
+    def remaining_ms(self) -> int:
+        return int(self.remaining() * 1000)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def budget(self, cap: Optional[float] = None) -> float:
+        """Timeout for a single sub-call: the remaining time, optionally capped."""
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+    def check(self, what: str = "request") -> None:
+        """Raise DeadlineExceeded if no time is left."""
+        if self.expired:
+            raise DeadlineExceeded(f"{what} exceeded its {self.timeout_s:.1f}s deadline")
+
+    async def run(self, aw: Awaitable[T], cap: Optional[float] = None, what: str = "request") -> T:
+        """Await `aw`, cancelling it if the deadline (or `cap`) runs out first."""
+        if self.expired:
+            if asyncio.iscoroutine(aw):
+                aw.close()
+            self.check(what)
+        try:
+            return await asyncio.wait_for(aw, timeout=self.budget(cap))
+        except asyncio.TimeoutError as e:
+            if isinstance(e, DeadlineExceeded):
+                raise
+            if self.expired:
+                raise DeadlineExceeded(f"{what} exceeded its {self.timeout_s:.1f}s deadline") from e
+            raise
+
+    def marker(self) -> Dict[str, Any]:
+        """Stream chunk signalling that the response was cut short by the deadline."""
+        return {
+            "type": "deadline_exceeded",
+            "deadline_exceeded": True,
+            "timeout_s": self.timeout_s,
+            "elapsed_s": round(self.elapsed(), 3),
+        }
@@ -1,23 +1,27 @@
-
-from typing import List, Dict
-
-class AgentQLTool:
-    def __init__(self):
-        pass  # Setup API endpoints or API keys here
-
-    def execute(self, query: str) -> List[Dict]:
-        """
-        Mock implementation: returns structured data from AgentQL queries
-        """
-        print(f"[AgentQLTool] Querying structured APIs for: {query}")
-        return [
-            {
-                "company": "AgentQLInc",
-                "industry": "Healthcare AI",
-                "contact_name": "Carol Example",
-                "title": "Head of AI",
-                "email": "carol@agentqlinc.com",
-                "phone": "+1-555-333-4444",
-                "source": "AgentQLTool"
-            }
+
+from typing import List, Dict, Optional
+
+from src.state.deadline import Deadline
+
+class AgentQLTool:
+    def __init__(self):
+        pass  # Setup API endpoints or API keys here
+
+    def execute(self, query: str, deadline: Optional[Deadline] = None) -> List[Dict]:
+        """
+        Mock implementation: returns structured data from AgentQL queries
+        """
+        if deadline is not None:
+            deadline.check("AgentQLTool")
+        print(f"[AgentQLTool] Querying structured APIs for: {query}")
+        return [
+            {
+                "company": "AgentQLInc",
+                "industry": "Healthcare AI",
+                "contact_name": "Carol Example",
+                "title": "Head of AI",
+                "email": "carol@agentqlinc.com",
+                "phone": "+1-555-333-4444",
+                "source": "AgentQLTool"
+            }
         ]
\ No newline at end of file
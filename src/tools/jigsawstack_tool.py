@@ -1,3 +1,10 @@
-class JigsawStackAIScrape:
-    def scrape(self, url: str) -> dict:
+from typing import Optional
+
+from src.state.deadline import Deadline
+
+
+class JigsawStackAIScrape:
+    def scrape(self, url: str, deadline: Optional[Deadline] = None) -> dict:
+        if deadline is not None:
+            deadline.check("JigsawStackAIScrape")
         return {"url": url, "content": f"Scraped content from {url}", "metadata": {"source": "web"}}
\ No newline at end of file
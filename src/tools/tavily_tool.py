@@ -1,25 +1,29 @@
-
-from typing import List, Dict
-
-class TavilyTool:
-    def __init__(self):
-        pass  # API key or initialization can go here
-
-    def execute(self, query: str) -> List[Dict]:
-        """
-        Mock implementation of a web search + extraction.
-        Returns list of leads or structured info.
-        """
-        print(f"[TavilyTool] Executing web search for: {query}")
-        # Example: return simulated results
-        return [
-            {
-                "company": "TavilyCorp",
-                "industry": "AI",
-                "contact_name": "Bob Example",
-                "title": "CTO",
-                "email": "bob@tavilycorp.com",
-                "phone": "+1-555-111-2222",
-                "source": "TavilyTool"
-            }
+
+from typing import List, Dict, Optional
+
+from src.state.deadline import Deadline
+
+class TavilyTool:
+    def __init__(self):
+        pass  # API key or initialization can go here
+
+    def execute(self, query: str, deadline: Optional[Deadline] = None) -> List[Dict]:
+        """
+        Mock implementation of a web search + extraction.
+        Returns list of leads or structured info.
+        """
+        if deadline is not None:
+            deadline.check("TavilyTool")
+        print(f"[TavilyTool] Executing web search for: {query}")
+        # Example: return simulated results
+        return [
+            {
+                "company": "TavilyCorp",
+                "industry": "AI",
+                "contact_name": "Bob Example",
+                "title": "CTO",
+                "email": "bob@tavilycorp.com",
+                "phone": "+1-555-111-2222",
+                "source": "TavilyTool"
+            }
         ]
\ No newline at end of file
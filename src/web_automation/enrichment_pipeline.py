@@ -1,34 +1,117 @@
-import json
-from pathlib import Path
-from src.db.postgresql_connector import PostgreSQLConnector
-from src.rag_pipeline.rag_manager import RAGManager
-from src.tools.tavily_tool import TavilyTool
-from src.tools.agentql_tool import AgentQLTool
-from src.tools.jigsawstack_tool import JigsawStackAIScrape
-
-class EnrichmentPipeline:
-    def __init__(self, rag_manager: RAGManager, db_connector: PostgreSQLConnector):
-        self.rag = rag_manager
-        self.db = db_connector
-        self.tavily = TavilyTool()
-        self.agentql = AgentQLTool()
-        self.jigsawstack = JigsawStackAIScrape()
-        self.data_dir = Path("data/research_docs")
-
-    def run(self, queries: list):
-        all_docs = []
-        for query in queries:
-            tavily_results = self.tavily.search(query)
-            for res in tavily_results["results"]:
-                all_docs.append({"title": f"Tavily: {query}", "content": res, "source": "tavily"})
-            agentql_result = self.agentql.execute(f"SELECT * FROM leads WHERE industry='{query}'")
-            all_docs.append({"title": f"AgentQL: {query}", "content": json.dumps(agentql_result), "source": "agentql"})
-            jigsaw_result = self.jigsawstack.scrape(f"https://example.com/search?q={query}")
-            all_docs.append({"title": f"JigsawStack: {query}", "content": jigsaw_result["content"], "source": "jigsawstack"})
-        self.data_dir.mkdir(parents=True, exist_ok=True)
-        with open(self.data_dir / "auto_enriched_docs.json", "w") as f:
-            json.dump(all_docs, f, indent=2)
-        self.rag.add_documents(all_docs)
-        for doc in all_docs:
-            self.db.execute("INSERT INTO research_documents (title, content, source) VALUES (%s, %s, %s)",
-                            (doc["title"], doc["content"], doc["source"]))
\ No newline at end of file
+import json
+from pathlib import Path
+from typing import Optional
+import psycopg2.extras
+from src.db.postgresql_connector import ConnectionPool, get_pool
+from src.rag_pipeline.embeddings import get_embedding_service
+from src.rag_pipeline.incremental import IncrementalIndexer, IndexManifest
+from src.rag_pipeline.rag_manager import RAGManager, document_id
+from src.tools.tavily_tool import TavilyTool
+from src.tools.agentql_tool import AgentQLTool
+from src.tools.jigsawstack_tool import JigsawStackAIScrape
+
+class EnrichmentPipeline:
+    def __init__(self, rag_manager: Optional[RAGManager] = None, db_pool: Optional[ConnectionPool] = None):
+        # Documents are embedded with the index's own embedder; the default index uses the
+        # shared embedding service, so unchanged text is served from its cache
+        self.rag = rag_manager if rag_manager is not None else RAGManager(embedder=get_embedding_service())
+        self.db = db_pool or get_pool()
+        self.tavily = TavilyTool()
+        self.agentql = AgentQLTool()
+        self.jigsawstack = JigsawStackAIScrape()
+        self.data_dir = Path("data/research_docs")
+        self.manifest_path = Path("data/cache/enrichment.manifest.sqlite")
+
+    def ensure_documents_table(self) -> None:
+        """
+        Create research_documents keyed by document (chunk) id. Rows written
+        before it had ids cannot be matched to documents: they are deleted and
+        the manifest dropped, so the next sync writes everything again.
+        """
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS research_documents (
+                        id SERIAL PRIMARY KEY,
+                        title TEXT,
+                        content TEXT NOT NULL,
+                        source VARCHAR(255),
+                        created_at TIMESTAMP DEFAULT NOW()
+                    );
+                    ALTER TABLE research_documents ADD COLUMN IF NOT EXISTS document_id VARCHAR(255);
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_research_documents_document_id ON research_documents (document_id);
+                    DELETE FROM research_documents WHERE document_id IS NULL;
+                """)
+                legacy = cur.rowcount
+            conn.commit()
+        if legacy and self.manifest_path.exists():
+            self.manifest_path.unlink()
+
+    def upsert_documents(self, chunks, embeddings=None) -> None:
+        """Index chunks in the RAG and upsert them into research_documents."""
+        self.rag.add_documents(chunks, embeddings=embeddings)
+        rows = {document_id(c): (document_id(c), c.get("title"), c.get("content", ""), c.get("source")) for c in chunks}
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                psycopg2.extras.execute_values(
+                    cur,
+                    """
+                    INSERT INTO research_documents (document_id, title, content, source) VALUES %s
+                    ON CONFLICT (document_id) DO UPDATE
+                    SET title = EXCLUDED.title, content = EXCLUDED.content, source = EXCLUDED.source
+                    """,
+                    list(rows.values()),
+                    page_size=1000,
+                )
+            conn.commit()
+
+    def delete_documents(self, ids) -> None:
+        """Remove chunks from the RAG and from research_documents."""
+        self.rag.delete_documents(ids)
+        self._delete_rows(ids)
+
+    def _delete_rows(self, ids) -> None:
+        with self.db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM research_documents WHERE document_id = ANY(%s);", (list(ids),))
+            conn.commit()
+
+    def run(self, queries: list):
+        """
+        Fetch documents for each query and sync them into the RAG index
+        incrementally; returns the per-query indexing summaries.
+        """
+        all_docs = []
+        per_query = {}
+        for query in queries:
+            docs = []
+            tavily_results = self.tavily.search(query)
+            for i, res in enumerate(tavily_results["results"]):
+                docs.append({"id": f"tavily:{query}:{i}", "title": f"Tavily: {query}", "content": res, "source": "tavily"})
+            agentql_result = self.agentql.execute(f"SELECT * FROM leads WHERE industry='{query}'")
+            docs.append({"id": f"agentql:{query}", "title": f"AgentQL: {query}", "content": json.dumps(agentql_result), "source": "agentql"})
+            jigsaw_result = self.jigsawstack.scrape(f"https://example.com/search?q={query}")
+            docs.append({"id": f"jigsawstack:{query}", "title": f"JigsawStack: {query}", "content": jigsaw_result["content"], "source": "jigsawstack"})
+            per_query[query] = docs
+            all_docs.extend(docs)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.data_dir / "auto_enriched_docs.json", "w") as f:
+            json.dump(all_docs, f, indent=2)
+
+        self.ensure_documents_table()
+        # The manifest describes what the index holds; an empty (fresh) index needs a full sync,
+        # and the rows the old manifest knew about are dropped so nothing removed meanwhile lingers
+        if not self.rag.documents and self.manifest_path.exists():
+            manifest = IndexManifest(str(self.manifest_path))
+            try:
+                self._delete_rows(manifest.chunk_ids())
+            finally:
+                manifest.close()
+            self.manifest_path.unlink()
+
+        indexer = IncrementalIndexer(str(self.manifest_path), self.upsert_documents, self.delete_documents, embedder=self.rag.embedder)
+        try:
+            # scope per query: results that a query no longer returns are removed
+            return {query: indexer.sync(docs, scope=query) for query, docs in per_query.items()}
+        finally:
+            indexer.close()
@@ -0,0 +1,152 @@
+import asyncio
+import contextlib
+import re
+import struct
+
+import numpy as np
+import pytest
+
+from src.db.async_postgres import AsyncPostgres, _init_connection, decode_vector, encode_vector, to_positional
+from src.db.migrations.rag_manager import build_metadata_filter, filter_plan, partition_route, search_scan_sql
+
+
+def test_to_positional_numbers_each_name_once():
+    sql, args = to_positional("a = %(x)s AND b = %(y)s OR a = %(x)s", {"x": 1, "y": "two", "unused": 3})
+    assert sql == "a = $1 AND b = $2 OR a = $1"
+    assert args == [1, "two"]
+
+
+def test_to_positional_unescapes_percent():
+    sql, args = to_positional("company %% %(q)s OR company ILIKE %(q_like)s", {"q": "acme", "q_like": "%acme%"})
+    assert sql == "company % $1 OR company ILIKE $2" and args == ["acme", "%acme%"]
+
+
+def test_vector_binary_round_trip():
+    v = np.array([1.0, -0.5, 3.25], dtype=np.float32)
+    data = encode_vector(v)
+    assert struct.unpack("!HH", data[:4]) == (3, 0)
+    assert len(data) == 4 + 3 * 4
+    np.testing.assert_array_equal(decode_vector(data), v)
+
+
+def test_search_sql_converts_for_asyncpg():
+    where, params = build_metadata_filter({"source": "kb"})
+    plan = filter_plan(where, params, 0.5, 100, 5, partition_route({"source": "kb"}))
+    assert plan["strategy"] == "postfilter" and plan["candidates"] == 20
+    sql, args = to_positional(search_scan_sql(plan), dict(plan["params"], queries=["q"], top_k=5, candidates=plan["candidates"]))
+    assert "%(" not in sql
+    assert sql.index("$1") < sql.index("$2") < sql.index("$3") < sql.index("$4") < sql.index("$5")
+    assert sorted(map(str, args)) == sorted(map(str, ['{"source": "kb"}', ["kb"], ["q"], 5, 20]))
+
+
+VECTOR_OID, VECTOR_ARRAY_OID = 90001, 90002
+
+
+def _pg_message(kind: bytes, payload: bytes = b"") -> bytes:
+    return kind + struct.pack("!i", len(payload) + 4) + payload
+
+
+async def _fake_postgres(reader, writer, binds):
+    """Just enough of the v3 protocol for asyncpg to prepare and run one statement."""
+    (length,) = struct.unpack("!i", await reader.readexactly(4))
+    await reader.readexactly(length - 4)  # startup packet
+    status = b"".join(
+        _pg_message(b"S", f"{k}\0{v}\0".encode())
+        for k, v in {"server_version": "16.0", "client_encoding": "UTF8", "integer_datetimes": "on"}.items()
+    )
+    writer.write(_pg_message(b"R", struct.pack("!i", 0)) + status + _pg_message(b"K", struct.pack("!ii", 1, 1)) + _pg_message(b"Z", b"I"))
+    while True:
+        kind = await reader.readexactly(1)
+        (length,) = struct.unpack("!i", await reader.readexactly(4))
+        body = await reader.readexactly(length - 4)
+        if kind == b"X":
+            break
+        if kind == b"Q":  # BEGIN / COMMIT
+            writer.write(_pg_message(b"C", body.split(b" ")[0].rstrip(b";\0") + b"\0") + _pg_message(b"Z", b"T"))
+        elif kind == b"P":
+            query = body.split(b"\0")[1].decode()
+            params = sorted(set(re.findall(r"\$(\d+)(::vector\[\])?", query)), key=lambda m: int(m[0]))
+            oids = [VECTOR_ARRAY_OID if cast else 23 for _, cast in params]
+            writer.write(_pg_message(b"1"))
+            writer.write(_pg_message(b"t", struct.pack(f"!h{len(oids)}i", len(oids), *oids)) + _pg_message(b"n"))
+        elif kind == b"B":
+            binds.append(body)
+            writer.write(_pg_message(b"2"))
+        elif kind == b"E":
+            writer.write(_pg_message(b"C", b"SELECT 0\0"))
+        elif kind == b"S":
+            writer.write(_pg_message(b"Z", b"I"))
+        await writer.drain()
+    writer.close()
+
+
+def _bind_params(body: bytes):
+    pos = body.index(b"\0", body.index(b"\0") + 1) + 1  # skip portal and statement names
+    (nformats,) = struct.unpack_from("!h", body, pos)
+    pos += 2 + 2 * nformats
+    (nparams,) = struct.unpack_from("!h", body, pos)
+    pos += 2
+    values = []
+    for _ in range(nparams):
+        (size,) = struct.unpack_from("!i", body, pos)
+        values.append(body[pos + 4:pos + 4 + size])
+        pos += 4 + size
+    return values
+
+
+def _decode_vector_array(data: bytes):
+    ndims, _, elem_oid = struct.unpack_from("!iii", data)
+    dims = [struct.unpack_from("!ii", data, 12 + 8 * i)[0] for i in range(ndims)]
+    pos = 12 + 8 * ndims
+    vectors = []
+    while pos < len(data):
+        (size,) = struct.unpack_from("!i", data, pos)
+        vectors.append(decode_vector(data[pos + 4:pos + 4 + size]))
+        pos += 4 + size
+    return ndims, dims, elem_oid, vectors
+
+
+@pytest.mark.asyncio
+async def test_search_batch_sends_each_query_as_one_vector(monkeypatch):
+    asyncpg = pytest.importorskip("asyncpg")
+
+    oids = {"json": 114, "jsonb": 3802, "vector": VECTOR_OID}
+
+    async def introspect_type(self, typename, schema):
+        return {"oid": oids[typename], "kind": b"b", "elemtype": 0}
+
+    async def introspect_types(self, typeoids, timeout):
+        array = {"oid": VECTOR_ARRAY_OID, "ns": "public", "name": "_vector", "kind": b"b", "basetype": None,
+                 "elemtype": VECTOR_OID, "elemdelim": ",", "range_subtype": None, "attrtypoids": None,
+                 "attrnames": None, "elemtype_name": "vector", "basetype_name": None, "range_subtype_name": None}
+        return [array], type("Statement", (), {"name": "introspection"})()
+
+    monkeypatch.setattr(asyncpg.Connection, "_introspect_type", introspect_type)
+    monkeypatch.setattr(asyncpg.Connection, "_introspect_types", introspect_types)
+
+    binds = []
+    server = await asyncio.start_server(lambda r, w: _fake_postgres(r, w, binds), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    conn = await asyncpg.connect(host="127.0.0.1", port=port, user="test", database="test", ssl=False)
+    try:
+        await _init_connection(conn)
+
+        class OnePool:
+            def acquire(self):
+                @contextlib.asynccontextmanager
+                async def acquire():
+                    yield conn
+                return acquire()
+
+        db = AsyncPostgres(dsn="postgresql://unused", cache=object())
+        db.pool = OnePool()
+        queries = [np.array([0.5, -1.0, 2.0], dtype=np.float32), np.array([3.0, 0.25, -4.0], dtype=np.float64)]
+        assert await db._search_batch(queries, 5, None, None, None) == [[], []]
+    finally:
+        await conn.close()
+        server.close()
+
+    ndims, dims, elem_oid, vectors = _decode_vector_array(_bind_params(binds[-1])[0])
+    assert (ndims, dims, elem_oid) == (1, [2], VECTOR_OID)
+    for sent, query in zip(vectors, queries):
+        np.testing.assert_array_equal(sent, query.astype(np.float32))
@@ -0,0 +1,145 @@
+import time
+
+import numpy as np
+import pytest
+
+from src.rag_pipeline.bm25 import BM25Index, lexical_tokens
+from src.rag_pipeline.embeddings import HashingEmbedder
+from src.rag_pipeline import rag_manager
+from src.rag_pipeline.rag_manager import RAGManager, reciprocal_rank_fusion
+from src.state.deadline import Deadline, DeadlineExceeded
+
+
+DOCS = [
+    {"id": "e1042", "title": "Sync failures", "content": "Error ERR-1042 means the CRM sync token expired."},
+    {"id": "acme", "title": "Acme Corp", "content": "Acme Corp CTO interested in RAG pipeline solutions."},
+    {"id": "globex", "title": "Globex Inc", "content": "Globex explores MassGen agent orchestration."},
+]
+
+
+def test_lexical_tokens_keep_codes_whole_and_split():
+    assert lexical_tokens("See ERR-1042 at acmecorp.com") == ["see", "err-1042", "err", "1042", "at", "acmecorp.com", "acmecorp", "com"]
+
+
+def test_bm25_ranks_exact_terms_and_handles_deletes():
+    idx = BM25Index()
+    idx.add([d["id"] for d in DOCS], [d["title"] + " " + d["content"] for d in DOCS])
+    assert idx.search("err-1042", top_k=1)[0][0] == "e1042"
+    assert idx.search("globex orchestration", top_k=1)[0][0] == "globex"
+
+    idx.delete(["globex"])
+    assert all(h[0] != "globex" for h in idx.search("globex orchestration"))
+    # re-adding replaces the old postings instead of duplicating them
+    idx.add(["acme"], ["Acme renewal"])
+    assert len(idx) == 2
+    assert idx.search("cto") == []
+
+
+def test_bm25_repeated_id_in_one_add_keeps_the_last_text():
+    idx = BM25Index()
+    idx.add(["a", "b", "a"], ["old words here", "other", "new"])
+    assert len(idx) == 2 and idx._total_len == 2
+    assert idx.search("old") == []
+    assert idx.search("new")[0][0] == "a"
+    idx.delete(["a"])
+    assert idx.search("new") == [] and idx._total_len == 1
+
+
+def test_bm25_compaction_keeps_results():
+    idx = BM25Index()
+    idx.add([f"d{i}" for i in range(3000)], [f"common word{i}" for i in range(3000)])
+    idx.delete([f"d{i}" for i in range(2500)])
+    assert len(idx._row_ids) == 500
+    assert idx.search("word2999", top_k=1)[0][0] == "d2999"
+
+
+def test_bm25_scores_match_the_formula():
+    idx = BM25Index()
+    texts = ["apple banana", "apple apple cherry", "banana cherry date", "elder"]
+    idx.add([f"d{i}" for i in range(4)], texts)
+    idx.delete(["d3"])
+    lens, avgdl = [2, 3, 3], 8 / 3
+
+    def expected(row, term):
+        tf = texts[row].split().count(term)
+        df = sum(term in t.split() for t in texts[:3])
+        idf = np.log(1 + (3 - df + 0.5) / (df + 0.5))
+        return idf * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * lens[row] / avgdl))
+
+    hits = dict(idx.search("apple cherry", top_k=5))
+    assert set(hits) == {"d0", "d1", "d2"}
+    for row in range(3):
+        assert hits[f"d{row}"] == pytest.approx(expected(row, "apple") + expected(row, "cherry"), rel=1e-5)
+
+
+def test_rrf_prefers_documents_in_both_lists():
+    fused = reciprocal_rank_fusion({"vector": [("a", 0.9), ("b", 0.8)], "lexical": [("b", 5.0), ("c", 4.0)]})
+    assert fused[0][0] == "b"
+
+
+def test_hybrid_query_returns_fused_sources():
+    rag = RAGManager()
+    rag.add_documents(DOCS)
+    results = rag.query("ERR-1042 token", top_k=2, mode="hybrid")
+    assert results[0]["id"] == "e1042"
+    assert set(results[0]["sources"]) == {"vector", "lexical"}
+
+    weighted = rag.query("Globex MassGen", top_k=1, mode="hybrid", fusion="weighted", weights={"lexical": 2.0})
+    assert weighted[0]["id"] == "globex"
+
+
+class SlowEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.slow = False
+
+    def embed(self, texts):
+        if self.slow:
+            time.sleep(0.3)
+        return super().embed(texts)
+
+
+def test_lexical_answers_alone_when_vector_misses_budget():
+    embedder = SlowEmbedder()
+    rag = RAGManager(embedder=embedder)
+    rag.add_documents(DOCS)
+    embedder.slow = True
+
+    start = time.monotonic()
+    results = rag.query("acme cto", top_k=1, mode="hybrid", budgets_ms={"vector": 20, "lexical": 100})
+    assert time.monotonic() - start < 0.25
+    assert results[0]["id"] == "acme"
+    assert results[0]["sources"] == ["lexical"]
+
+
+def test_sources_that_all_run_late_stop_at_the_deadline():
+    rag = RAGManager(embedder=HashingEmbedder(16))
+
+    def slow(stop):
+        stop.wait(2.0)
+        return []
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        rag._run_sources({"slow_a": slow, "slow_b": slow}, {"slow_a": 20, "slow_b": 20}, Deadline(0.1))
+    assert time.monotonic() - start < 0.5
+
+
+def test_overdue_source_is_skipped_until_its_late_work_finishes():
+    embedder = SlowEmbedder()
+    rag = RAGManager(embedder=embedder)
+    rag.add_documents(DOCS)
+    embedder.slow = True
+    calls = []
+    embed = embedder.embed
+    embedder.embed = lambda texts: calls.append(texts) or embed(texts)
+    while rag_manager._overdue.get("vector"):  # late work left by earlier tests
+        time.sleep(0.05)
+
+    for i in range(rag_manager.RAG_MAX_OVERDUE_PER_SOURCE + 1):
+        rag.query(f"acme cto {i}", top_k=1, mode="hybrid", budgets_ms={"vector": 10, "lexical": 100})
+    time.sleep(0.4)
+    assert len(calls) == rag_manager.RAG_MAX_OVERDUE_PER_SOURCE  # the last query skipped vector search
+    assert rag_manager._overdue["vector"] == 0
+    embedder.slow = False
+    assert rag.query("acme cto", top_k=1, mode="hybrid")[0]["sources"] == ["lexical", "vector"]
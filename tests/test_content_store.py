@@ -0,0 +1,48 @@
+from src.rag_pipeline.content_store import ContentStore
+from src.rag_pipeline.rag_manager import RAGManager
+
+
+def test_round_trip_and_zero_copy_views(tmp_path):
+    store = ContentStore(str(tmp_path / "c"))
+    store.add_many([
+        ("a", {"id": "a", "title": "Alpha", "content": "héllo world", "source": "kb"}),
+        ("b", {"title": "Beta", "content": {"rows": [1, 2]}, "source": "kb"}),
+    ])
+    view = store.text_view("a")
+    assert isinstance(view, memoryview) and view.readonly
+    assert bytes(view) == "héllo world".encode("utf-8")
+    assert store["a"] == {"id": "a", "title": "Alpha", "content": "héllo world", "source": "kb"}
+    assert store["b"]["content"] == {"rows": [1, 2]}
+    # repeated metadata values are stored once
+    assert store.stats()["columns"]["source"] == 1
+
+
+def test_replace_delete_compact_and_reopen(tmp_path):
+    path = str(tmp_path / "c")
+    store = ContentStore(path)
+    store.add_many((f"d{i}", {"content": "x" * 100, "n": i}) for i in range(10))
+    old_view = store.text_view("d0")
+    store.add("d0", {"content": "replaced", "n": 0})
+    assert store.delete(["d1", "d2", "missing"]) == 2
+    assert len(store) == 8 and "d1" not in store
+    assert store.stats()["dead_bytes"] == 300
+
+    store.save(path)
+    reopened = ContentStore(path)
+    assert sorted(reopened) == sorted(store)
+    assert reopened.text("d0") == "replaced"
+
+    store.compact()
+    assert store.stats()["dead_bytes"] == 0 and store.stats()["text_bytes"] == 7 * 100 + 8
+    assert store.text("d9") == "x" * 100 and store["d3"]["n"] == 3
+    # views taken before compaction still read the old mapping
+    assert bytes(old_view) == b"x" * 100
+
+
+def test_rag_manager_saves_content_store(tmp_path):
+    rag = RAGManager(backend="memory")
+    rag.add_documents([{"id": "p1", "title": "Pricing", "content": "Enterprise plan pricing"}, {"id": "p2", "content": "Refund policy"}])
+    rag.save(str(tmp_path / "rag"))
+    loaded = RAGManager.load(str(tmp_path / "rag"))
+    assert loaded.documents.text("p1") == "Enterprise plan pricing"
+    assert loaded.query("pricing", top_k=1, mode="lexical")[0]["id"] == "p1"
@@ -0,0 +1,62 @@
+import pytest
+import asyncio
+
+from src.state.deadline import Deadline, DeadlineExceeded
+from src.massgen_integration.massgen_orchestrator_v005 import MassGenOrchestratorV005
+from src.web_automation.automation_utils import retry_async
+
+
+def test_from_header_parsing_and_clamp():
+    assert Deadline.from_header(None, default_s=30).timeout_s == 30
+    assert Deadline.from_header("5", default_s=30).timeout_s == 5
+    assert Deadline.from_header("garbage", default_s=30).timeout_s == 30
+    assert Deadline.from_header("-1", default_s=30).timeout_s == 30
+    assert Deadline.from_header("9999", default_s=30, max_s=60).timeout_s == 60
+
+
+def test_budget_and_expiry():
+    now = [100.0]
+    d = Deadline(10, clock=lambda: now[0])
+    assert d.remaining() == 10
+    assert d.budget(cap=3) == 3
+    now[0] = 108.0
+    assert d.budget(cap=3) == 2
+    now[0] = 111.0
+    assert d.expired
+    assert d.remaining() == 0
+    with pytest.raises(DeadlineExceeded):
+        d.check()
+
+
+@pytest.mark.asyncio
+async def test_run_raises_deadline_exceeded():
+    d = Deadline(0.05)
+    with pytest.raises(DeadlineExceeded):
+        await d.run(asyncio.sleep(1))
+
+
+@pytest.mark.asyncio
+async def test_retry_stops_when_no_time_left():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        raise RuntimeError("boom")
+
+    with pytest.raises(DeadlineExceeded):
+        await retry_async(flaky, retries=5, delay=1.0, deadline=Deadline(0.2))
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_returns_partial_with_marker():
+    orch = MassGenOrchestratorV005(enable_voting=True, default_verbosity="minimal")
+    chunks = []
+    # primary answer fits, the stubbed multi-agent stream (0.08s per agent) does not
+    async for chunk in orch.chat("Partial please", task_type="research_query", deadline=Deadline(0.2)):
+        chunks.append(chunk)
+
+    assert chunks[0]["phase"] == "primary"
+    assert chunks[-1]["type"] == "deadline_exceeded"
+    assert chunks[-1]["deadline_exceeded"] is True
+    assert sum(1 for c in chunks if c.get("type") == "deadline_exceeded") == 1
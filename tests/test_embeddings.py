@@ -0,0 +1,111 @@
+import sqlite3
+import threading
+
+import numpy as np
+import pytest
+
+from src.rag_pipeline.embeddings import EmbeddingDimensionError, EmbeddingService, HashingEmbedder, check_embedding_dim
+
+
+class CountingBackend:
+    """HashingEmbedder that records every batch it is asked to embed."""
+
+    def __init__(self, dim=16):
+        self.inner = HashingEmbedder(dim)
+        self.dim = dim
+        self.name = "counting"
+        self.batches = []
+
+    def embed(self, texts):
+        self.batches.append(list(texts))
+        return self.inner.embed(texts)
+
+
+def test_matches_backend_and_dedupes_within_batch():
+    backend = CountingBackend()
+    service = EmbeddingService(backend, cache_path=None)
+    texts = ["refund policy", "reset password", "refund policy"]
+    out = service.embed(texts)
+    np.testing.assert_allclose(out, HashingEmbedder(16).embed(texts))
+    assert sum(len(b) for b in backend.batches) == 2
+    service.close()
+
+
+def test_cache_hits_skip_the_backend():
+    backend = CountingBackend()
+    service = EmbeddingService(backend, cache_path=None)
+    service.embed(["a b c", "d e f"])
+    calls = len(backend.batches)
+    service.embed(["d e f", "a b c"])
+    assert len(backend.batches) == calls
+    m = service.metrics()
+    assert m["memory_hits"] == 2 and m["texts"] == 4 and m["hit_rate"] == 0.5
+    service.close()
+
+
+def test_disk_cache_survives_restart(tmp_path):
+    path = str(tmp_path / "emb.sqlite")
+    first = EmbeddingService(CountingBackend(), cache_path=path)
+    expected = first.embed(["persisted text"])
+    first.close()
+
+    backend = CountingBackend()
+    second = EmbeddingService(backend, cache_path=path)
+    np.testing.assert_allclose(second.embed(["persisted text"]), expected)
+    assert backend.batches == []
+    assert second.metrics()["disk_hits"] == 1
+    second.close()
+
+
+def test_micro_batches_across_callers():
+    backend = CountingBackend()
+    service = EmbeddingService(backend, cache_path=None, max_batch_size=64, max_wait_ms=50)
+    results = {}
+
+    def caller(i):
+        results[i] = service.embed([f"caller {i} text"])
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(results) == 8
+    assert len(backend.batches) < 8  # at least some callers shared a batch
+    assert service.metrics()["embedded"] == 8
+    service.close()
+
+
+def test_short_backend_result_fails_the_callers_not_the_worker():
+    backend = CountingBackend()
+    service = EmbeddingService(backend, cache_path=None)
+    real_embed = backend.embed
+    backend.embed = lambda texts: real_embed(texts)[:-1]
+    with pytest.raises(RuntimeError, match="returned 1 vectors for 2 texts"):
+        service.embed(["first text", "second text"])
+
+    backend.embed = real_embed
+    np.testing.assert_allclose(service.embed(["first text"]), HashingEmbedder(16).embed(["first text"]))
+    service.close()
+
+
+def test_cache_write_failure_still_returns_vectors():
+    service = EmbeddingService(CountingBackend(), cache_path=None)
+
+    def locked(items):
+        raise sqlite3.OperationalError("database is locked")
+
+    service.cache.put_many = locked
+    texts = ["cache write fails"]
+    np.testing.assert_allclose(service.embed(texts), HashingEmbedder(16).embed(texts))
+    np.testing.assert_allclose(service.embed(texts), HashingEmbedder(16).embed(texts))
+    assert service.metrics()["embedded"] == 2  # nothing was cached
+    service.close()
+
+
+def test_dimension_check_against_the_vector_column():
+    check_embedding_dim(HashingEmbedder(384), 384)
+    check_embedding_dim(HashingEmbedder(384), None)  # no rag_data table yet
+    with pytest.raises(EmbeddingDimensionError, match=r"384-dim vectors but rag_data.embedding is vector\(1536\)"):
+        check_embedding_dim(HashingEmbedder(384), 1536)
@@ -0,0 +1,134 @@
+import time
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from src.rag_pipeline.faiss_index import FaissVectorIndex
+from src.rag_pipeline.rag_manager import RAGManager
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(1)
+    return rng.normal(size=(400, 24)).astype(np.float32)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_search_and_delete(data, index_type):
+    idx = FaissVectorIndex(24, index_type=index_type, nlist=8, nprobe=8)
+    ids = [f"d{i}" for i in range(len(data))]
+    idx.add(ids, data)
+
+    assert idx.search(data[17], top_k=1)[0][0] == "d17"
+    idx.delete(["d17"])
+    assert len(idx) == 399
+    assert all(h[0] != "d17" for h in idx.search(data[17], top_k=5))
+
+    # upsert moves the id to its new vector
+    idx.add(["d18"], data[19:20])
+    top = [h[0] for h in idx.search(data[19], top_k=2)]
+    assert set(top) == {"d18", "d19"}
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_save_and_mmap_load(tmp_path, data, index_type):
+    idx = FaissVectorIndex(24, index_type=index_type, nlist=8)
+    idx.add([f"d{i}" for i in range(len(data))], data)
+    idx.delete(["d3"])
+    path = str(tmp_path / "index.faiss")
+    idx.save(path)
+
+    loaded = FaissVectorIndex.load(path, mmap=True)
+    assert len(loaded) == 399
+    assert loaded.search(data[5], top_k=1)[0][0] == "d5"
+    assert all(h[0] != "d3" for h in loaded.search(data[3], top_k=5))
+
+    # first write on a mapped index switches to a private copy
+    loaded.add(["new"], data[3:4])
+    assert loaded.search(data[3], top_k=1)[0][0] == "new"
+
+
+def test_background_rebuild_swaps_and_replays_writes(data):
+    idx = FaissVectorIndex(24, index_type="hnsw")
+    idx.add([f"d{i}" for i in range(300)], data[:300])
+    idx.delete(["d0", "d1"])
+
+    thread = idx.rebuild(background=True, index_type="ivf", nlist=4)
+    idx.add(["late"], data[300:301])
+    idx.delete(["d2"])
+    thread.join()
+
+    assert idx.params["index_type"] == "ivf"
+    assert len(idx) == 298
+    assert idx.search(data[300], top_k=1)[0][0] == "late"
+    hits = {h[0] for h in idx.search(data[2], top_k=5, nprobe=4)}
+    assert "d2" not in hits
+
+
+def test_hnsw_tombstones_trigger_a_background_rebuild(data):
+    idx = FaissVectorIndex(24, index_type="hnsw")
+    idx.add([f"d{i}" for i in range(100)], data[:100])
+    idx.delete([f"d{i}" for i in range(20)])
+    assert len(idx._tombstones) == 20 and idx._pending is None  # 20% is still tolerated
+
+    idx.delete(["d20"])
+    deadline = time.monotonic() + 5
+    while (idx._pending is not None or idx._tombstones) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not idx._tombstones and idx._index.ntotal == 79
+    assert idx.search(data[50], top_k=1)[0][0] == "d50"
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8"])
+def test_ivf_trains_once_the_corpus_is_large_enough(data, quantization):
+    idx = FaissVectorIndex(24, index_type="ivf", nlist=8, nprobe=8, quantization=quantization)
+    for i in range(311):
+        idx.add([f"d{i}"], data[i:i + 1])  # one at a time: nothing to train on yet
+    assert idx._staged and idx.search(data[5], top_k=1)[0][0] == "d5"
+
+    idx.add([f"d{i}" for i in range(311, 400)], data[311:])  # trains in the background
+    deadline = time.monotonic() + 5
+    while idx._staged and time.monotonic() < deadline:
+        time.sleep(0.01)
+    ivf = faiss.extract_index_ivf(idx._index)
+    assert not idx._staged and ivf.nlist == 8 and ivf.ntotal == 400
+    assert idx.search(data[350], top_k=1)[0][0] == "d350"
+
+
+def test_rag_manager_faiss_cold_start(tmp_path):
+    rag = RAGManager(backend="faiss", index_type="flat")
+    rag.add_documents([
+        {"id": "a", "title": "Pricing", "content": "plan pricing upgrade"},
+        {"id": "b", "title": "Voting", "content": "agent consensus voting"},
+    ])
+    rag.save(str(tmp_path / "rag"))
+
+    reopened = RAGManager.load(str(tmp_path / "rag"))
+    assert reopened.backend == "faiss"
+    assert reopened.query("upgrade my plan", top_k=1)[0]["id"] == "a"
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_quantized_faiss_reranks_exactly_and_persists(tmp_path, index_type):
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(500, 32)).astype(np.float32)
+    idx = FaissVectorIndex(32, index_type=index_type, quantization="int8", nlist=8, nprobe=8)
+    idx.add([f"d{i}" for i in range(500)], vectors)
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    hits = idx.search(vectors[7], top_k=5)
+    assert hits[0][0] == "d7"
+    for doc_id, score in hits:
+        assert score == pytest.approx(float(unit[int(doc_id[1:])] @ unit[7]), abs=1e-5)
+    full = FaissVectorIndex(32, index_type=index_type, nlist=8)
+    full.add([f"d{i}" for i in range(500)], vectors)
+    assert idx.memory_bytes() < full.memory_bytes()
+
+    path = str(tmp_path / "index.faiss")
+    idx.save(path)
+    loaded = FaissVectorIndex.load(path)
+    assert loaded.search(vectors[7], top_k=5) == hits
+    loaded.add(["new"], vectors[7:8])
+    loaded.rebuild(background=False)
+    assert {h[0] for h in loaded.search(vectors[7], top_k=2)} == {"d7", "new"}
@@ -0,0 +1,46 @@
+from src.agents import advanced_model_switcher
+from src.agents.advanced_model_switcher import GPT5Client, response_text
+from src.agents.prompt_layout import PromptCacheStats
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+def test_generate_sends_a_valid_responses_request(monkeypatch):
+    sent = {}
+
+    def post(url, headers, json, timeout):
+        sent.update(url=url, payload=json)
+        return FakeResponse({
+            "output": [
+                {"type": "reasoning", "summary": []},
+                {"type": "message", "content": [{"type": "output_text", "text": "Hello "}, {"type": "output_text", "text": "there"}]},
+            ],
+            "usage": {"input_tokens": 100, "input_tokens_details": {"cached_tokens": 64}},
+        })
+
+    monkeypatch.setattr(advanced_model_switcher.requests, "post", post)
+    client = GPT5Client(api_key="test-key", base_url="https://example.test/v1")
+    client.cache_stats = PromptCacheStats()
+    assert client.generate("Summarize this doc", verbosity="verbose") == "Hello there"
+
+    payload = sent["payload"]
+    assert sent["url"] == "https://example.test/v1/responses"
+    assert payload["text"] == {"verbosity": "high"} and payload["reasoning"] == {"effort": "medium"}
+    assert not {"verbosity", "decoding", "response_format", "temperature"} & payload.keys()
+    assert payload["input"] == "Summarize this doc" and payload["instructions"] and payload["prompt_cache_key"]
+    assert client.cache_stats.snapshot()["gpt-5"]["cached_tokens"] == 64
+
+
+def test_response_text_tolerates_missing_output():
+    assert response_text({"output_text": "sdk style"}) == "sdk style"
+    assert response_text({"output": [{"type": "message", "content": [{"type": "refusal", "refusal": "no"}]}]}) == ""
+    assert response_text({}) == ""
@@ -0,0 +1,83 @@
+import pytest
+
+from src.rag_pipeline.embeddings import HashingEmbedder
+from src.rag_pipeline.incremental import IncrementalIndexer
+from src.rag_pipeline.rag_manager import RAGManager
+
+
+def _docs(n, changed=()):
+    return [
+        {"id": f"d{i}", "title": f"Doc {i}", "content": f"document {i} body" + (" revised" if i in changed else "")}
+        for i in range(n)
+    ]
+
+
+class RecordingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(32)
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return super().embed(texts)
+
+
+def _indexer(tmp_path, rag, embedder):
+    return IncrementalIndexer(str(tmp_path / "manifest.sqlite"), lambda c, e: rag.add_documents(c, e), rag.delete_documents, embedder=embedder)
+
+
+def test_second_run_only_touches_changes(tmp_path):
+    embedder = RecordingEmbedder()
+    rag = RAGManager(embedder=embedder)
+    indexer = _indexer(tmp_path, rag, embedder)
+
+    first = indexer.sync(_docs(5))
+    assert (first["added"], first["changed"], first["removed"]) == (5, 0, 0)
+    assert len(rag.documents) == 5
+
+    embedder.embedded.clear()
+    second = indexer.sync(_docs(4, changed={1}))  # d1 edited, d4 gone
+    assert second["unchanged"] == 3
+    assert second["changed_ids"] == ["d1"] and second["removed_ids"] == ["d4"]
+    assert embedder.embedded == ["Doc 1\ndocument 1 body revised"]
+    assert "d4#0" not in rag.documents
+    assert sorted(indexer.manifest.chunk_ids()) == [f"d{i}#0" for i in range(4)]
+    assert "revised" in rag.documents["d1#0"]["content"]
+    indexer.close()
+
+
+def test_removed_document_can_come_back_and_scopes_are_independent(tmp_path):
+    embedder = RecordingEmbedder()
+    rag = RAGManager(embedder=embedder)
+    indexer = _indexer(tmp_path, rag, embedder)
+    indexer.sync(_docs(2), scope="a")
+    indexer.sync([{"id": "x", "content": "other scope"}], scope="b")
+
+    assert indexer.sync([], scope="a")["removed"] == 2
+    assert "x#0" in rag.documents
+    assert indexer.sync(_docs(1), scope="a")["added_ids"] == ["d0"]
+    indexer.close()
+
+
+def test_interrupted_sync_resumes_without_re_embedding(tmp_path):
+    embedder = RecordingEmbedder()
+    rag = RAGManager(embedder=embedder)
+    written = []
+
+    def failing_upsert(chunks, embeddings):
+        if len(written) == 2:
+            raise RuntimeError("connection lost")
+        rag.add_documents(chunks, embeddings)
+        written.extend(c["document_id"] for c in chunks)
+
+    indexer = IncrementalIndexer(str(tmp_path / "manifest.sqlite"), failing_upsert, rag.delete_documents, embedder=embedder, batch_size=1)
+    with pytest.raises(RuntimeError):
+        indexer.sync(_docs(5))
+    indexer.close()
+
+    embedder.embedded.clear()
+    indexer = _indexer(tmp_path, rag, embedder)
+    summary = indexer.sync(_docs(5))
+    assert summary["unchanged"] == 2 and summary["added_ids"] == ["d2", "d3", "d4"]
+    assert len(embedder.embedded) == 3 and len(rag.documents) == 5
+    indexer.close()
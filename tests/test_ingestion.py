@@ -0,0 +1,29 @@
+import json
+
+from src.rag_pipeline.ingestion import chunk_document, iter_records
+
+
+DOCS = [
+    {"id": f"d{i}", "title": f"Doc {i}", "content": " ".join(f"token{i}_{j}" for j in range(40 * (i % 3 + 1))), "source": "test"}
+    for i in range(10)
+]
+
+
+def test_streams_json_array_across_small_reads(tmp_path):
+    path = tmp_path / "docs.json"
+    path.write_text(json.dumps(DOCS, indent=2), encoding="utf-8")
+    assert list(iter_records(str(path), read_size=7)) == DOCS
+
+
+def test_streams_ndjson(tmp_path):
+    path = tmp_path / "docs.ndjson"
+    path.write_text("\n".join(json.dumps(d) for d in DOCS) + "\n\n", encoding="utf-8")
+    assert list(iter_records(str(path))) == DOCS
+
+
+def test_chunks_carry_document_fields():
+    chunks = chunk_document(DOCS[2], max_tokens=30, overlap=5)
+    assert len(chunks) > 1
+    assert [c["chunk_index"] for c in chunks] == list(range(len(chunks)))
+    assert all(c["document_id"] == "d2" and c["id"] == f"d2#{c['chunk_index']}" for c in chunks)
+    assert all(c["title"] == "Doc 2" for c in chunks)
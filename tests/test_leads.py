@@ -0,0 +1,80 @@
+import pytest
+
+from src.db.leads import (
+    company_key,
+    decode_cursor,
+    dedupe_batch,
+    encode_cursor,
+    lead_search_sql,
+    normalize_email,
+    normalize_lead,
+    normalize_phone,
+    search_page,
+)
+
+
+def test_normalizers():
+    assert normalize_email("  Jane.Doe@Acme.COM ") == "jane.doe@acme.com"
+    assert normalize_email("mailto:ops@acme.io") == "ops@acme.io"
+    assert normalize_email("not-an-email") is None and normalize_email("@") is None
+    assert normalize_phone("+1 (415) 555-0100") == "+14155550100"
+    assert normalize_phone("0044 20 7946 0018") == "+442079460018"
+    assert normalize_phone("555-01") is None
+    assert company_key("Acme, Inc.") == company_key("ACME inc") == company_key("Acme") == "acme"
+    assert company_key("Widget Co. Ltd") == "widget"
+    assert company_key("Inc") == "inc"
+
+
+def test_dedupe_key_prefers_email_then_contact_then_phone():
+    assert normalize_lead({"company": "Acme", "email": "A@acme.com"})["dedupe_key"] == "email:a@acme.com"
+    assert normalize_lead({"company": "Acme Inc", "name": "Jane  Doe"})["dedupe_key"] == "contact:acme|jane doe"
+    assert normalize_lead({"company": "Acme", "phone": "+1 415 555 0100"})["dedupe_key"] == "phone:acme|14155550100"
+    assert normalize_lead({"company": "Acme"})["dedupe_key"] == "company:acme"
+    assert normalize_lead({"email": "a@acme.com"})["dedupe_key"] is None
+
+
+def test_dedupe_batch_merges_fields_and_counts():
+    batch = dedupe_batch(
+        [
+            {"company": "Acme", "email": "jane@acme.com", "title": "CTO", "source": "TavilyTool"},
+            {"company": "ACME, Inc.", "email": " JANE@acme.com", "phone": "415-555-0100", "source": "AgentQLTool"},
+            {"email": "orphan@nowhere.com"},
+            {"company": "Globex", "role": "VP Sales"},
+        ],
+        default_source="scraper",
+    )
+    assert batch["duplicates"] == 1 and batch["invalid"] == 1
+    jane, globex = batch["leads"]
+    assert (jane["title"], jane["phone"], jane["source"], jane["company"]) == ("CTO", "4155550100", "TavilyTool", "Acme")
+    assert globex["title"] == "VP Sales" and globex["source"] == "scraper"
+
+
+def test_lead_search_sql_recent_with_filters_and_cursor():
+    sql, params = lead_search_sql(industry=" Healthcare ", title="cto", source="TavilyTool", cursor=encode_cursor([None, 42]), limit=10)
+    assert "lower(industry) = %(industry)s AND title ILIKE %(title_like)s AND source = %(source)s AND id < %(after_id)s" in sql
+    assert sql.endswith("ORDER BY id DESC LIMIT %(limit)s;")
+    assert params == {"limit": 11, "industry": "healthcare", "title_like": "%cto%", "source": "TavilyTool", "after_id": 42}
+
+
+def test_lead_search_sql_relevance_pages_on_score_then_id():
+    sql, params = lead_search_sql(q="ac%me", sort="relevance", cursor=encode_cursor([0.5, 7]))
+    assert "company %% %(q)s" in sql and params["q_like"] == "%ac\\%me%"
+    assert "< %(after_score)s OR (" in sql and sql.endswith("ORDER BY score DESC, id DESC LIMIT %(limit)s;")
+    # ranked over a bounded set of trigram-nearest candidates, not every match
+    assert "WHERE id IN ((SELECT id FROM leads WHERE (company ILIKE" in sql
+    assert "ORDER BY company <-> %(q)s LIMIT %(candidates)s) UNION (" in sql and "contact_name <-> %(q)s" in sql
+    assert params["candidates"] == 500 and sql.count("after_score") == 2
+    with pytest.raises(ValueError):
+        lead_search_sql(sort="relevance")
+    with pytest.raises(ValueError):
+        lead_search_sql(q="ac ")
+    with pytest.raises(ValueError):
+        lead_search_sql(cursor="not-a-cursor")
+
+
+def test_search_page_builds_next_cursor():
+    rows = [{"id": 9, "score": 0.9}, {"id": 8, "score": 0.8}, {"id": 7, "score": 0.7}]
+    page = search_page([dict(r) for r in rows], limit=2, sort="relevance")
+    assert [r["id"] for r in page["leads"]] == [9, 8] and decode_cursor(page["next_cursor"]) == [0.8, 8]
+    page = search_page([dict(r) for r in rows], limit=5)
+    assert page["next_cursor"] is None and "score" not in page["leads"][0]
@@ -0,0 +1,23 @@
+import datetime
+
+from src.db.log_maintenance import expired_partitions, partition_upper_bound
+
+NOW = datetime.datetime(2026, 10, 19, 6, tzinfo=datetime.timezone.utc)
+
+
+def test_partition_upper_bound_parses_range_bounds():
+    assert partition_upper_bound("DEFAULT") is None
+    bound = "FOR VALUES FROM ('2026-10-18 00:00:00+02') TO ('2026-10-19 00:00:00+02')"
+    assert partition_upper_bound(bound) == datetime.datetime(2026, 10, 18, 22, tzinfo=datetime.timezone.utc)
+    assert partition_upper_bound("FOR VALUES FROM (MINVALUE) TO ('2026-09-01 00:00:00')").tzinfo is not None
+
+
+def test_expired_partitions_keep_default_and_recent_days():
+    bounds = {
+        "agent_logs_default": "DEFAULT",
+        "agent_logs_archive": "FOR VALUES FROM (MINVALUE) TO ('2026-09-01 00:00:00+00')",
+        "agent_logs_p20260918": "FOR VALUES FROM ('2026-09-18 00:00:00+00') TO ('2026-09-19 00:00:00+00')",
+        "agent_logs_p20260919": "FOR VALUES FROM ('2026-09-19 00:00:00+00') TO ('2026-09-20 00:00:00+00')",
+    }
+    assert expired_partitions(bounds, NOW, 30) == ["agent_logs_archive", "agent_logs_p20260918"]
+    assert expired_partitions(bounds, NOW, 60) == []
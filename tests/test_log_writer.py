@@ -0,0 +1,87 @@
+import threading
+
+from src.db.log_writer import AgentLogWriter
+
+
+class Sink:
+    def __init__(self, fail=False, gate=None):
+        self.batches = []
+        self.fail = fail
+        self.gate = gate
+
+    def __call__(self, batch):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.fail:
+            raise RuntimeError("database down")
+        self.batches.append(list(batch))
+
+
+def test_batches_by_size_and_flushes_on_close():
+    sink = Sink()
+    writer = AgentLogWriter(batch_size=3, flush_interval_s=60, write=sink)
+    for i in range(7):
+        assert writer.submit("agent", "task", f"q{i}", "a")
+    writer.close()
+    assert [len(b) for b in sink.batches] == [3, 3, 1]
+    assert [r[2] for b in sink.batches for r in b] == [f"q{i}" for i in range(7)]
+    assert writer.metrics()["written"] == 7 and writer.metrics()["queued"] == 0
+    assert not writer.submit("agent", "task", "late", "a")
+
+
+def test_flush_interval_writes_partial_batches():
+    sink = Sink()
+    writer = AgentLogWriter(batch_size=100, flush_interval_s=0.01, write=sink)
+    writer.submit("agent", "task", "q", "a")
+    assert writer.flush(timeout_s=5)
+    assert len(sink.batches) == 1
+    writer.close()
+
+
+def test_drop_oldest_keeps_newest_records():
+    gate = threading.Event()
+    sink = Sink(gate=gate)
+    writer = AgentLogWriter(queue_size=2, batch_size=2, flush_interval_s=60, overflow="drop_oldest", write=sink)
+    for i in range(2):
+        writer.submit("agent", "task", f"q{i}", "a")
+    assert writer.flush(timeout_s=0.2) is False  # the first batch is stuck in the sink
+    for i in range(2, 5):
+        writer.submit("agent", "task", f"q{i}", "a")
+    gate.set()
+    writer.close()
+    assert [r[2] for b in sink.batches for r in b] == ["q0", "q1", "q3", "q4"]
+    assert writer.metrics()["dropped"] == 1
+
+
+def test_block_gives_up_after_timeout():
+    gate = threading.Event()
+    writer = AgentLogWriter(queue_size=1, batch_size=1, flush_interval_s=60, overflow="block", block_timeout_s=0.01, write=Sink(gate=gate))
+    writer.submit("agent", "task", "q0", "a")
+    writer.flush(timeout_s=0.1)
+    assert writer.submit("agent", "task", "q1", "a")
+    assert not writer.submit("agent", "task", "q2", "a")
+    gate.set()
+    writer.close()
+    assert writer.metrics()["dropped"] == 1 and writer.metrics()["written"] == 2
+
+
+def test_spill_keeps_failed_batches_and_replays_them(tmp_path):
+    spill = str(tmp_path / "spill.jsonl")
+    sink = Sink(fail=True)
+    writer = AgentLogWriter(queue_size=1, batch_size=1, flush_interval_s=60, overflow="spill", spill_path=spill, write=sink)
+    writer.submit("agent", "task", "q0", "a")
+    writer.flush(timeout_s=5)
+    assert writer.metrics()["spilled"] == 1
+    sink.fail = False
+    writer.close()
+    assert [r[2] for b in sink.batches for r in b] == ["q0"]
+    assert writer.metrics()["replayed"] == 1 and not (tmp_path / "spill.jsonl").exists()
+
+
+def test_latency_and_timestamp_are_recorded_at_submit():
+    sink = Sink()
+    writer = AgentLogWriter(batch_size=10, flush_interval_s=60, write=sink)
+    writer.submit("agent", "task", "q", "a", latency_ms=12.5)
+    writer.close()
+    (record,) = sink.batches[0]
+    assert record[:5] == ("agent", "task", "q", "a", 12.5) and record[5].tzinfo is not None
@@ -0,0 +1,54 @@
+import numpy as np
+
+from src.rag_pipeline.partitioned_index import PartitionedVectorIndex, partition_key
+from src.rag_pipeline.rag_manager import RAGManager
+
+
+def _vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_partition_key_normalizes():
+    assert partition_key({"source": " Tavily "}) == "tavily"
+    assert partition_key({"title": "x"}) == "default"
+
+
+def test_routes_queries_and_merges_partitions():
+    index = PartitionedVectorIndex(16)
+    vecs = _vectors(30)
+    ids = [f"d{i}" for i in range(30)]
+    index.add(ids, vecs, partitions=["tavily"] * 10 + ["agentql"] * 10 + ["jigsawstack"] * 10)
+    assert index.stats() == {"agentql": 10, "jigsawstack": 10, "tavily": 10}
+
+    only = index.search(vecs[15], top_k=3, partitions=["AgentQL"])
+    assert only[0][0] == "d15" and all(10 <= int(i[1:]) < 20 for i, _ in only)
+    both = index.search_batch(vecs[[3, 25]], top_k=2, partitions=["tavily", "jigsawstack"])
+    assert [hits[0][0] for hits in both] == ["d3", "d25"]
+    assert index.search(vecs[3], top_k=1, partitions=["missing"]) == []
+
+    # a document that changes source moves partition
+    index.add(["d0"], vecs[:1], partitions=["agentql"])
+    assert index.partition_of("d0") == "agentql" and index.stats()["tavily"] == 9
+
+
+def test_rebuild_and_save_round_trip(tmp_path):
+    index = PartitionedVectorIndex(16, backend="quantized", mode="int8")
+    vecs = _vectors(20, seed=1)
+    index.add([f"d{i}" for i in range(20)], vecs, partitions=["a"] * 12 + ["b"] * 8)
+    before = index.search(vecs[4], top_k=3)
+    index.rebuild_partition("a")
+    assert index.search(vecs[4], top_k=3) == before
+    index.save(str(tmp_path / "parts"))
+    loaded = PartitionedVectorIndex.load(str(tmp_path / "parts"))
+    assert loaded.stats() == {"a": 12, "b": 8}
+    assert loaded.search(vecs[4], top_k=1, partitions=["a"])[0][0] == "d4"
+
+
+def test_rag_manager_partitions_by_source():
+    rag = RAGManager(backend="partitioned")
+    rag.add_documents([
+        {"id": "t1", "content": "acme pricing from the web", "source": "tavily"},
+        {"id": "a1", "content": "acme pricing table extracted", "source": "AgentQL"},
+    ])
+    assert [d["id"] for d in rag.query("acme pricing", top_k=5, partitions=["agentql"])] == ["a1"]
+    assert {d["id"] for d in rag.query("acme pricing", top_k=5)} == {"t1", "a1"}
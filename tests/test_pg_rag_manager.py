@@ -0,0 +1,224 @@
+import json
+from contextlib import contextmanager
+
+import pytest
+from psycopg2 import sql
+
+from src.db.migrations.rag_manager import (
+    RAGManager,
+    build_metadata_filter,
+    copy_line,
+    filter_plan,
+    partition_route,
+    search_scan_sql,
+    vector_literal,
+)
+from src.rag_pipeline.embeddings import EmbeddingDimensionError, HashingEmbedder
+from src.rag_pipeline.retrieval_cache import RetrievalCache
+
+
+def query_text(query):
+    if isinstance(query, sql.Composed):
+        return "".join(query_text(part) for part in query.seq)
+    if isinstance(query, sql.Identifier):
+        return ".".join(f'"{s}"' for s in query.strings)
+    return query.string if isinstance(query, sql.SQL) else query
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        query = query_text(query)
+        self.conn.executed.append((" ".join(query.split()), params))
+        self.conn.autocommit_log.append(self.conn.autocommit)
+        if self.conn.fail_on and self.conn.fail_on in query:
+            raise RuntimeError("lock timeout")
+        if "atttypmod" in query:
+            self.result = [(self.conn.dim,)]
+        elif query.startswith("EXPLAIN"):
+            self.result = [([{"Plan": {"Plan Rows": self.conn.matching}}],)]
+        elif "reltuples" in query:
+            self.result = [(1000,)]
+        elif query.startswith("SELECT max("):
+            self.result = [(None,)]
+        elif "query_index" in query:
+            self.result = [dict(r) for r in self.conn.rows]
+        else:
+            self.result = []
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeConnection:
+    def __init__(self, dim=4, rows=(), matching=10):
+        self.dim = dim
+        self.rows = list(rows)
+        self.matching = matching
+        self.executed = []
+        self.autocommit_log = []
+        self.autocommit = False
+        self.commits = 0
+        self.fail_on = None
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+        self.discarded = []
+
+    @contextmanager
+    def connection(self):
+        yield self.conn
+
+    def discard(self, conn):
+        self.discarded.append(conn)
+
+
+def make_rag(**conn_kwargs):
+    conn = FakeConnection(**conn_kwargs)
+    return RAGManager(embedder=HashingEmbedder(conn.dim), cache=RetrievalCache(), pool=FakePool(conn)), conn
+
+
+def test_vector_literal():
+    assert vector_literal([1, 0.5, -2]) == "[1.0,0.5,-2.0]"
+
+
+def test_copy_line_escapes_text_format():
+    line = copy_line([1, "doc\\1", "tab\there\nnewline\r", None, '{"a": 1}'])
+    assert line == '1\tdoc\\\\1\ttab\\there\\nnewline\\r\t\\N\t{"a": 1}\n'
+    assert line.count("\t") == 4 and line.count("\n") == 1
+
+
+def test_metadata_filter_uses_one_containment_for_scalars():
+    where, params = build_metadata_filter({"source": "kb", "tenant": "acme", "category": None})
+    assert where == "metadata @> %(f_contains)s::jsonb"
+    assert json.loads(params["f_contains"]) == {"source": "kb", "tenant": "acme"}
+
+
+def test_metadata_filter_any_of_and_date_range():
+    where, params = build_metadata_filter({"product": ["crm", "billing"], "created_after": "2025-01-01"})
+    assert where == (
+        "created_at >= %(f_created_after)s AND "
+        "(metadata @> %(f_1)s::jsonb OR metadata @> %(f_2)s::jsonb)"
+    )
+    assert json.loads(params["f_1"]) == {"product": "billing"}
+    assert build_metadata_filter(None) == ("TRUE", {})
+
+
+def test_metadata_filter_keys_never_reach_the_sql():
+    hostile = "z_0)s::jsonb OR (SELECT pg_sleep(5)) IS NULL OR metadata @> %(f_z"
+    with pytest.raises(ValueError):
+        build_metadata_filter({"z": ["a"], hostile: ["b"]})
+    with pytest.raises(ValueError):
+        build_metadata_filter({"a b": "x"})
+    where, params = build_metadata_filter({"z": ["a"], "tenant": ["b", "c"]})
+    assert where == "(metadata @> %(f_0)s::jsonb OR metadata @> %(f_1)s::jsonb) AND (metadata @> %(f_2)s::jsonb)"
+    assert [json.loads(params[f"f_{i}"]) for i in range(3)] == [{"tenant": "b"}, {"tenant": "c"}, {"z": "a"}]
+
+
+def test_partition_route_prunes_to_requested_sources():
+    assert partition_route({"tenant": "acme"}) == ("TRUE", {})
+    route = partition_route({"source": ["Tavily", "agentql "]})
+    assert route == ("partition_key = ANY(%(f_partitions)s)", {"f_partitions": ["agentql", "tavily"]})
+    where, params = build_metadata_filter({"source": "tavily"})
+    plan = filter_plan(where, params, 0.01, 10, 5, partition_route({"source": "tavily"}))
+    assert plan["strategy"] == "prefilter" and plan["params"]["f_partitions"] == ["tavily"]
+    assert "WHERE partition_key = ANY(%(f_partitions)s) AND metadata @>" in search_scan_sql(plan)
+
+
+def test_scan_sql_unnests_queries_into_lateral_top_k():
+    plan = filter_plan("TRUE", {}, 1.0, 0, 5)
+    scan = " ".join(search_scan_sql(plan).split())
+    assert "FROM unnest(%(queries)s::vector[]) WITH ORDINALITY AS q(embedding, ord) CROSS JOIN LATERAL (" in scan
+    assert "SELECT q.ord - 1 AS query_index" in scan and scan.endswith("ORDER BY q.ord, r.distance;")
+    assert "ORDER BY embedding <-> q.embedding LIMIT %(top_k)s" in scan and "%(candidates)s" not in scan
+
+    where, params = build_metadata_filter({"tenant": "acme"})
+    post = " ".join(search_scan_sql(filter_plan(where, params, 0.5, 500, 5)).split())
+    # broad filter: ANN scan of the oversampled candidates, filtered afterwards
+    assert "ORDER BY embedding <-> q.embedding LIMIT %(candidates)s ) c WHERE metadata @> %(f_contains)s::jsonb" in post
+
+
+def test_batch_results_are_grouped_by_query_index():
+    rows = [
+        {"query_index": 0, "document_id": "a", "content": "A", "metadata": {}, "distance": 0.1},
+        {"query_index": 2, "document_id": "c", "content": "C", "metadata": {}, "distance": 0.2},
+        {"query_index": 0, "document_id": "b", "content": "B", "metadata": {}, "distance": 0.3},
+    ]
+    rag, conn = make_rag(rows=rows)
+    results = rag.search_similar_batch([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0]], top_k=2, use_cache=False)
+    assert [[h["document_id"] for h in r] for r in results] == [["a", "b"], [], ["c"]]
+    assert "query_index" not in results[0][0]
+    query, params = conn.executed[-1]
+    assert params["queries"] == ["[1.0,0.0,0.0,0.0]", "[0.0,1.0,0.0,0.0]", "[0.0,0.0,1.0,0.0]"]
+    assert params["top_k"] == 2 and params["candidates"] == 2
+
+
+def test_probes_and_ef_search_are_set_local_per_call():
+    rag, conn = make_rag()
+    rag.search_similar_batch([[1, 0, 0, 0]], probes=12, ef_search=80, use_cache=False)
+    settings = [(q, p) for q, p in conn.executed if q.startswith("SET")]
+    assert settings == [("SET LOCAL ivfflat.probes = %s;", (12,)), ("SET LOCAL hnsw.ef_search = %s;", (80,))]
+
+    conn.executed.clear()
+    rag.search_similar_batch([[1, 0, 0, 0]], probes=None, ef_search=None, filters={"tenant": "acme"}, use_cache=False)
+    # a selective filter is searched exactly: no ANN index scan, no ANN knobs
+    assert [q for q, _ in conn.executed if q.startswith("SET")] == ["SET LOCAL enable_indexscan = off;"]
+
+
+def test_embedder_must_match_the_vector_column():
+    with pytest.raises(EmbeddingDimensionError):
+        RAGManager(embedder=HashingEmbedder(8), cache=RetrievalCache(), pool=FakePool(FakeConnection(dim=4)))
+
+
+def test_ensure_partition_moves_in_batches_then_attaches_without_scanning():
+    rag, conn = make_rag()
+    conn.executed.clear()
+    conn.autocommit_log.clear()
+    assert rag.ensure_partition("Tavily ") == "rag_data_p_tavily"
+    assert rag.pool.discarded == [conn]
+    queries = [q for q, _ in conn.executed]
+    moves = [i for i, q in enumerate(queries) if q.startswith("WITH batch AS ( DELETE FROM rag_data_default")]
+    check = next(i for i, q in enumerate(queries) if "CHECK (partition_key <> %s) NOT VALID" in q)
+    validate = next(i for i, q in enumerate(queries) if "VALIDATE CONSTRAINT" in q)
+    attach = next(i for i, q in enumerate(queries) if "ATTACH PARTITION" in q)
+    assert len(moves) == 2 and moves[0] < check < moves[1] < validate < attach
+    assert conn.executed[moves[0]][1] == ("tavily", "tavily", 5000)
+    # from the session settings to the validation everything autocommits; the attach and the drops share one transaction
+    start = queries.index("SET statement_timeout = 0;")
+    assert all(conn.autocommit_log[start: validate + 1])
+    assert [q.split(" ")[0] for q in queries[attach:]] == ["ALTER", "ALTER", "ALTER"]
+    assert not any(conn.autocommit_log[attach:]) and conn.commits == 1
+    assert not any(q.startswith("LOCK TABLE") for q in queries)
+
+
+def test_ensure_partition_drops_the_default_check_when_it_fails():
+    rag, conn = make_rag()
+    conn.executed.clear()
+    conn.fail_on = "ATTACH PARTITION"
+    with pytest.raises(RuntimeError, match="lock timeout"):
+        rag.ensure_partition("tavily")
+    assert conn.executed[-1][0] == 'ALTER TABLE rag_data_default DROP CONSTRAINT IF EXISTS "rag_data_default_not_tavily";'
+    assert conn.autocommit is True and conn.commits == 0
@@ -0,0 +1,117 @@
+import threading
+
+import psycopg2
+import psycopg2.extensions
+import pytest
+
+from src.db.postgresql_connector import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise psycopg2.OperationalError("server closed the connection")
+        self.conn.status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.broken = False
+        self.rollbacks = 0
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+def make_pool(**kwargs):
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    return ConnectionPool(dsn="postgresql://test", connect=connect, **kwargs), opened
+
+
+def test_reuses_connections_and_rolls_back_uncommitted_work():
+    pool, opened = make_pool(min_size=2, max_size=4)
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("INSERT ...")
+    assert len(opened) == 2 and conn.rollbacks == 1
+    with pool.connection() as again:
+        assert again is conn
+    metrics = pool.metrics()
+    assert metrics["size"] == 2 and metrics["idle"] == 2 and metrics["in_use"] == 0
+    assert metrics["checkouts"] == 2 and metrics["created"] == 2
+
+
+def test_waits_for_a_free_connection_then_times_out():
+    pool, _ = make_pool(min_size=0, max_size=1, wait_timeout_s=0.05)
+    conn = pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    threading.Timer(0.05, pool.putconn, args=(conn,)).start()
+    assert pool.getconn(timeout_s=2) is conn
+    metrics = pool.metrics()
+    assert metrics["timeouts"] == 1 and metrics["waits"] == 2 and metrics["wait_ms_max"] >= 40
+
+
+def test_recycles_after_n_uses_and_replaces_broken_connections():
+    pool, opened = make_pool(min_size=0, max_size=2, recycle_uses=2)
+    for _ in range(3):
+        with pool.connection():
+            pass
+    assert len(opened) == 2 and opened[0].closed and pool.metrics()["recycled"] == 1
+
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.connection() as conn:
+            conn.broken = True
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+    assert conn.closed and pool.metrics()["discarded"] == 1 and pool.metrics()["size"] == 0
+
+
+def test_health_check_replaces_dead_idle_connection():
+    pool, opened = make_pool(min_size=1, max_size=1, healthcheck_idle_s=0)
+    with pool.connection() as conn:
+        pass
+    conn.broken = True
+    with pool.connection() as fresh:
+        assert fresh is not conn
+    assert conn.closed and len(opened) == 2 and pool.metrics()["health_check_failures"] == 1
+
+
+def test_discard_and_autocommit_reset():
+    pool, opened = make_pool(min_size=0, max_size=2)
+    with pool.connection() as conn:
+        conn.autocommit = True
+    assert conn.autocommit is False and not conn.closed
+    with pool.connection() as conn:
+        pool.discard(conn)
+    assert conn.closed and pool.metrics()["size"] == 0
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.getconn()
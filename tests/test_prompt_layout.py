@@ -0,0 +1,47 @@
+import pytest
+
+from src.agents.prompt_layout import PromptAssembler, PromptCacheStats, parse_cache_usage
+
+
+def test_prefix_is_frozen_and_byte_stable():
+    a = PromptAssembler()
+    tools = [{"name": "search", "args": {"q": "str"}}, {"name": "extract", "args": {}}]
+    p1 = a.freeze_prefix("support", "You are support.  \r\nBe brief.", tools=tools)
+    p2 = a.freeze_prefix("support", "You are support.\nBe brief.", tools=list(reversed(tools)))
+    assert p1 is p2
+    assert "\r" not in p1.text
+    assert p1.text.index('"name":"extract"') < p1.text.index('"name":"search"')
+
+    # same content in a fresh assembler renders the same bytes / cache key
+    b = PromptAssembler()
+    assert b.freeze_prefix("support", "You are support.\nBe brief.", tools=list(reversed(tools))).cache_key == p1.cache_key
+
+
+def test_changed_content_replaces_the_prefix():
+    a = PromptAssembler()
+    p1 = a.freeze_prefix("support", "You are support.")
+    p2 = a.freeze_prefix("support", "You are billing support.", tools=[{"name": "refund"}])
+    assert p2 is not p1 and p2.cache_key != p1.cache_key
+    assert "billing" in p2.text and '"name":"refund"' in p2.text
+    assert a.freeze_prefix("support", "You are billing support.", tools=[{"name": "refund"}]) is p2
+
+
+@pytest.mark.parametrize("usage,expected", [
+    ({"prompt_tokens": 1000, "prompt_tokens_details": {"cached_tokens": 768}}, (1000, 768)),
+    ({"input_tokens": 10, "cache_read_input_tokens": 900, "cache_creation_input_tokens": 90}, (1000, 900)),
+    ({"prompt_token_count": 500, "cached_content_token_count": 250}, (500, 250)),
+    (None, (0, 0)),
+])
+def test_parse_cache_usage_providers(usage, expected):
+    parsed = parse_cache_usage(usage)
+    assert (parsed["prompt_tokens"], parsed["cached_tokens"]) == expected
+
+
+def test_cache_stats_hit_rates():
+    stats = PromptCacheStats()
+    stats.record("gpt-5", {"prompt_tokens": 1000, "prompt_tokens_details": {"cached_tokens": 0}})
+    stats.record("gpt-5", {"prompt_tokens": 1000, "prompt_tokens_details": {"cached_tokens": 900}})
+    snap = stats.snapshot()["gpt-5"]
+    assert snap["requests"] == 2
+    assert snap["request_hit_rate"] == 0.5
+    assert snap["token_hit_rate"] == 0.45
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from src.rag_pipeline.quantization import QUANTIZATION_MODES, QuantizedVectorIndex, evaluate_quantization
+from src.rag_pipeline.rag_manager import RAGManager
+
+
+def _data(n=2000, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    vectors = (centers[rng.integers(0, 20, n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+    queries = (centers[rng.integers(0, 20, 20)] + 0.3 * rng.normal(size=(20, dim))).astype(np.float32)
+    return vectors, queries
+
+
+@pytest.mark.parametrize("mode", QUANTIZATION_MODES)
+def test_reranked_scores_are_exact_cosines(mode):
+    vectors, queries = _data()
+    idx = QuantizedVectorIndex(64, mode, initial_capacity=4)  # forces growth
+    idx.add([str(i) for i in range(len(vectors))], vectors)
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    q = queries[0] / np.linalg.norm(queries[0])
+    for doc_id, score in idx.search(queries[0], top_k=5):
+        assert score == pytest.approx(float(unit[int(doc_id)] @ q), abs=1e-5)
+    idx.close()
+
+
+def test_memory_and_recall_report():
+    vectors, queries = _data()
+    report = evaluate_quantization(vectors, queries, top_k=10)
+    assert report["float16"]["compression"] == 2.0
+    assert report["binary"]["compression"] == 32.0
+    assert report["int8"]["memory_bytes"] < report["float32"]["memory_bytes"] / 3
+    assert report["float16"]["recall"] >= 0.99
+    assert report["int8"]["recall"] >= 0.95
+    assert report["int8"]["recall"] >= report["int8"]["recall_raw"]
+
+
+def test_delete_and_save_load_roundtrip(tmp_path):
+    vectors, queries = _data(200)
+    idx = QuantizedVectorIndex(64, "int8")
+    idx.add([str(i) for i in range(200)], vectors)
+    idx.delete(["0", "1", "57"])
+    path = str(tmp_path / "codes.npy")
+    idx.save(path)
+    loaded = QuantizedVectorIndex.load(path)
+    assert len(loaded) == 197 and "57" not in loaded
+    assert loaded.search_batch(queries, 5) == idx.search_batch(queries, 5)
+    idx.close()
+    loaded.close()
+
+
+def test_mmap_load_maps_saved_files_and_never_writes_them(tmp_path):
+    vectors, queries = _data(100)
+    idx = QuantizedVectorIndex(64, "int8")
+    idx.add([str(i) for i in range(100)], vectors)
+    path = str(tmp_path / "codes.npy")
+    idx.save(path)
+    saved = [(tmp_path / name).read_bytes() for name in ("codes.npy", "codes.npy.full.npy")]
+
+    loaded = QuantizedVectorIndex.load(path)
+    assert loaded._full.path == f"{path}.full.npy" and isinstance(loaded._codes, np.memmap)
+    loaded.delete(["3"])
+    loaded.add(["new", "newer"], vectors[:2] * -1)  # grows past the mapped rows
+    assert loaded._full.path != f"{path}.full.npy" and len(loaded) == 101
+    assert loaded.search(-vectors[0], top_k=1)[0][0] == "new"
+    loaded.close()
+    assert [(tmp_path / name).read_bytes() for name in ("codes.npy", "codes.npy.full.npy")] == saved
+    assert QuantizedVectorIndex.load(path).search_batch(queries, 5) == idx.search_batch(queries, 5)
+    idx.close()
+
+
+def test_rag_manager_quantized_backend_persists(tmp_path):
+    rag = RAGManager(backend="quantized", mode="float16")
+    rag.add_documents([{"id": "a", "content": "refund a duplicate charge"}, {"id": "b", "content": "reset the admin password"}])
+    rag.save(str(tmp_path))
+    loaded = RAGManager.load(str(tmp_path))
+    assert loaded.query("password reset", top_k=1, mode="vector")[0]["id"] == "b"
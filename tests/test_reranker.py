@@ -0,0 +1,55 @@
+import time
+
+import numpy as np
+
+from src.rag_pipeline.rag_manager import RAGManager
+from src.rag_pipeline.reranker import Reranker
+
+
+class OverlapScorer:
+    """Stand-in cross-encoder: counts query words present in the document."""
+
+    def __init__(self, delay_s=0.0):
+        self.delay_s = delay_s
+        self.pairs = 0
+
+    def __call__(self, pairs):
+        time.sleep(self.delay_s)
+        self.pairs += len(pairs)
+        return np.array([sum(w in doc.lower() for w in q.lower().split()) for q, doc in pairs], dtype=np.float32)
+
+
+DOCS = [{"id": f"d{i}", "content": text} for i, text in enumerate([
+    "billing overview",
+    "reset your password from the login page",
+    "password policy",
+    "shipping times",
+])]
+
+
+def test_reranks_and_caches_pair_scores():
+    scorer = OverlapScorer()
+    reranker = Reranker(scorer, batch_size=2, budget_ms=1000)
+    top = reranker.rerank("reset password", DOCS, top_n=2)
+    assert [d["id"] for d in top] == ["d1", "d2"]
+    assert top[0]["rerank_score"] == 2.0
+    reranker.rerank("reset password", DOCS, top_n=2)
+    assert scorer.pairs == 4
+    assert reranker.snapshot()["cache_hits"] == 4
+
+
+def test_budget_cuts_scoring_short():
+    scorer = OverlapScorer(delay_s=0.05)
+    reranker = Reranker(scorer, batch_size=1, budget_ms=70)
+    top = reranker.rerank("reset password", DOCS, top_n=3)
+    assert scorer.pairs < len(DOCS)
+    assert len(top) == 3
+    assert reranker.snapshot()["cutoffs"] == 1
+
+
+def test_rag_manager_reranks_research_queries_only():
+    rag = RAGManager(reranker=Reranker(OverlapScorer(), budget_ms=1000))
+    rag.add_documents(DOCS)
+    hits = rag.query("reset password", top_k=1, task_type="research_query")
+    assert hits[0]["id"] == "d1" and "rerank_score" in hits[0]
+    assert "rerank_score" not in rag.query("reset password", top_k=1, task_type="lead_generation")[0]
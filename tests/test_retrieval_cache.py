@@ -0,0 +1,38 @@
+import numpy as np
+
+from src.rag_pipeline.retrieval_cache import RetrievalCache
+
+HITS = [{"document_id": "a", "distance": 0.1}]
+
+
+def test_hit_for_same_vector_filters_and_top_k():
+    cache = RetrievalCache()
+    v = np.array([0.3, 0.4, 0.5])
+    cache.put(cache.key(v, 5, {"source": "kb"}), HITS)
+    # scaled and float-noisy copies of the same direction share the entry
+    assert cache.get(cache.key(v * 2 + 1e-6, 5, {"source": "kb"}), "support") == HITS
+    assert cache.get(cache.key(v, 10, {"source": "kb"}), "support") is None
+    assert cache.get(cache.key(v, 5, {"source": "web"}), "support") is None
+    stats = cache.snapshot()["callers"]["support"]
+    assert stats["hits"] == 1 and stats["misses"] == 2
+
+
+def test_bump_invalidates_and_blocks_racing_put():
+    cache = RetrievalCache()
+    key = cache.key([1.0, 0.0], 5)
+    generation = cache.generation
+    cache.put(key, HITS, generation)
+    cache.bump()
+    assert cache.get(key) is None
+    # a result computed before the write must not be cached after it
+    cache.put(key, HITS, generation)
+    assert cache.get(key) is None
+
+
+def test_lru_and_ttl_limits():
+    cache = RetrievalCache(max_entries=2, ttl_s=0.0)
+    keys = [cache.key([float(i), 1.0], 5) for i in range(3)]
+    for k in keys:
+        cache.put(k, HITS)
+    assert cache.snapshot()["entries"] == 2
+    assert cache.get(keys[2]) is None  # expired immediately
@@ -0,0 +1,155 @@
+import pytest
+
+from src.db.migrations.run_migrations import MIGRATIONS_DIR, _run_backfill, apply_migration, parse_migration, split_statements
+
+
+def test_split_keeps_strings_comments_and_dollar_bodies_intact():
+    script = """
+    INSERT INTO t VALUES ('a;b', 'it''s');
+    -- a comment; with a semicolon
+    CREATE FUNCTION f() RETURNS void AS $fn$ BEGIN PERFORM 1; END; $fn$ LANGUAGE plpgsql;
+    DO $$ BEGIN RAISE NOTICE 'x;y'; END $$;
+    SELECT "odd;name" FROM t /* ; */
+    """
+    statements = split_statements(script)
+    assert len(statements) == 4
+    assert statements[1].startswith("-- a comment") and "PERFORM 1; END;" in statements[1]
+    assert statements[3].startswith('SELECT "odd;name"')
+
+
+def test_directives_and_transaction_control():
+    transactional, steps = parse_migration(
+        """
+        BEGIN;
+        -- migrate: lock_timeout=2s retries=3
+        ALTER TABLE leads ADD COLUMN email_norm TEXT;
+        -- migrate: backfill batch_size=100 sleep_ms=10
+        UPDATE leads SET email_norm = lower(email)
+        WHERE id IN (SELECT id FROM leads WHERE email_norm IS NULL LIMIT :batch_size);
+        COMMIT;
+        """
+    )
+    assert transactional is True and len(steps) == 2
+    assert steps[0]["settings"]["lock_timeout"] == "2s" and steps[0]["settings"]["retries"] == 3
+    assert steps[0]["backfill"] is None
+    assert steps[1]["backfill"] == {"batch_size": 100, "sleep_ms": 10}
+    assert "LIMIT 100" in steps[1]["sql"] and steps[1]["settings"]["lock_timeout"] == "2s"
+
+
+def test_no_transaction_file_and_backfill_validation():
+    transactional, steps = parse_migration(
+        "-- migrate: no-transaction statement_timeout=0\nCREATE INDEX CONCURRENTLY IF NOT EXISTS i ON t (c);"
+    )
+    assert transactional is False and steps[0]["settings"]["statement_timeout"] == "0"
+    with pytest.raises(ValueError):
+        parse_migration("-- migrate: backfill\nUPDATE t SET c = 1;")
+
+
+def test_variables_are_substituted_but_casts_are_not():
+    _, steps = parse_migration(
+        "ALTER TABLE rag_data ALTER COLUMN embedding TYPE vector(:embedding_dim) USING NULL::vector(:embedding_dim);"
+        "\nSELECT ':unknown'::text;",
+        variables={"embedding_dim": 384},
+    )
+    assert steps[0]["sql"] == "ALTER TABLE rag_data ALTER COLUMN embedding TYPE vector(384) USING NULL::vector(384);"
+    assert steps[1]["sql"] == "SELECT ':unknown'::text;"
+
+
+class BatchCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if isinstance(query, str) and query.startswith("SELECT copy_batch"):
+            self.description = [("copy_batch",)]
+            self.rowcount = 1
+            self.conn.executed += 1
+
+    def fetchone(self):
+        return (self.conn.counts.pop(0),)
+
+
+class BatchConnection:
+    def __init__(self, counts):
+        self.counts = counts
+        self.executed = 0
+
+    def cursor(self):
+        return BatchCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_select_backfill_reports_its_own_count():
+    _, steps = parse_migration("-- migrate: backfill batch_size=2 sleep_ms=0\nSELECT copy_batch(:batch_size);")
+    conn = BatchConnection([2, 2, 1])
+    assert _run_backfill(conn, steps[0]) == 5 and conn.executed == 3
+
+
+def test_partitioning_migrations_run_online_in_batches():
+    for name in ("_v003_partition_rag_data.sql", "_v004_partition_agent_logs.sql"):
+        transactional, steps = parse_migration((MIGRATIONS_DIR / name).read_text(encoding="utf-8"))
+        assert transactional is False
+        assert [step["sql"].split("(")[0] for step in steps if step["backfill"]] == [
+            f"SELECT {name[6:-4].replace('partition_', '')}_partition_backfill"
+        ]
+
+
+class GexecCursor(BatchCursor):
+    def execute(self, query, params=None):
+        self.conn.log.append((query if isinstance(query, str) else "SET", self.conn.autocommit))
+
+    def fetchall(self):
+        return [("CREATE INDEX CONCURRENTLY IF NOT EXISTS p1_idx ON p1 (c);",), ("CREATE INDEX CONCURRENTLY IF NOT EXISTS p2_idx ON p2 (c);",)]
+
+    def fetchone(self):
+        return None
+
+
+class GexecConnection(BatchConnection):
+    def __init__(self):
+        super().__init__([])
+        self.autocommit = False
+        self.log = []
+
+    def cursor(self):
+        return GexecCursor(self)
+
+
+def test_gexec_runs_each_generated_statement_outside_a_transaction(tmp_path):
+    with pytest.raises(ValueError, match="no-transaction"):
+        parse_migration("-- migrate: gexec\nSELECT 'SELECT 1;';")
+    path = tmp_path / "_v999_gexec.sql"
+    path.write_text("-- migrate: no-transaction\n-- migrate: gexec\nSELECT format('CREATE INDEX ...') FROM pg_class;\n")
+    conn = GexecConnection()
+    apply_migration(conn, str(path))
+    created = [(q, autocommit) for q, autocommit in conn.log if q.startswith("CREATE INDEX")]
+    assert created == [
+        ("CREATE INDEX CONCURRENTLY IF NOT EXISTS p1_idx ON p1 (c);", True),
+        ("CREATE INDEX CONCURRENTLY IF NOT EXISTS p2_idx ON p2 (c);", True),
+    ]
+    assert ("SELECT format('CREATE INDEX ...') FROM pg_class;", False) in conn.log
+
+
+def test_embedding_dim_migration_swaps_a_new_column_online():
+    transactional, steps = parse_migration(
+        (MIGRATIONS_DIR / "_v007_rag_data_embedding_dim.sql").read_text(encoding="utf-8"), variables={"embedding_dim": 384}
+    )
+    assert transactional is False
+    assert "ADD COLUMN IF NOT EXISTS embedding_384 vector(384)" in steps[0]["sql"]
+    assert [step["sql"] for step in steps if step["backfill"]] == ["SELECT rag_data_embedding_backfill(5000);"]
+    (gexec,) = [step for step in steps if step["gexec"]]
+    assert "CREATE INDEX CONCURRENTLY" in gexec["sql"] and gexec["settings"]["statement_timeout"] == "0"
+    assert not any("USING NULL" in step["sql"] or "ivfflat" in step["sql"] for step in steps)
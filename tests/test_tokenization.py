@@ -0,0 +1,68 @@
+import pytest
+
+from src.agents.tokenization import HeuristicTokenizer, TokenizerService, TRUNCATION_MARKER
+
+
+@pytest.fixture
+def service():
+    # "claude" always uses the heuristic tokenizer, so results don't depend on tiktoken
+    return TokenizerService(context_windows={"claude": 120}, max_prompt_tokens=None)
+
+
+def test_heuristic_truncate_head_and_tail():
+    tok = HeuristicTokenizer()
+    text = "alpha beta gamma delta epsilon"
+    assert tok.count(text) == 5
+    assert tok.truncate(text, 2) == "alpha beta"
+    assert tok.truncate(text, 2, keep="tail") == " delta epsilon"
+    assert tok.truncate(text, 10) == text
+
+
+def test_prompt_budget_reserves_output(service):
+    assert service.prompt_budget("claude", max_output_tokens=20) == 100
+    capped = TokenizerService(context_windows={"claude": 120}, max_prompt_tokens=50)
+    assert capped.prompt_budget("claude", max_output_tokens=20) == 50
+
+
+def test_fit_prompt_truncates_long_prompt(service):
+    short = "hello there"
+    assert service.fit_prompt(short, "claude", max_output_tokens=20) == short
+
+    long_prompt = " ".join(f"word{i}" for i in range(500))
+    fitted = service.fit_prompt(long_prompt, "claude", max_output_tokens=20)
+    assert fitted.endswith(TRUNCATION_MARKER)
+    assert service.count(fitted, "claude") <= 100
+
+
+def test_fit_messages_keeps_system_and_recent_turns(service):
+    messages = [{"role": "system", "content": "You are a support agent."}]
+    messages += [{"role": "user", "content": f"question number {i} " * 5} for i in range(20)]
+    fitted = service.fit_messages(messages, "claude", max_output_tokens=20)
+
+    assert fitted[0]["role"] == "system"
+    assert fitted[-1] == messages[-1]
+    assert 1 < len(fitted) < len(messages)
+    kept_turns = fitted[1:]
+    assert kept_turns == messages[-len(kept_turns):]
+
+
+def test_fit_messages_truncates_oversized_latest_turn(service):
+    messages = [
+        {"role": "system", "content": "sys"},
+        {"role": "user", "content": "older"},
+        {"role": "user", "content": "huge " * 400},
+    ]
+    fitted = service.fit_messages(messages, "claude", max_output_tokens=20)
+    assert [m["role"] for m in fitted] == ["system", "user"]
+    assert len(fitted[1]["content"]) < len(messages[2]["content"])
+
+
+def test_split_windows_overlap_and_cover_text(service):
+    text = " ".join(f"word{i}" for i in range(50))
+    chunks = service.split(text, max_tokens=20, overlap=5, model="claude")
+    assert len(chunks) > 1
+    assert all(service.count(c, "claude") <= 20 for c in chunks)
+    assert chunks[0].startswith("word0") and chunks[-1].endswith("word49")
+    # consecutive windows share their overlap
+    assert chunks[1].split()[0] in chunks[0]
+    assert service.split("short text", max_tokens=20, model="claude") == ["short text"]
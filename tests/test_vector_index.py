@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from src.rag_pipeline.vector_index import InMemoryVectorIndex
+from src.rag_pipeline.rag_manager import RAGManager
+
+
+def _brute_force(vectors, query, k):
+    v = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    q = query / np.linalg.norm(query)
+    return list(np.argsort(-(v @ q))[:k])
+
+
+def test_search_matches_brute_force():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 32)).astype(np.float32)
+    idx = InMemoryVectorIndex(dim=32, initial_capacity=8)  # forces growth
+    idx.add([f"d{i}" for i in range(500)], vectors)
+
+    queries = rng.normal(size=(4, 32)).astype(np.float32)
+    results = idx.search_batch(queries, top_k=10)
+    for q, hits in zip(queries, results):
+        assert [h[0] for h in hits] == [f"d{i}" for i in _brute_force(vectors, q, 10)]
+        scores = [h[1] for h in hits]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_incremental_upsert_and_delete():
+    idx = InMemoryVectorIndex(dim=3)
+    idx.add(["a", "b", "c"], np.eye(3, dtype=np.float32))
+    assert idx.search(np.array([0, 1, 0]), top_k=1)[0][0] == "b"
+
+    assert idx.delete(["a", "missing"]) == 1
+    assert len(idx) == 2 and "a" not in idx
+    # the moved row ("c") is still found under its own id
+    assert idx.search(np.array([0, 0, 1]), top_k=1)[0][0] == "c"
+
+    idx.add(["b"], np.array([[1.0, 0.0, 0.0]]))
+    assert len(idx) == 2
+    assert idx.search(np.array([1, 0, 0]), top_k=1) == [("b", pytest.approx(1.0))]
+
+
+def test_rag_manager_returns_ranked_documents():
+    rag = RAGManager()
+    rag.add_documents([
+        {"id": "pricing", "title": "Pricing", "content": "Enterprise plan pricing and upgrade options"},
+        {"id": "massgen", "title": "MassGen", "content": "MassGen orchestrates agents with voting"},
+        {"title": "Leads", "content": "Lead enrichment with Tavily and AgentQL"},
+    ])
+    results = rag.query("how do I upgrade my plan pricing", top_k=2)
+    assert results[0]["id"] == "pricing"
+    assert results[0]["rank"] == 1 and results[0]["score"] >= results[1]["score"]
+
+    batch = rag.query_batch(["agents voting", "tavily lead enrichment"], top_k=1)
+    assert batch[0][0]["id"] == "massgen"
+    assert batch[1][0]["title"] == "Leads"
+
+    rag.delete_documents(["pricing"])
+    assert all(r["id"] != "pricing" for r in rag.query("pricing", top_k=3))